@@ -44,9 +44,9 @@ GRANT ALL PRIVILEGES ON ALL SEQUENCES IN SCHEMA dw TO super_user;
 
 
 -- --Allow R/W access to all staging tables
--- GRANT  SELECT, INSERT, UPDATE, DELETE ON raw.staging_employee TO staging_executor;
--- GRANT SELECT, INSERT, UPDATE, DELETE ON raw.staging_finance TO staging_executor;
--- GRANT SELECT, INSERT, UPDATE, DELETE ON raw.staging_operations TO staging_executor;
+-- GRANT  SELECT, INSERT, UPDATE, DELETE, TRUNCATE ON raw.staging_employee TO staging_executor;
+-- GRANT SELECT, INSERT, UPDATE, DELETE, TRUNCATE ON raw.staging_finance TO staging_executor;
+-- GRANT SELECT, INSERT, UPDATE, DELETE, TRUNCATE ON raw.staging_operations TO staging_executor;
 -- GRANT SELECT,INSERT ON raw.data_quality_log TO staging_executor;
 -- GRANT SELECT,INSERT ON raw.audit_log TO staging_executor;
 
@@ -25,8 +25,10 @@ CREATE TABLE IF NOT EXISTS dw.dim_employee (
 );
 
 -- dim_time
+-- time_id is the date as a YYYYMMDD integer (2024-01-31 -> 20240131), so loads compute it
+-- with dw.date_key() instead of looking it up, and time_id order is date order.
 CREATE TABLE IF NOT EXISTS dw.dim_time (
-  time_id SERIAL PRIMARY KEY,
+  time_id INT PRIMARY KEY,
   full_date DATE UNIQUE,
   day INT,
   month INT,
@@ -35,36 +37,92 @@ CREATE TABLE IF NOT EXISTS dw.dim_time (
   is_weekend BOOLEAN
 );
 
+CREATE OR REPLACE FUNCTION dw.date_key(p_date DATE)
+RETURNS INT AS $$
+  SELECT (EXTRACT(YEAR FROM p_date) * 10000 + EXTRACT(MONTH FROM p_date) * 100 + EXTRACT(DAY FROM p_date))::INT
+$$ LANGUAGE sql IMMUTABLE;
+
+-- Adds every day of the years of p_time_ids that dim_time does not have yet. The loads call
+-- this with the time_ids of their rows before inserting, so a date outside the years
+-- loaded so far extends dim_time instead of being dropped; it returns the number of days added.
+CREATE OR REPLACE FUNCTION dw.extend_dim_time(p_time_ids INT[])
+RETURNS INT AS $$
+DECLARE
+  added INT;
+BEGIN
+  INSERT INTO dw.dim_time (time_id, full_date, day, month, quarter, year, is_weekend)
+  SELECT
+    dw.date_key(d::DATE),
+    d::DATE,
+    EXTRACT(DAY FROM d)::INT,
+    EXTRACT(MONTH FROM d)::INT,
+    EXTRACT(QUARTER FROM d)::INT,
+    EXTRACT(YEAR FROM d)::INT,
+    EXTRACT(DOW FROM d) IN (0,6)
+  FROM (
+    SELECT DISTINCT id / 10000 AS year
+    FROM unnest(p_time_ids) id
+    WHERE id IS NOT NULL
+      AND NOT EXISTS (SELECT 1 FROM dw.dim_time t WHERE t.time_id = id)
+  ) y
+  CROSS JOIN LATERAL generate_series(make_date(y.year, 1, 1), make_date(y.year, 12, 31), '1 day') d
+  ON CONFLICT DO NOTHING;
+  GET DIAGNOSTICS added = ROW_COUNT;
+  RETURN added;
+END;
+$$ LANGUAGE plpgsql;
+
 -- Populate dim_time for 2020–2030
-INSERT INTO dw.dim_time (full_date, day, month, quarter, year, is_weekend)
-SELECT
-  date::DATE,
-  EXTRACT(DAY FROM date)::INT,
-  EXTRACT(MONTH FROM date)::INT,
-  EXTRACT(QUARTER FROM date)::INT,
-  EXTRACT(YEAR FROM date)::INT,
-  CASE WHEN EXTRACT(DOW FROM date) IN (0,6) THEN TRUE ELSE FALSE END
-FROM generate_series('2020-01-01'::DATE, '2030-12-31'::DATE, '1 day') date
-ON CONFLICT (full_date) DO NOTHING;
+SELECT dw.extend_dim_time(ARRAY(
+  SELECT year * 10000 + 101 FROM generate_series(2020, 2030) year
+));
 
 -- FallBack Date
-INSERT INTO dw.dim_time (full_date, day, month, quarter, year, is_weekend)
-SELECT
-  '1957-01-01'::DATE,
-  1, 1, 1, 1957,
-  TRUE
-WHERE NOT EXISTS (
-  SELECT 1 FROM dw.dim_time WHERE full_date = '1957-01-01'
-);
+INSERT INTO dw.dim_time (time_id, full_date, day, month, quarter, year, is_weekend)
+VALUES (19570101, '1957-01-01', 1, 1, 1, 1957, TRUE)
+ON CONFLICT DO NOTHING;
+
+-- The fact tables are range partitioned on time_id, one partition per calendar month.
+-- With YYYYMMDD time_ids a month is the range [YYYYMM00, YYYYMM00 + 100).
+-- The loads call this before inserting, to create the partitions of the months their rows
+-- fall into (e.g. dw.fact_expenses_y2024m01); it returns the number of partitions created.
+CREATE OR REPLACE FUNCTION dw.create_fact_partitions(p_table TEXT, p_time_ids INT[])
+RETURNS INT AS $$
+DECLARE
+  month_key INT;
+  partition_name TEXT;
+  created INT := 0;
+BEGIN
+  FOR month_key IN
+    SELECT DISTINCT id / 100 FROM unnest(p_time_ids) id WHERE id IS NOT NULL
+  LOOP
+    partition_name := format('%s_y%sm%s', p_table, month_key / 100, lpad((month_key % 100)::TEXT, 2, '0'));
+    IF to_regclass(format('dw.%I', partition_name)) IS NULL THEN
+      EXECUTE format(
+        'CREATE TABLE dw.%I PARTITION OF dw.%I FOR VALUES FROM (%s) TO (%s)',
+        partition_name, p_table, month_key * 100, month_key * 100 + 100
+      );
+      created := created + 1;
+    END IF;
+  END LOOP;
+  RETURN created;
+END;
+$$ LANGUAGE plpgsql;
 
 -- Employee Fact
 CREATE TABLE IF NOT EXISTS dw.fact_employee (
-  fact_id SERIAL PRIMARY KEY,
+  fact_id SERIAL,
   employee_sk INT REFERENCES dw.dim_employee(employee_sk),
-  time_id INT REFERENCES dw.dim_time(time_id),
+  time_id INT NOT NULL REFERENCES dw.dim_time(time_id),
   salary NUMERIC(12,2),
-  status VARCHAR(20)
-);
+  status VARCHAR(20),
+  job_id UUID,
+  PRIMARY KEY (fact_id, time_id)
+) PARTITION BY RANGE (time_id);
+
+CREATE INDEX IF NOT EXISTS ix_fact_employee_job_id ON dw.fact_employee (job_id);
+CREATE INDEX IF NOT EXISTS ix_fact_employee_employee_sk ON dw.fact_employee (employee_sk, time_id);
+CREATE INDEX IF NOT EXISTS brin_fact_employee_time_id ON dw.fact_employee USING BRIN (time_id);
 
 
 -- FINANCE TABLES
@@ -78,14 +136,26 @@ CREATE TABLE IF NOT EXISTS dw.dim_expense_type (
 
 -- Finance Fact Table
 CREATE TABLE IF NOT EXISTS dw.fact_expenses (
-  fact_id SERIAL PRIMARY KEY,
+  fact_id SERIAL,
   employee_sk INT REFERENCES dw.dim_employee(employee_sk),
   expense_type_id INT REFERENCES dw.dim_expense_type(expense_type_id),
   expense_amount NUMERIC(12,2),
   approved_by TEXT,
-  time_id INT REFERENCES dw.dim_time(time_id),
-  is_refund BOOLEAN
-);
+  time_id INT NOT NULL REFERENCES dw.dim_time(time_id),
+  is_refund BOOLEAN,
+  natural_key_hash TEXT,
+  job_id UUID,
+  PRIMARY KEY (fact_id, time_id)
+) PARTITION BY RANGE (time_id);
+
+-- One row per natural key, loads use ON CONFLICT (natural_key_hash, time_id) DO NOTHING.
+-- The hash covers time_id already; it is in the index because every unique index on a
+-- partitioned table has to include the partition key.
+CREATE UNIQUE INDEX IF NOT EXISTS ux_fact_expenses_natural_key_hash ON dw.fact_expenses (natural_key_hash, time_id);
+CREATE INDEX IF NOT EXISTS ix_fact_expenses_job_id ON dw.fact_expenses (job_id);
+CREATE INDEX IF NOT EXISTS ix_fact_expenses_employee_sk ON dw.fact_expenses (employee_sk);
+CREATE INDEX IF NOT EXISTS ix_fact_expenses_expense_type_id ON dw.fact_expenses (expense_type_id);
+CREATE INDEX IF NOT EXISTS brin_fact_expenses_time_id ON dw.fact_expenses USING BRIN (time_id);
 
 
 -- OPERATIONS TABLES
@@ -105,14 +175,153 @@ CREATE TABLE IF NOT EXISTS dw.dim_location (
 
 -- Downtime Fact
 CREATE TABLE IF NOT EXISTS dw.fact_downtime (
-  fact_id SERIAL PRIMARY KEY,
+  fact_id SERIAL,
   department_id INT REFERENCES dw.dim_department(department_id),
   process_id INT REFERENCES dw.dim_process(process_id),
   location_id INT REFERENCES dw.dim_location(location_id),
-  time_id INT REFERENCES dw.dim_time(time_id),
-  downtime_hours NUMERIC(10,2)
+  time_id INT NOT NULL REFERENCES dw.dim_time(time_id),
+  downtime_hours NUMERIC(10,2),
+  natural_key_hash TEXT,
+  job_id UUID,
+  PRIMARY KEY (fact_id, time_id)
+) PARTITION BY RANGE (time_id);
+
+CREATE UNIQUE INDEX IF NOT EXISTS ux_fact_downtime_natural_key_hash ON dw.fact_downtime (natural_key_hash, time_id);
+CREATE INDEX IF NOT EXISTS ix_fact_downtime_job_id ON dw.fact_downtime (job_id);
+CREATE INDEX IF NOT EXISTS ix_fact_downtime_department_id ON dw.fact_downtime (department_id);
+CREATE INDEX IF NOT EXISTS ix_fact_downtime_process_id ON dw.fact_downtime (process_id);
+CREATE INDEX IF NOT EXISTS ix_fact_downtime_location_id ON dw.fact_downtime (location_id);
+CREATE INDEX IF NOT EXISTS brin_fact_downtime_time_id ON dw.fact_downtime USING BRIN (time_id);
+
+
+-- KPI AGGREGATES
+-- Pre-aggregated facts behind the dw.vw_kpi_* views (04_KPI/KPIs.sql), keyed by time bucket
+-- and dimension ids. The load refreshes only the buckets its job's facts fall into.
+
+-- Monthly expenses per employee department and expense type
+CREATE TABLE IF NOT EXISTS dw.agg_monthly_expenses (
+  year INT NOT NULL,
+  month INT NOT NULL,
+  department_id INT,
+  expense_type_id INT,
+  gross_expense NUMERIC(14,2),
+  gross_rows INT NOT NULL,
+  net_expense NUMERIC(14,2),
+  net_rows INT NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS ix_agg_monthly_expenses_month ON dw.agg_monthly_expenses (year, month);
+
+-- Monthly downtime per department and process
+CREATE TABLE IF NOT EXISTS dw.agg_monthly_downtime (
+  year INT NOT NULL,
+  month INT NOT NULL,
+  department_id INT,
+  process_id INT,
+  downtime_hours NUMERIC(14,2),
+  downtime_rows INT NOT NULL
 );
 
+CREATE INDEX IF NOT EXISTS ix_agg_monthly_downtime_month ON dw.agg_monthly_downtime (year, month);
+
+-- Daily headcount and resignations from the fact_employee snapshots
+CREATE TABLE IF NOT EXISTS dw.agg_daily_headcount (
+  year INT NOT NULL,
+  month INT NOT NULL,
+  day INT NOT NULL,
+  active_headcount INT NOT NULL,
+  resignations INT NOT NULL,
+  PRIMARY KEY (year, month, day)
+);
+
+-- Recompute the aggregate buckets touched by one job's facts (every bucket when p_job_id is NULL).
+-- Ends with a dw.audit_log record (table 'kpi_aggregates') counting the aggregate rows written,
+-- which tells readers such as the KPI cache (kpi.py) that the aggregates have changed.
+CREATE OR REPLACE FUNCTION dw.refresh_kpi_aggregates(p_job_id UUID DEFAULT NULL)
+RETURNS VOID AS $$
+DECLARE
+  written INT := 0;
+  n INT;
+BEGIN
+  DELETE FROM dw.agg_monthly_expenses a
+  WHERE p_job_id IS NULL OR (a.year, a.month) IN (
+    SELECT t.year, t.month FROM dw.fact_expenses f JOIN dw.dim_time t ON f.time_id = t.time_id
+    WHERE f.job_id = p_job_id
+  );
+
+  INSERT INTO dw.agg_monthly_expenses (
+    year, month, department_id, expense_type_id, gross_expense, gross_rows, net_expense, net_rows
+  )
+  SELECT
+    t.year, t.month, e.department_id, f.expense_type_id,
+    SUM(f.expense_amount) FILTER (WHERE f.is_refund = FALSE),
+    COUNT(*) FILTER (WHERE f.is_refund = FALSE),
+    SUM(f.expense_amount),
+    COUNT(*)
+  FROM dw.fact_expenses f
+  JOIN dw.dim_time t ON f.time_id = t.time_id
+  JOIN dw.dim_employee e ON f.employee_sk = e.employee_sk
+  WHERE p_job_id IS NULL OR (t.year, t.month) IN (
+    SELECT t2.year, t2.month FROM dw.fact_expenses f2 JOIN dw.dim_time t2 ON f2.time_id = t2.time_id
+    WHERE f2.job_id = p_job_id
+  )
+  GROUP BY t.year, t.month, e.department_id, f.expense_type_id;
+  GET DIAGNOSTICS n = ROW_COUNT;
+  written := written + n;
+
+  DELETE FROM dw.agg_monthly_downtime a
+  WHERE p_job_id IS NULL OR (a.year, a.month) IN (
+    SELECT t.year, t.month FROM dw.fact_downtime f JOIN dw.dim_time t ON f.time_id = t.time_id
+    WHERE f.job_id = p_job_id
+  );
+
+  INSERT INTO dw.agg_monthly_downtime (
+    year, month, department_id, process_id, downtime_hours, downtime_rows
+  )
+  SELECT
+    t.year, t.month, f.department_id, f.process_id,
+    SUM(f.downtime_hours),
+    COUNT(f.downtime_hours)
+  FROM dw.fact_downtime f
+  JOIN dw.dim_time t ON f.time_id = t.time_id
+  WHERE p_job_id IS NULL OR (t.year, t.month) IN (
+    SELECT t2.year, t2.month FROM dw.fact_downtime f2 JOIN dw.dim_time t2 ON f2.time_id = t2.time_id
+    WHERE f2.job_id = p_job_id
+  )
+  GROUP BY t.year, t.month, f.department_id, f.process_id;
+  GET DIAGNOSTICS n = ROW_COUNT;
+  written := written + n;
+
+  DELETE FROM dw.agg_daily_headcount a
+  WHERE p_job_id IS NULL OR (a.year, a.month, a.day) IN (
+    SELECT t.year, t.month, t.day FROM dw.fact_employee f JOIN dw.dim_time t ON f.time_id = t.time_id
+    WHERE f.job_id = p_job_id
+  );
+
+  INSERT INTO dw.agg_daily_headcount (year, month, day, active_headcount, resignations)
+  SELECT
+    t.year, t.month, t.day,
+    COUNT(DISTINCT f.employee_sk) FILTER (WHERE f.status = 'Active'),
+    COUNT(DISTINCT f.employee_sk) FILTER (WHERE f.status = 'Resigned')
+  FROM dw.fact_employee f
+  JOIN dw.dim_time t ON f.time_id = t.time_id
+  WHERE p_job_id IS NULL OR (t.year, t.month, t.day) IN (
+    SELECT t2.year, t2.month, t2.day FROM dw.fact_employee f2 JOIN dw.dim_time t2 ON f2.time_id = t2.time_id
+    WHERE f2.job_id = p_job_id
+  )
+  GROUP BY t.year, t.month, t.day;
+  GET DIAGNOSTICS n = ROW_COUNT;
+  written := written + n;
+
+  INSERT INTO dw.audit_log (job_id, table_name, etl_stage, rows_processed, rows_failed, status, message)
+  VALUES (
+    p_job_id, 'kpi_aggregates', 'refresh_kpi_aggregates', written, 0, 'success',
+    CASE WHEN p_job_id IS NULL THEN 'Rebuilt every KPI aggregate bucket'
+         ELSE 'Refreshed the KPI aggregate buckets of the job''s facts' END
+  );
+END;
+$$ LANGUAGE plpgsql;
+
 
 -- LOGGING TABLES
 
@@ -138,9 +347,67 @@ CREATE TABLE IF NOT EXISTS dw.data_quality_log (
   row_reference TEXT,
   original_value TEXT,
   issue TEXT,
-  log_timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+  log_timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+  -- Hits of an issue logged as one row (ETL_DQ_COLLAPSE), 1 otherwise
+  occurrences INT NOT NULL DEFAULT 1
+);
+
+-- Per-stage timing, memory and row counts of each ETL run (pipeline: hr, finance,
+-- operations, or sql_load for the load scripts). The Python pipelines write one row per
+-- stage; the load scripts mark their stages with dw.log_stage_metric.
+CREATE TABLE IF NOT EXISTS dw.etl_stage_metrics (
+  metric_id SERIAL PRIMARY KEY,
+  job_id UUID NOT NULL,
+  pipeline VARCHAR(50) NOT NULL,
+  stage VARCHAR(100) NOT NULL,
+  calls INT NOT NULL DEFAULT 1,
+  rows_in BIGINT,
+  rows_out BIGINT,
+  wall_seconds NUMERIC(12,3),
+  cpu_seconds NUMERIC(12,3),
+  peak_rss_delta_kb BIGINT,
+  peak_rss_kb BIGINT,
+  log_timestamp TIMESTAMP DEFAULT clock_timestamp()
 );
 
+CREATE INDEX IF NOT EXISTS ix_etl_stage_metrics_job_id ON dw.etl_stage_metrics (job_id);
+
+-- Record a load-script stage as ending now: its wall time runs from the job's previous mark
+-- for the same pipeline. A script opens with a 'start' mark, which has no wall time of its
+-- own. Rows in are counted from p_source, rows out from the p_target rows tagged with the
+-- job. SET etl.metrics = off skips it, counts included.
+CREATE OR REPLACE FUNCTION dw.log_stage_metric(
+  p_job_id UUID, p_pipeline TEXT, p_stage TEXT, p_source TEXT DEFAULT NULL, p_target TEXT DEFAULT NULL
+)
+RETURNS VOID AS $$
+DECLARE
+  v_previous TIMESTAMP;
+  v_rows_in BIGINT;
+  v_rows_out BIGINT;
+BEGIN
+  IF current_setting('etl.metrics', TRUE) = 'off' THEN
+    RETURN;
+  END IF;
+
+  SELECT MAX(log_timestamp) INTO v_previous
+  FROM dw.etl_stage_metrics
+  WHERE job_id = p_job_id AND pipeline = p_pipeline;
+
+  IF p_source IS NOT NULL THEN
+    EXECUTE format('SELECT COUNT(*) FROM %s', p_source::REGCLASS) INTO v_rows_in;
+  END IF;
+  IF p_target IS NOT NULL THEN
+    EXECUTE format('SELECT COUNT(*) FROM %s WHERE job_id = $1', p_target::REGCLASS) INTO v_rows_out USING p_job_id;
+  END IF;
+
+  INSERT INTO dw.etl_stage_metrics (job_id, pipeline, stage, rows_in, rows_out, wall_seconds)
+  VALUES (
+    p_job_id, p_pipeline, p_stage, v_rows_in, v_rows_out,
+    CASE WHEN p_stage <> 'start' THEN EXTRACT(EPOCH FROM clock_timestamp() - v_previous) END
+  );
+END;
+$$ LANGUAGE plpgsql;
+
 
 
 -- Create schema
@@ -162,6 +429,7 @@ CREATE TABLE stg.staging_employee (
 
 
 -- Staging table for Finance data
+DROP VIEW IF EXISTS stg.finance_fact_rows;
 DROP TABLE IF EXISTS stg.staging_finance;
 
 CREATE TABLE stg.staging_finance (
@@ -170,9 +438,36 @@ CREATE TABLE stg.staging_finance (
   expense_amount NUMERIC(12, 2),
   expense_date TEXT,
   approved_by TEXT,
-  is_refund BOOLEAN
+  is_refund BOOLEAN,
+  expense_type_id INT,
+  row_hash BIGINT
+);
+
+-- Finance rows staged by an earlier load whose EmployeeID was not in dim_employee yet.
+-- Every fact_expenses load retries them, until the employee arrives or the row leaves the source
+CREATE TABLE IF NOT EXISTS stg.pending_finance (
+  employee_id TEXT,
+  expense_type TEXT,
+  expense_amount NUMERIC(12, 2),
+  expense_date TEXT,
+  approved_by TEXT,
+  is_refund BOOLEAN,
+  expense_type_id INT,
+  row_hash BIGINT,
+  pending_since TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+-- The rows a fact_expenses load reads: the staged rows and the pending ones not staged again
+CREATE VIEW stg.finance_fact_rows AS
+SELECT employee_id, expense_type, expense_amount, expense_date, approved_by, is_refund, expense_type_id, row_hash,
+       NULL::TIMESTAMP AS pending_since
+FROM stg.staging_finance
+UNION ALL
+SELECT p.employee_id, p.expense_type, p.expense_amount, p.expense_date, p.approved_by, p.is_refund,
+       p.expense_type_id, p.row_hash, p.pending_since
+FROM stg.pending_finance p
+WHERE NOT EXISTS (SELECT 1 FROM stg.staging_finance s WHERE s.row_hash = p.row_hash);
+
 
 -- Staging Table for Operations
 DROP TABLE IF EXISTS stg.staging_operations;
@@ -182,5 +477,76 @@ CREATE TABLE stg.staging_operations (
   process_name TEXT,
   location_name TEXT,
   process_date TEXT,
-  downtime_hours TEXT
+  downtime_hours NUMERIC(10,2),
+  department_id INT,
+  process_id INT,
+  location_id INT,
+  row_hash BIGINT
+);
+
+
+-- Rows the previous load staged that are gone from the source (delta loads)
+DROP TABLE IF EXISTS stg.staging_deletions;
+
+CREATE TABLE stg.staging_deletions (
+  source_name TEXT,
+  row_hash BIGINT,
+  row_key TEXT
+);
+
+
+-- Change detection state, one fingerprint per source file and one hash per staged row
+CREATE TABLE IF NOT EXISTS stg.source_file_state (
+  source_name TEXT PRIMARY KEY,
+  fingerprint TEXT,
+  row_count INT,
+  job_id UUID,
+  loaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS stg.source_row_state (
+  source_name TEXT,
+  row_hash BIGINT,
+  row_key TEXT,
+  file_hash TEXT
+);
+
+CREATE INDEX IF NOT EXISTS idx_source_row_state_source ON stg.source_row_state (source_name);
+
+-- Every source file each job saw, with its SHA-256, size, rows read and status
+-- ('loaded', 'skipped', 'duplicate', 'removed'); files loaded before are skipped
+CREATE TABLE IF NOT EXISTS stg.source_file_manifest (
+  manifest_id BIGSERIAL PRIMARY KEY,
+  job_id UUID,
+  source_name TEXT NOT NULL,
+  file_path TEXT,
+  file_hash TEXT NOT NULL,
+  file_size BIGINT,
+  row_count INT,
+  status TEXT NOT NULL,
+  processed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_source_file_manifest_source ON stg.source_file_manifest (source_name, file_hash, manifest_id);
+
+-- Hash of every row of each source that has reached the facts, across all loads, for
+-- cross-run duplicate detection; filled by the fact loads from the staged row_hash
+CREATE TABLE IF NOT EXISTS stg.loaded_row_hashes (
+  source_name TEXT NOT NULL,
+  row_hash BIGINT NOT NULL,
+  job_id UUID
+);
+
+CREATE INDEX IF NOT EXISTS idx_loaded_row_hashes_source_hash ON stg.loaded_row_hashes (source_name, row_hash);
+
+-- Running sum and count of known downtime per group, for the Operations pipeline's imputation
+CREATE TABLE IF NOT EXISTS stg.ops_downtime_group_stats (
+  department_name TEXT NOT NULL,
+  process_name TEXT NOT NULL,
+  location_name TEXT NOT NULL,
+  downtime_sum DOUBLE PRECISION NOT NULL,
+  downtime_count BIGINT NOT NULL,
+  job_id UUID,
+  updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (department_name, process_name, location_name)
 );
@@ -0,0 +1,37 @@
+-- 001_fact_natural_key_hash
+-- Adds natural_key_hash (and its unique index) to dw.fact_expenses and dw.fact_downtime
+-- on databases created before combined_dw_schema.sql had the column. Safe to re-run.
+--
+-- The hash is md5 of the fact's natural key as a row literal, the same expression the
+-- loads in 03_load_into_fact_and_dim_tables use:
+--   fact_expenses: employee_id, time_id, expense_type_id, expense_amount, approved_by, is_refund
+--   fact_downtime: department_id, process_id, location_id, time_id, downtime_hours
+
+ALTER TABLE dw.fact_expenses ADD COLUMN IF NOT EXISTS natural_key_hash TEXT;
+ALTER TABLE dw.fact_downtime ADD COLUMN IF NOT EXISTS natural_key_hash TEXT;
+
+-- Backfill
+UPDATE dw.fact_expenses f
+SET natural_key_hash = md5(ROW(e.employee_id, f.time_id, f.expense_type_id, f.expense_amount, f.approved_by, f.is_refund)::TEXT)
+FROM dw.dim_employee e
+WHERE e.employee_sk = f.employee_sk
+  AND f.natural_key_hash IS NULL;
+
+UPDATE dw.fact_downtime
+SET natural_key_hash = md5(ROW(department_id, process_id, location_id, time_id, downtime_hours)::TEXT)
+WHERE natural_key_hash IS NULL;
+
+-- The old NOT EXISTS check let some facts in twice (NULL amounts never compared equal,
+-- repeats inside one load were not checked). Keep the first copy of each.
+DELETE FROM dw.fact_expenses f
+USING dw.fact_expenses d
+WHERE f.natural_key_hash = d.natural_key_hash
+  AND f.fact_id > d.fact_id;
+
+DELETE FROM dw.fact_downtime f
+USING dw.fact_downtime d
+WHERE f.natural_key_hash = d.natural_key_hash
+  AND f.fact_id > d.fact_id;
+
+CREATE UNIQUE INDEX IF NOT EXISTS ux_fact_expenses_natural_key_hash ON dw.fact_expenses (natural_key_hash);
+CREATE UNIQUE INDEX IF NOT EXISTS ux_fact_downtime_natural_key_hash ON dw.fact_downtime (natural_key_hash);
@@ -0,0 +1,9 @@
+-- 002_staging_dimension_ids.sql
+-- The staging pipelines now stage the dimension ids with each row (dim_keys.py) instead of
+-- TL_combine.sql adding the columns and mapping them with UPDATE joins.
+
+ALTER TABLE stg.staging_finance ADD COLUMN IF NOT EXISTS expense_type_id INT;
+
+ALTER TABLE stg.staging_operations ADD COLUMN IF NOT EXISTS department_id INT;
+ALTER TABLE stg.staging_operations ADD COLUMN IF NOT EXISTS process_id INT;
+ALTER TABLE stg.staging_operations ADD COLUMN IF NOT EXISTS location_id INT;
@@ -0,0 +1,121 @@
+-- 003_kpi_aggregates.sql
+-- KPI aggregate tables behind the dw.vw_kpi_* views, refreshed per job by the load scripts.
+-- Facts are tagged with the job that loaded them; rows loaded before this migration keep a
+-- NULL job_id and are covered by the full rebuild at the end.
+
+ALTER TABLE dw.fact_employee ADD COLUMN IF NOT EXISTS job_id UUID;
+ALTER TABLE dw.fact_expenses ADD COLUMN IF NOT EXISTS job_id UUID;
+ALTER TABLE dw.fact_downtime ADD COLUMN IF NOT EXISTS job_id UUID;
+
+CREATE INDEX IF NOT EXISTS ix_fact_employee_job_id ON dw.fact_employee (job_id);
+CREATE INDEX IF NOT EXISTS ix_fact_expenses_job_id ON dw.fact_expenses (job_id);
+CREATE INDEX IF NOT EXISTS ix_fact_downtime_job_id ON dw.fact_downtime (job_id);
+
+-- Monthly expenses per employee department and expense type
+CREATE TABLE IF NOT EXISTS dw.agg_monthly_expenses (
+  year INT NOT NULL,
+  month INT NOT NULL,
+  department_id INT,
+  expense_type_id INT,
+  gross_expense NUMERIC(14,2),
+  gross_rows INT NOT NULL,
+  net_expense NUMERIC(14,2),
+  net_rows INT NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS ix_agg_monthly_expenses_month ON dw.agg_monthly_expenses (year, month);
+
+-- Monthly downtime per department and process
+CREATE TABLE IF NOT EXISTS dw.agg_monthly_downtime (
+  year INT NOT NULL,
+  month INT NOT NULL,
+  department_id INT,
+  process_id INT,
+  downtime_hours NUMERIC(14,2),
+  downtime_rows INT NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS ix_agg_monthly_downtime_month ON dw.agg_monthly_downtime (year, month);
+
+-- Daily headcount and resignations from the fact_employee snapshots
+CREATE TABLE IF NOT EXISTS dw.agg_daily_headcount (
+  year INT NOT NULL,
+  month INT NOT NULL,
+  day INT NOT NULL,
+  active_headcount INT NOT NULL,
+  resignations INT NOT NULL,
+  PRIMARY KEY (year, month, day)
+);
+
+-- Recompute the aggregate buckets touched by one job's facts (every bucket when p_job_id is NULL)
+CREATE OR REPLACE FUNCTION dw.refresh_kpi_aggregates(p_job_id UUID DEFAULT NULL)
+RETURNS VOID AS $$
+BEGIN
+  DELETE FROM dw.agg_monthly_expenses a
+  WHERE p_job_id IS NULL OR (a.year, a.month) IN (
+    SELECT t.year, t.month FROM dw.fact_expenses f JOIN dw.dim_time t ON f.time_id = t.time_id
+    WHERE f.job_id = p_job_id
+  );
+
+  INSERT INTO dw.agg_monthly_expenses (
+    year, month, department_id, expense_type_id, gross_expense, gross_rows, net_expense, net_rows
+  )
+  SELECT
+    t.year, t.month, e.department_id, f.expense_type_id,
+    SUM(f.expense_amount) FILTER (WHERE f.is_refund = FALSE),
+    COUNT(*) FILTER (WHERE f.is_refund = FALSE),
+    SUM(f.expense_amount),
+    COUNT(*)
+  FROM dw.fact_expenses f
+  JOIN dw.dim_time t ON f.time_id = t.time_id
+  JOIN dw.dim_employee e ON f.employee_sk = e.employee_sk
+  WHERE p_job_id IS NULL OR (t.year, t.month) IN (
+    SELECT t2.year, t2.month FROM dw.fact_expenses f2 JOIN dw.dim_time t2 ON f2.time_id = t2.time_id
+    WHERE f2.job_id = p_job_id
+  )
+  GROUP BY t.year, t.month, e.department_id, f.expense_type_id;
+
+  DELETE FROM dw.agg_monthly_downtime a
+  WHERE p_job_id IS NULL OR (a.year, a.month) IN (
+    SELECT t.year, t.month FROM dw.fact_downtime f JOIN dw.dim_time t ON f.time_id = t.time_id
+    WHERE f.job_id = p_job_id
+  );
+
+  INSERT INTO dw.agg_monthly_downtime (
+    year, month, department_id, process_id, downtime_hours, downtime_rows
+  )
+  SELECT
+    t.year, t.month, f.department_id, f.process_id,
+    SUM(f.downtime_hours),
+    COUNT(f.downtime_hours)
+  FROM dw.fact_downtime f
+  JOIN dw.dim_time t ON f.time_id = t.time_id
+  WHERE p_job_id IS NULL OR (t.year, t.month) IN (
+    SELECT t2.year, t2.month FROM dw.fact_downtime f2 JOIN dw.dim_time t2 ON f2.time_id = t2.time_id
+    WHERE f2.job_id = p_job_id
+  )
+  GROUP BY t.year, t.month, f.department_id, f.process_id;
+
+  DELETE FROM dw.agg_daily_headcount a
+  WHERE p_job_id IS NULL OR (a.year, a.month, a.day) IN (
+    SELECT t.year, t.month, t.day FROM dw.fact_employee f JOIN dw.dim_time t ON f.time_id = t.time_id
+    WHERE f.job_id = p_job_id
+  );
+
+  INSERT INTO dw.agg_daily_headcount (year, month, day, active_headcount, resignations)
+  SELECT
+    t.year, t.month, t.day,
+    COUNT(DISTINCT f.employee_sk) FILTER (WHERE f.status = 'Active'),
+    COUNT(DISTINCT f.employee_sk) FILTER (WHERE f.status = 'Resigned')
+  FROM dw.fact_employee f
+  JOIN dw.dim_time t ON f.time_id = t.time_id
+  WHERE p_job_id IS NULL OR (t.year, t.month, t.day) IN (
+    SELECT t2.year, t2.month, t2.day FROM dw.fact_employee f2 JOIN dw.dim_time t2 ON f2.time_id = t2.time_id
+    WHERE f2.job_id = p_job_id
+  )
+  GROUP BY t.year, t.month, t.day;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Build every bucket once, then re-create the views: \i <path>/04_KPI/KPIs.sql
+SELECT dw.refresh_kpi_aggregates();
@@ -0,0 +1,147 @@
+-- 004_partition_fact_tables.sql
+-- Turns dw.fact_employee, dw.fact_expenses and dw.fact_downtime into tables range
+-- partitioned on time_id (one partition per month), keeping every row and fact_id, and
+-- adds the B-tree / BRIN indexes of combined_dw_schema.sql. Tables that are already
+-- partitioned are left alone. Runs in one transaction: any failure leaves the old tables.
+
+BEGIN;
+
+-- The fact tables are range partitioned on time_id, one partition per calendar month.
+-- dim_time is filled in date order, so the time_ids of a month form one contiguous range.
+-- The loads call this before inserting, to create the partitions of the months their rows
+-- fall into (e.g. dw.fact_expenses_y2024m01); it returns the number of partitions created.
+CREATE OR REPLACE FUNCTION dw.create_fact_partitions(p_table TEXT, p_time_ids INT[])
+RETURNS INT AS $$
+DECLARE
+  m RECORD;
+  partition_name TEXT;
+  created INT := 0;
+BEGIN
+  FOR m IN
+    SELECT t.year, t.month, MIN(t.time_id) AS from_id, MAX(t.time_id) + 1 AS to_id
+    FROM dw.dim_time t
+    WHERE (t.year, t.month) IN (
+      SELECT year, month FROM dw.dim_time WHERE time_id = ANY(p_time_ids)
+    )
+    GROUP BY t.year, t.month
+  LOOP
+    partition_name := format('%s_y%sm%s', p_table, m.year, lpad(m.month::TEXT, 2, '0'));
+    IF to_regclass(format('dw.%I', partition_name)) IS NULL THEN
+      EXECUTE format(
+        'CREATE TABLE dw.%I PARTITION OF dw.%I FOR VALUES FROM (%s) TO (%s)',
+        partition_name, p_table, m.from_id, m.to_id
+      );
+      created := created + 1;
+    END IF;
+  END LOOP;
+  RETURN created;
+END;
+$$ LANGUAGE plpgsql;
+
+-- fact_employee
+DO $$
+BEGIN
+  IF NOT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = 'dw.fact_employee'::regclass) THEN
+    ALTER TABLE dw.fact_employee RENAME TO fact_employee_unpartitioned;
+    ALTER TABLE dw.fact_employee_unpartitioned RENAME CONSTRAINT fact_employee_pkey TO fact_employee_unpartitioned_pkey;
+    DROP INDEX IF EXISTS dw.ix_fact_employee_job_id;
+    CREATE TABLE dw.fact_employee (
+      fact_id INT NOT NULL DEFAULT nextval('dw.fact_employee_fact_id_seq'),
+      employee_sk INT REFERENCES dw.dim_employee(employee_sk),
+      time_id INT NOT NULL REFERENCES dw.dim_time(time_id),
+      salary NUMERIC(12,2),
+      status VARCHAR(20),
+      job_id UUID,
+      PRIMARY KEY (fact_id, time_id)
+    ) PARTITION BY RANGE (time_id);
+    ALTER SEQUENCE dw.fact_employee_fact_id_seq OWNED BY dw.fact_employee.fact_id;
+    CREATE INDEX ix_fact_employee_job_id ON dw.fact_employee (job_id);
+    CREATE INDEX ix_fact_employee_employee_sk ON dw.fact_employee (employee_sk, time_id);
+    CREATE INDEX brin_fact_employee_time_id ON dw.fact_employee USING BRIN (time_id);
+    PERFORM dw.create_fact_partitions('fact_employee', ARRAY(SELECT DISTINCT time_id FROM dw.fact_employee_unpartitioned));
+    INSERT INTO dw.fact_employee (fact_id, employee_sk, time_id, salary, status, job_id)
+    SELECT fact_id, employee_sk, time_id, salary, status, job_id FROM dw.fact_employee_unpartitioned;
+    -- The salary KPI view reads fact_employee; point it at the new table (keeps its grants)
+    IF to_regclass('dw.vw_kpi_avg_salary_by_gender') IS NOT NULL THEN
+      CREATE OR REPLACE VIEW dw.vw_kpi_avg_salary_by_gender AS
+      SELECT
+        e.gender,
+        ROUND(AVG(f.salary), 2) AS avg_salary
+      FROM dw.fact_employee f
+      JOIN dw.dim_employee e ON f.employee_sk = e.employee_sk
+      WHERE e.is_current = TRUE
+      GROUP BY e.gender;
+    END IF;
+    DROP TABLE dw.fact_employee_unpartitioned;
+  END IF;
+END $$;
+
+-- fact_expenses
+DO $$
+BEGIN
+  IF NOT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = 'dw.fact_expenses'::regclass) THEN
+    ALTER TABLE dw.fact_expenses RENAME TO fact_expenses_unpartitioned;
+    ALTER TABLE dw.fact_expenses_unpartitioned RENAME CONSTRAINT fact_expenses_pkey TO fact_expenses_unpartitioned_pkey;
+    DROP INDEX IF EXISTS dw.ux_fact_expenses_natural_key_hash;
+    DROP INDEX IF EXISTS dw.ix_fact_expenses_job_id;
+    CREATE TABLE dw.fact_expenses (
+      fact_id INT NOT NULL DEFAULT nextval('dw.fact_expenses_fact_id_seq'),
+      employee_sk INT REFERENCES dw.dim_employee(employee_sk),
+      expense_type_id INT REFERENCES dw.dim_expense_type(expense_type_id),
+      expense_amount NUMERIC(12,2),
+      approved_by TEXT,
+      time_id INT NOT NULL REFERENCES dw.dim_time(time_id),
+      is_refund BOOLEAN,
+      natural_key_hash TEXT,
+      job_id UUID,
+      PRIMARY KEY (fact_id, time_id)
+    ) PARTITION BY RANGE (time_id);
+    ALTER SEQUENCE dw.fact_expenses_fact_id_seq OWNED BY dw.fact_expenses.fact_id;
+    CREATE UNIQUE INDEX ux_fact_expenses_natural_key_hash ON dw.fact_expenses (natural_key_hash, time_id);
+    CREATE INDEX ix_fact_expenses_job_id ON dw.fact_expenses (job_id);
+    CREATE INDEX ix_fact_expenses_employee_sk ON dw.fact_expenses (employee_sk);
+    CREATE INDEX ix_fact_expenses_expense_type_id ON dw.fact_expenses (expense_type_id);
+    CREATE INDEX brin_fact_expenses_time_id ON dw.fact_expenses USING BRIN (time_id);
+    PERFORM dw.create_fact_partitions('fact_expenses', ARRAY(SELECT DISTINCT time_id FROM dw.fact_expenses_unpartitioned));
+    INSERT INTO dw.fact_expenses (fact_id, employee_sk, expense_type_id, expense_amount, approved_by, time_id, is_refund, natural_key_hash, job_id)
+    SELECT fact_id, employee_sk, expense_type_id, expense_amount, approved_by, time_id, is_refund, natural_key_hash, job_id FROM dw.fact_expenses_unpartitioned;
+
+    DROP TABLE dw.fact_expenses_unpartitioned;
+  END IF;
+END $$;
+
+-- fact_downtime
+DO $$
+BEGIN
+  IF NOT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = 'dw.fact_downtime'::regclass) THEN
+    ALTER TABLE dw.fact_downtime RENAME TO fact_downtime_unpartitioned;
+    ALTER TABLE dw.fact_downtime_unpartitioned RENAME CONSTRAINT fact_downtime_pkey TO fact_downtime_unpartitioned_pkey;
+    DROP INDEX IF EXISTS dw.ux_fact_downtime_natural_key_hash;
+    DROP INDEX IF EXISTS dw.ix_fact_downtime_job_id;
+    CREATE TABLE dw.fact_downtime (
+      fact_id INT NOT NULL DEFAULT nextval('dw.fact_downtime_fact_id_seq'),
+      department_id INT REFERENCES dw.dim_department(department_id),
+      process_id INT REFERENCES dw.dim_process(process_id),
+      location_id INT REFERENCES dw.dim_location(location_id),
+      time_id INT NOT NULL REFERENCES dw.dim_time(time_id),
+      downtime_hours NUMERIC(10,2),
+      natural_key_hash TEXT,
+      job_id UUID,
+      PRIMARY KEY (fact_id, time_id)
+    ) PARTITION BY RANGE (time_id);
+    ALTER SEQUENCE dw.fact_downtime_fact_id_seq OWNED BY dw.fact_downtime.fact_id;
+    CREATE UNIQUE INDEX ux_fact_downtime_natural_key_hash ON dw.fact_downtime (natural_key_hash, time_id);
+    CREATE INDEX ix_fact_downtime_job_id ON dw.fact_downtime (job_id);
+    CREATE INDEX ix_fact_downtime_department_id ON dw.fact_downtime (department_id);
+    CREATE INDEX ix_fact_downtime_process_id ON dw.fact_downtime (process_id);
+    CREATE INDEX ix_fact_downtime_location_id ON dw.fact_downtime (location_id);
+    CREATE INDEX brin_fact_downtime_time_id ON dw.fact_downtime USING BRIN (time_id);
+    PERFORM dw.create_fact_partitions('fact_downtime', ARRAY(SELECT DISTINCT time_id FROM dw.fact_downtime_unpartitioned));
+    INSERT INTO dw.fact_downtime (fact_id, department_id, process_id, location_id, time_id, downtime_hours, natural_key_hash, job_id)
+    SELECT fact_id, department_id, process_id, location_id, time_id, downtime_hours, natural_key_hash, job_id FROM dw.fact_downtime_unpartitioned;
+
+    DROP TABLE dw.fact_downtime_unpartitioned;
+  END IF;
+END $$;
+
+COMMIT;
@@ -0,0 +1,58 @@
+-- 005_etl_stage_metrics.sql
+-- Per-stage metrics table of the ETL runs and the marker function the load scripts call.
+
+-- Per-stage timing, memory and row counts of each ETL run (pipeline: hr, finance,
+-- operations, or sql_load for the load scripts). The Python pipelines write one row per
+-- stage; the load scripts mark their stages with dw.log_stage_metric.
+CREATE TABLE IF NOT EXISTS dw.etl_stage_metrics (
+  metric_id SERIAL PRIMARY KEY,
+  job_id UUID NOT NULL,
+  pipeline VARCHAR(50) NOT NULL,
+  stage VARCHAR(100) NOT NULL,
+  calls INT NOT NULL DEFAULT 1,
+  rows_in BIGINT,
+  rows_out BIGINT,
+  wall_seconds NUMERIC(12,3),
+  cpu_seconds NUMERIC(12,3),
+  peak_rss_delta_kb BIGINT,
+  peak_rss_kb BIGINT,
+  log_timestamp TIMESTAMP DEFAULT clock_timestamp()
+);
+
+CREATE INDEX IF NOT EXISTS ix_etl_stage_metrics_job_id ON dw.etl_stage_metrics (job_id);
+
+-- Record a load-script stage as ending now: its wall time runs from the job's previous mark
+-- for the same pipeline. A script opens with a 'start' mark, which has no wall time of its
+-- own. Rows in are counted from p_source, rows out from the p_target rows tagged with the
+-- job. SET etl.metrics = off skips it, counts included.
+CREATE OR REPLACE FUNCTION dw.log_stage_metric(
+  p_job_id UUID, p_pipeline TEXT, p_stage TEXT, p_source TEXT DEFAULT NULL, p_target TEXT DEFAULT NULL
+)
+RETURNS VOID AS $$
+DECLARE
+  v_previous TIMESTAMP;
+  v_rows_in BIGINT;
+  v_rows_out BIGINT;
+BEGIN
+  IF current_setting('etl.metrics', TRUE) = 'off' THEN
+    RETURN;
+  END IF;
+
+  SELECT MAX(log_timestamp) INTO v_previous
+  FROM dw.etl_stage_metrics
+  WHERE job_id = p_job_id AND pipeline = p_pipeline;
+
+  IF p_source IS NOT NULL THEN
+    EXECUTE format('SELECT COUNT(*) FROM %s', p_source::REGCLASS) INTO v_rows_in;
+  END IF;
+  IF p_target IS NOT NULL THEN
+    EXECUTE format('SELECT COUNT(*) FROM %s WHERE job_id = $1', p_target::REGCLASS) INTO v_rows_out USING p_job_id;
+  END IF;
+
+  INSERT INTO dw.etl_stage_metrics (job_id, pipeline, stage, rows_in, rows_out, wall_seconds)
+  VALUES (
+    p_job_id, p_pipeline, p_stage, v_rows_in, v_rows_out,
+    CASE WHEN p_stage <> 'start' THEN EXTRACT(EPOCH FROM clock_timestamp() - v_previous) END
+  );
+END;
+$$ LANGUAGE plpgsql;
@@ -0,0 +1,4 @@
+-- 006_dq_log_occurrences.sql
+-- Hit count of a data_quality_log row, for identical issues the pipelines collapse into one.
+
+ALTER TABLE dw.data_quality_log ADD COLUMN IF NOT EXISTS occurrences INT NOT NULL DEFAULT 1;
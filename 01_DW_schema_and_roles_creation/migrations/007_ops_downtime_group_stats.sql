@@ -0,0 +1,17 @@
+-- 007_ops_downtime_group_stats.sql
+-- Stored downtime totals per (department, process, location) for the Operations imputation.
+-- Starts empty: the next Operations run adds the stats of the rows it stages as new, so
+-- run it with ETL_FULL_REFRESH=1 after clearing stg.source_row_state for raw_operations
+-- to count a file that is already loaded.
+
+-- Running sum and count of known downtime per group, for the Operations pipeline's imputation
+CREATE TABLE IF NOT EXISTS stg.ops_downtime_group_stats (
+  department_name TEXT NOT NULL,
+  process_name TEXT NOT NULL,
+  location_name TEXT NOT NULL,
+  downtime_sum DOUBLE PRECISION NOT NULL,
+  downtime_count BIGINT NOT NULL,
+  job_id UUID,
+  updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (department_name, process_name, location_name)
+);
@@ -0,0 +1,22 @@
+-- 008_loaded_row_hashes.sql
+-- Persisted row-hash index per source for cross-run duplicate detection in the pipelines.
+-- Seeded with the rows of each source's last load (stg.source_row_state), which is all
+-- the history the pipelines kept before.
+
+-- Hash of every row each source has sent, across all loads, for cross-run duplicate detection
+CREATE TABLE IF NOT EXISTS stg.loaded_row_hashes (
+  source_name TEXT NOT NULL,
+  row_hash BIGINT NOT NULL,
+  job_id UUID
+);
+
+CREATE INDEX IF NOT EXISTS idx_loaded_row_hashes_source ON stg.loaded_row_hashes (source_name);
+
+INSERT INTO stg.loaded_row_hashes (source_name, row_hash)
+SELECT DISTINCT s.source_name, s.row_hash
+FROM stg.source_row_state s
+WHERE s.source_name IN ('raw_finance', 'raw_operations')
+  AND NOT EXISTS (
+    SELECT 1 FROM stg.loaded_row_hashes l
+    WHERE l.source_name = s.source_name AND l.row_hash = s.row_hash
+  );
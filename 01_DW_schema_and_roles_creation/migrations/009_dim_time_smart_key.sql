@@ -0,0 +1,132 @@
+-- 009_dim_time_smart_key.sql
+-- dw.dim_time.time_id becomes the date as a YYYYMMDD integer instead of a SERIAL, so the
+-- loads compute it with dw.date_key() and dim_time grows with dw.extend_dim_time().
+-- Existing fact rows are moved to the new keys: each fact table gets new month partitions
+-- with YYYYMMDD bounds, its rows are re-keyed into them (fact_ids kept), and the
+-- natural_key_hash of fact_expenses / fact_downtime is recomputed, since it covers time_id.
+-- A dim_time that is already keyed by date is left alone. Runs in one transaction.
+
+BEGIN;
+
+CREATE OR REPLACE FUNCTION dw.date_key(p_date DATE)
+RETURNS INT AS $$
+  SELECT (EXTRACT(YEAR FROM p_date) * 10000 + EXTRACT(MONTH FROM p_date) * 100 + EXTRACT(DAY FROM p_date))::INT
+$$ LANGUAGE sql IMMUTABLE;
+
+-- Adds every day of the years of p_time_ids that dim_time does not have yet. The loads call
+-- this with the time_ids of their rows before inserting, so a date outside the years
+-- loaded so far extends dim_time instead of being dropped; it returns the number of days added.
+CREATE OR REPLACE FUNCTION dw.extend_dim_time(p_time_ids INT[])
+RETURNS INT AS $$
+DECLARE
+  added INT;
+BEGIN
+  INSERT INTO dw.dim_time (time_id, full_date, day, month, quarter, year, is_weekend)
+  SELECT
+    dw.date_key(d::DATE),
+    d::DATE,
+    EXTRACT(DAY FROM d)::INT,
+    EXTRACT(MONTH FROM d)::INT,
+    EXTRACT(QUARTER FROM d)::INT,
+    EXTRACT(YEAR FROM d)::INT,
+    EXTRACT(DOW FROM d) IN (0,6)
+  FROM (
+    SELECT DISTINCT id / 10000 AS year
+    FROM unnest(p_time_ids) id
+    WHERE id IS NOT NULL
+      AND NOT EXISTS (SELECT 1 FROM dw.dim_time t WHERE t.time_id = id)
+  ) y
+  CROSS JOIN LATERAL generate_series(make_date(y.year, 1, 1), make_date(y.year, 12, 31), '1 day') d
+  ON CONFLICT DO NOTHING;
+  GET DIAGNOSTICS added = ROW_COUNT;
+  RETURN added;
+END;
+$$ LANGUAGE plpgsql;
+
+-- The fact tables are range partitioned on time_id, one partition per calendar month.
+-- With YYYYMMDD time_ids a month is the range [YYYYMM00, YYYYMM00 + 100).
+-- The loads call this before inserting, to create the partitions of the months their rows
+-- fall into (e.g. dw.fact_expenses_y2024m01); it returns the number of partitions created.
+CREATE OR REPLACE FUNCTION dw.create_fact_partitions(p_table TEXT, p_time_ids INT[])
+RETURNS INT AS $$
+DECLARE
+  month_key INT;
+  partition_name TEXT;
+  created INT := 0;
+BEGIN
+  FOR month_key IN
+    SELECT DISTINCT id / 100 FROM unnest(p_time_ids) id WHERE id IS NOT NULL
+  LOOP
+    partition_name := format('%s_y%sm%s', p_table, month_key / 100, lpad((month_key % 100)::TEXT, 2, '0'));
+    IF to_regclass(format('dw.%I', partition_name)) IS NULL THEN
+      EXECUTE format(
+        'CREATE TABLE dw.%I PARTITION OF dw.%I FOR VALUES FROM (%s) TO (%s)',
+        partition_name, p_table, month_key * 100, month_key * 100 + 100
+      );
+      created := created + 1;
+    END IF;
+  END LOOP;
+  RETURN created;
+END;
+$$ LANGUAGE plpgsql;
+
+DO $$
+DECLARE
+  fact TEXT;
+  p RECORD;
+BEGIN
+  IF NOT EXISTS (SELECT 1 FROM dw.dim_time WHERE time_id <> dw.date_key(full_date)) THEN
+    RETURN;
+  END IF;
+
+  CREATE TEMP TABLE dim_time_keys ON COMMIT DROP AS
+  SELECT time_id AS old_id, dw.date_key(full_date) AS new_id FROM dw.dim_time;
+
+  FOREACH fact IN ARRAY ARRAY['fact_employee', 'fact_expenses', 'fact_downtime'] LOOP
+    EXECUTE format('ALTER TABLE dw.%I DROP CONSTRAINT IF EXISTS %I', fact, fact || '_time_id_fkey');
+
+    -- Old and new keys never overlap (serial ids vs. YYYYMMDD), so the new month partitions
+    -- can sit next to the old ones while the rows move over
+    FOR p IN
+      SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+      WHERE i.inhparent = format('dw.%I', fact)::regclass
+    LOOP
+      EXECUTE format('ALTER TABLE dw.%I RENAME TO %I', p.relname, p.relname || '_serial');
+    END LOOP;
+
+    EXECUTE format(
+      'SELECT dw.create_fact_partitions(%L, ARRAY(SELECT DISTINCT k.new_id FROM dw.%I f JOIN dim_time_keys k ON k.old_id = f.time_id))',
+      fact, fact
+    );
+    EXECUTE format('UPDATE dw.%I f SET time_id = k.new_id FROM dim_time_keys k WHERE k.old_id = f.time_id', fact);
+
+    FOR p IN
+      SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+      WHERE i.inhparent = format('dw.%I', fact)::regclass AND c.relname LIKE '%\_serial'
+    LOOP
+      EXECUTE format('DROP TABLE dw.%I', p.relname);
+    END LOOP;
+  END LOOP;
+
+  -- Same expressions as the loads in TL_combine.sql
+  UPDATE dw.fact_expenses f
+  SET natural_key_hash = md5(ROW(e.employee_id, f.time_id, f.expense_type_id, f.expense_amount, f.approved_by, f.is_refund)::TEXT)
+  FROM dw.dim_employee e
+  WHERE e.employee_sk = f.employee_sk;
+
+  UPDATE dw.fact_downtime f
+  SET natural_key_hash = md5(ROW(f.department_id, f.process_id, f.location_id, f.time_id, f.downtime_hours)::TEXT);
+
+  UPDATE dw.dim_time SET time_id = dw.date_key(full_date);
+  ALTER TABLE dw.dim_time ALTER COLUMN time_id DROP DEFAULT;
+  DROP SEQUENCE IF EXISTS dw.dim_time_time_id_seq;
+
+  FOREACH fact IN ARRAY ARRAY['fact_employee', 'fact_expenses', 'fact_downtime'] LOOP
+    EXECUTE format(
+      'ALTER TABLE dw.%I ADD CONSTRAINT %I FOREIGN KEY (time_id) REFERENCES dw.dim_time(time_id)',
+      fact, fact || '_time_id_fkey'
+    );
+  END LOOP;
+END $$;
+
+COMMIT;
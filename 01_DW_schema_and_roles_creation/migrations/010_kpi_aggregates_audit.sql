@@ -0,0 +1,91 @@
+-- 010_kpi_aggregates_audit.sql
+-- dw.refresh_kpi_aggregates() now ends with a dw.audit_log record (table 'kpi_aggregates'),
+-- so readers of the aggregates, like the KPI cache in kpi.py, can tell when they changed.
+
+-- Recompute the aggregate buckets touched by one job's facts (every bucket when p_job_id is NULL).
+-- Ends with a dw.audit_log record (table 'kpi_aggregates') counting the aggregate rows written,
+-- which tells readers such as the KPI cache (kpi.py) that the aggregates have changed.
+CREATE OR REPLACE FUNCTION dw.refresh_kpi_aggregates(p_job_id UUID DEFAULT NULL)
+RETURNS VOID AS $$
+DECLARE
+  written INT := 0;
+  n INT;
+BEGIN
+  DELETE FROM dw.agg_monthly_expenses a
+  WHERE p_job_id IS NULL OR (a.year, a.month) IN (
+    SELECT t.year, t.month FROM dw.fact_expenses f JOIN dw.dim_time t ON f.time_id = t.time_id
+    WHERE f.job_id = p_job_id
+  );
+
+  INSERT INTO dw.agg_monthly_expenses (
+    year, month, department_id, expense_type_id, gross_expense, gross_rows, net_expense, net_rows
+  )
+  SELECT
+    t.year, t.month, e.department_id, f.expense_type_id,
+    SUM(f.expense_amount) FILTER (WHERE f.is_refund = FALSE),
+    COUNT(*) FILTER (WHERE f.is_refund = FALSE),
+    SUM(f.expense_amount),
+    COUNT(*)
+  FROM dw.fact_expenses f
+  JOIN dw.dim_time t ON f.time_id = t.time_id
+  JOIN dw.dim_employee e ON f.employee_sk = e.employee_sk
+  WHERE p_job_id IS NULL OR (t.year, t.month) IN (
+    SELECT t2.year, t2.month FROM dw.fact_expenses f2 JOIN dw.dim_time t2 ON f2.time_id = t2.time_id
+    WHERE f2.job_id = p_job_id
+  )
+  GROUP BY t.year, t.month, e.department_id, f.expense_type_id;
+  GET DIAGNOSTICS n = ROW_COUNT;
+  written := written + n;
+
+  DELETE FROM dw.agg_monthly_downtime a
+  WHERE p_job_id IS NULL OR (a.year, a.month) IN (
+    SELECT t.year, t.month FROM dw.fact_downtime f JOIN dw.dim_time t ON f.time_id = t.time_id
+    WHERE f.job_id = p_job_id
+  );
+
+  INSERT INTO dw.agg_monthly_downtime (
+    year, month, department_id, process_id, downtime_hours, downtime_rows
+  )
+  SELECT
+    t.year, t.month, f.department_id, f.process_id,
+    SUM(f.downtime_hours),
+    COUNT(f.downtime_hours)
+  FROM dw.fact_downtime f
+  JOIN dw.dim_time t ON f.time_id = t.time_id
+  WHERE p_job_id IS NULL OR (t.year, t.month) IN (
+    SELECT t2.year, t2.month FROM dw.fact_downtime f2 JOIN dw.dim_time t2 ON f2.time_id = t2.time_id
+    WHERE f2.job_id = p_job_id
+  )
+  GROUP BY t.year, t.month, f.department_id, f.process_id;
+  GET DIAGNOSTICS n = ROW_COUNT;
+  written := written + n;
+
+  DELETE FROM dw.agg_daily_headcount a
+  WHERE p_job_id IS NULL OR (a.year, a.month, a.day) IN (
+    SELECT t.year, t.month, t.day FROM dw.fact_employee f JOIN dw.dim_time t ON f.time_id = t.time_id
+    WHERE f.job_id = p_job_id
+  );
+
+  INSERT INTO dw.agg_daily_headcount (year, month, day, active_headcount, resignations)
+  SELECT
+    t.year, t.month, t.day,
+    COUNT(DISTINCT f.employee_sk) FILTER (WHERE f.status = 'Active'),
+    COUNT(DISTINCT f.employee_sk) FILTER (WHERE f.status = 'Resigned')
+  FROM dw.fact_employee f
+  JOIN dw.dim_time t ON f.time_id = t.time_id
+  WHERE p_job_id IS NULL OR (t.year, t.month, t.day) IN (
+    SELECT t2.year, t2.month, t2.day FROM dw.fact_employee f2 JOIN dw.dim_time t2 ON f2.time_id = t2.time_id
+    WHERE f2.job_id = p_job_id
+  )
+  GROUP BY t.year, t.month, t.day;
+  GET DIAGNOSTICS n = ROW_COUNT;
+  written := written + n;
+
+  INSERT INTO dw.audit_log (job_id, table_name, etl_stage, rows_processed, rows_failed, status, message)
+  VALUES (
+    p_job_id, 'kpi_aggregates', 'refresh_kpi_aggregates', written, 0, 'success',
+    CASE WHEN p_job_id IS NULL THEN 'Rebuilt every KPI aggregate bucket'
+         ELSE 'Refreshed the KPI aggregate buckets of the job''s facts' END
+  );
+END;
+$$ LANGUAGE plpgsql;
@@ -0,0 +1,35 @@
+-- 011_source_file_manifest.sql
+-- Multi-file sources for the staging pipelines: stg.source_file_manifest records the files
+-- each job read or skipped, and stg.source_row_state keeps the file each row came from.
+-- Seeded with each source's last load (stg.source_file_state), so the file loaded last
+-- is skipped as before and its rows carry over when more files join it.
+
+ALTER TABLE stg.source_row_state ADD COLUMN IF NOT EXISTS file_hash TEXT;
+
+-- Every source file each job saw, with its SHA-256, size, rows read and status
+-- ('loaded', 'skipped', 'duplicate', 'removed'); files loaded before are skipped
+CREATE TABLE IF NOT EXISTS stg.source_file_manifest (
+  manifest_id BIGSERIAL PRIMARY KEY,
+  job_id UUID,
+  source_name TEXT NOT NULL,
+  file_path TEXT,
+  file_hash TEXT NOT NULL,
+  file_size BIGINT,
+  row_count INT,
+  status TEXT NOT NULL,
+  processed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_source_file_manifest_source ON stg.source_file_manifest (source_name, file_hash, manifest_id);
+
+UPDATE stg.source_row_state r
+SET file_hash = f.fingerprint
+FROM stg.source_file_state f
+WHERE f.source_name = r.source_name
+  AND r.file_hash IS NULL;
+
+INSERT INTO stg.source_file_manifest (job_id, source_name, file_hash, row_count, status, processed_at)
+SELECT f.job_id, f.source_name, f.fingerprint, f.row_count, 'loaded', f.loaded_at
+FROM stg.source_file_state f
+WHERE f.fingerprint IS NOT NULL
+  AND NOT EXISTS (SELECT 1 FROM stg.source_file_manifest m WHERE m.source_name = f.source_name);
@@ -0,0 +1,37 @@
+-- 012_pending_finance_rows.sql
+-- Finance rows whose employee arrives late. Delta loads stage a row once, so a row whose
+-- EmployeeID was not in dim_employee at its load never reached fact_expenses. Such rows
+-- are now kept in stg.pending_finance and retried by every fact_expenses load, which reads
+-- staging and the pending rows through stg.finance_fact_rows. Staged rows carry their row
+-- hash, so a pending row staged again (full refresh) or deleted from the source is known.
+-- The rows still in stg.staging_finance are picked up by the next load. Rows an earlier
+-- delta load staged and the fact load dropped are only found again by one full refresh
+-- of the Finance pipeline (ETL_FULL_REFRESH=1).
+
+ALTER TABLE stg.staging_finance ADD COLUMN IF NOT EXISTS row_hash BIGINT;
+
+-- Finance rows staged by an earlier load whose EmployeeID was not in dim_employee yet.
+-- Every fact_expenses load retries them, until the employee arrives or the row leaves the source
+CREATE TABLE IF NOT EXISTS stg.pending_finance (
+  employee_id TEXT,
+  expense_type TEXT,
+  expense_amount NUMERIC(12, 2),
+  expense_date TEXT,
+  approved_by TEXT,
+  is_refund BOOLEAN,
+  expense_type_id INT,
+  row_hash BIGINT,
+  pending_since TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- The rows a fact_expenses load reads: the staged rows and the pending ones not staged again
+CREATE OR REPLACE VIEW stg.finance_fact_rows AS
+SELECT employee_id, expense_type, expense_amount, expense_date, approved_by, is_refund, expense_type_id, row_hash,
+       NULL::TIMESTAMP AS pending_since
+FROM stg.staging_finance
+UNION ALL
+SELECT p.employee_id, p.expense_type, p.expense_amount, p.expense_date, p.approved_by, p.is_refund,
+       p.expense_type_id, p.row_hash, p.pending_since
+FROM stg.pending_finance p
+WHERE NOT EXISTS (SELECT 1 FROM stg.staging_finance s WHERE s.row_hash = p.row_hash);
+
@@ -0,0 +1,13 @@
+-- 013_loaded_row_hashes_from_facts.sql
+-- stg.loaded_row_hashes is now filled by the fact loads (TL_combine.sql) from the row_hash
+-- the pipelines stage with each row, once the row is in fact_expenses / fact_downtime. The
+-- pipelines used to add every row they staged, including Finance rows the fact load then
+-- turned away for an unknown employee, so a re-sent copy was dropped as a duplicate.
+-- Those rows stay in the index, since it cannot tell them apart; one full refresh of the
+-- Finance pipeline (ETL_FULL_REFRESH=1) stages them again.
+
+ALTER TABLE stg.staging_operations ADD COLUMN IF NOT EXISTS row_hash BIGINT;
+
+-- The fact loads probe the index by (source, hash) before adding a row
+CREATE INDEX IF NOT EXISTS idx_loaded_row_hashes_source_hash ON stg.loaded_row_hashes (source_name, row_hash);
+DROP INDEX IF EXISTS stg.idx_loaded_row_hashes_source;
@@ -0,0 +1,367 @@
+# benchmark.py
+# End-to-end timing of the staging pipelines on generated data, written as JSON.
+#
+# Each pipeline runs in this process against a local PostgreSQL (the ETL_DB schema from
+# combined_dw_schema.sql) with full_refresh, so every row is extracted, cleaned, logged and
+# loaded. Time is attributed to stages by wrapping the pipeline's building blocks for the
+# duration of the run (exclusive time, a nested call counts only for the inner stage):
+#
+#   extract    reading the source (read_source)
+#   transform  cleaning, dedup, change detection and dimension key lookups
+#   dq         DQ rule evaluation and writing data_quality_log
+#   load       COPY into staging / deletions, dim_employee merge, state and audit writes
+#   other      whatever is left of the pipeline's wall-clock time
+#
+# The stage records the pipelines keep in dw.etl_stage_metrics (metrics.py) are copied into
+# the report as well, with CPU time and peak RSS per stage.
+#
+# --frame-memory also adds up the deep memory_usage() of the cleaned frames (the footprint
+# of the columns the pipelines carry to staging); it is measured outside the stage timers.
+#
+# The parse cache and the date cache start empty (a temporary ETL_CACHE_DIR) unless
+# --keep-caches is given, so repeated runs measure the same work.
+#
+#   python generate_data.py --rows 100000 --out bench_data
+#   python benchmark.py --data bench_data --output results/100k.json
+#   python benchmark.py --compare results/before.json results/after.json
+import argparse
+import datetime
+import functools
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+
+STAGES = ['extract', 'transform', 'dq', 'load', 'other']
+SOURCE_STEMS = {
+    'hr': 'HR_Dataset_Dirty',
+    'finance': 'Finance_Dataset_Dirty',
+    'operations': 'Operations_Dataset_Dirty',
+}
+TL_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..',
+                         '03_load_into_fact_and_dim_tables', 'TL_combine.sql')
+
+
+class StageClock:
+    """Exclusive time per stage: time spent in a nested stage is not counted twice."""
+
+    def __init__(self):
+        self.seconds = dict.fromkeys(STAGES, 0.0)
+        self.frame_bytes = 0
+        self._stack = []
+
+    def _enter(self, stage):
+        now = time.perf_counter()
+        if self._stack:
+            outer, started = self._stack[-1]
+            self.seconds[outer] += now - started
+        self._stack.append((stage, now))
+
+    def _exit(self):
+        now = time.perf_counter()
+        stage, started = self._stack.pop()
+        self.seconds[stage] += now - started
+        if self._stack:
+            self._stack[-1] = (self._stack[-1][0], now)
+
+    def timed(self, stage, func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            self._enter(stage)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self._exit()
+        return wrapper
+
+    def timed_iter(self, stage, func):
+        # Generators do their work in next(), not in the call
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            iterator = iter(func(*args, **kwargs))
+            while True:
+                self._enter(stage)
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+                finally:
+                    self._exit()
+                yield item
+        return wrapper
+
+    def measured(self, func):
+        # Adds up the memory of the frames func returns
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            df = func(*args, **kwargs)
+            self.frame_bytes += int(df.memory_usage(deep=True).sum())
+            return df
+        return wrapper
+
+    def reset(self):
+        self.seconds = dict.fromkeys(STAGES, 0.0)
+        self.frame_bytes = 0
+
+
+class Instrumented:
+    """Wraps the pipeline building blocks with a StageClock while the context is open."""
+
+    def __init__(self, clock, parse_cache=False, frame_memory=False):
+        import ET_combined
+        import sources
+        from delta import SourceState
+        from dim_keys import DimensionKeys
+        from dq_rules import DQLog
+        from dq_sink import DQSink
+        from extract import DuplicateTracker
+        from load import CopyLoader
+        from scd2 import EmployeeSCD2
+
+        read_source = sources.read_source
+        if not parse_cache:
+            read_source = functools.wraps(read_source)(
+                lambda path, chunksize=None, sheet_name=0, cache=None, _read=read_source:
+                _read(path, chunksize, sheet_name, cache=False))
+
+        copy_write = CopyLoader.write
+
+        def write(loader, df):
+            stage = 'dq' if loader.table == 'data_quality_log' else 'load'
+            return clock.timed(stage, copy_write)(loader, df)
+
+        self._patches = [
+            (sources, 'read_source', clock.timed_iter('extract', read_source)),
+            (CopyLoader, 'write', write),
+        ]
+        for name in ['clean_hr_chunk', 'clean_finance_chunk', 'clean_ops_keys', 'clean_ops_chunk',
+                     'ops_group_stats', 'ops_group_averages']:
+            func = clock.timed('transform', getattr(ET_combined, name))
+            if frame_memory and name in ('clean_hr_chunk', 'clean_finance_chunk', 'clean_ops_chunk'):
+                func = clock.measured(func)
+            self._patches.append((ET_combined, name, func))
+        self._patches.append((ET_combined, 'copy_frame', clock.timed('load', ET_combined.copy_frame)))
+        for owner, names, stage in [
+            (DuplicateTracker, ['duplicated'], 'transform'),
+            (SourceState, ['changed', 'deletions'], 'transform'),
+            (DimensionKeys, ['ids'], 'transform'),
+            (DQLog, ['apply', 'add', 'drain'], 'dq'),
+            (DQSink, ['write', 'flush'], 'dq'),
+            (CopyLoader, ['__enter__', '__exit__'], 'load'),
+            (EmployeeSCD2, ['__enter__', 'merge', 'expire', '__exit__'], 'load'),
+            (SourceState, ['__init__', 'save'], 'load'),
+        ]:
+            for name in names:
+                self._patches.append((owner, name, clock.timed(stage, getattr(owner, name))))
+        self._saved = []
+
+    def __enter__(self):
+        for owner, name, wrapped in self._patches:
+            self._saved.append((owner, name, owner.__dict__[name]))
+            setattr(owner, name, wrapped)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        for owner, name, original in reversed(self._saved):
+            setattr(owner, name, original)
+        self._saved = []
+        return False
+
+
+def find_source(data_dir, name):
+    for ext in ('.csv', '.xlsx'):
+        path = os.path.join(data_dir, SOURCE_STEMS[name] + ext)
+        if os.path.exists(path):
+            return path
+    raise FileNotFoundError(f"no {SOURCE_STEMS[name]}.csv / .xlsx in {data_dir}")
+
+
+def count_rows(path):
+    if path.endswith('.csv'):
+        with open(path, 'rb') as f:
+            return max(sum(1 for _ in f) - 1, 0)
+    from openpyxl import load_workbook
+    wb = load_workbook(path, read_only=True)
+    try:
+        sheet = wb.worksheets[0]
+        # Workbooks written in write-only mode have no stored dimension
+        rows = sheet.max_row if sheet.max_row is not None else sum(1 for _ in sheet.iter_rows(values_only=True))
+        return max(rows - 1, 0)
+    finally:
+        wb.close()
+
+
+def stage_metrics(engine, job_id, pipeline):
+    """The dw.etl_stage_metrics records of one pipeline of the job."""
+    conn = engine.raw_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("""
+                SELECT stage, calls, rows_in, rows_out, wall_seconds::FLOAT, cpu_seconds::FLOAT,
+                       peak_rss_delta_kb, peak_rss_kb
+                FROM dw.etl_stage_metrics
+                WHERE job_id = %s AND pipeline = %s
+                ORDER BY metric_id
+            """, (job_id, pipeline))
+            columns = [c.name for c in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+    finally:
+        conn.close()
+
+
+def run_sql_load(engine, job_id):
+    """Run TL_combine.sql once under the pipelines' job id and return its wall-clock seconds."""
+    with open(TL_SCRIPT) as f:
+        script = f.read()
+    start = time.perf_counter()
+    conn = engine.raw_connection()
+    try:
+        with conn.cursor() as cursor:
+            # The script picks the job id up from temp_etl_job when it already exists
+            cursor.execute("CREATE TEMP TABLE temp_etl_job (job_id UUID)")
+            cursor.execute("INSERT INTO temp_etl_job VALUES (%s)", (job_id,))
+            cursor.execute(script)
+        conn.commit()
+    finally:
+        conn.close()
+    return round(time.perf_counter() - start, 3)
+
+
+def run_benchmark(data_dir, engine, pipelines, chunksize=None, parse_cache=False, sql_load=False,
+                  frame_memory=False):
+    import ET_combined
+
+    job_id = None
+    clock = StageClock()
+    results = []
+    for name in pipelines:
+        source = find_source(data_dir, name)
+        rows = count_rows(source)
+        clock.reset()
+        start = time.perf_counter()
+        with Instrumented(clock, parse_cache=parse_cache, frame_memory=frame_memory):
+            message = ET_combined.PIPELINES[name](job_id, engine=engine, source=source,
+                                                  chunksize=chunksize, full_refresh=True)
+        seconds = time.perf_counter() - start
+        job_id = job_id or message.split('Job ID:')[1].split(' ')[0].strip()
+        stages = dict(clock.seconds)
+        stages['other'] = max(seconds - sum(stages.values()), 0.0)
+        results.append({
+            'pipeline': name,
+            'source': os.path.abspath(source),
+            'source_bytes': os.path.getsize(source),
+            'rows': rows,
+            'seconds': round(seconds, 3),
+            'rows_per_sec': round(rows / seconds, 1) if seconds else None,
+            'stages': {stage: round(value, 3) for stage, value in stages.items()},
+            'frame_bytes': clock.frame_bytes if frame_memory else None,
+            'message': message,
+            'stage_metrics': stage_metrics(engine, job_id, name),
+        })
+
+    summary = {'job_id': job_id, 'pipelines': results}
+    if sql_load:
+        summary['sql_load_seconds'] = run_sql_load(engine, job_id)
+        summary['sql_load_stages'] = stage_metrics(engine, job_id, 'sql_load')
+    return summary
+
+
+def _rss_growth(result):
+    # Bytes the pipeline raised the process's peak RSS by, from its 'total' stage record
+    for record in result.get('stage_metrics') or []:
+        if record['stage'] == 'total' and record['peak_rss_delta_kb']:
+            return record['peak_rss_delta_kb'] * 1024
+    return None
+
+
+def compare(base_path, new_path):
+    with open(base_path) as f:
+        base = {r['pipeline']: r for r in json.load(f)['pipelines']}
+    with open(new_path) as f:
+        new = {r['pipeline']: r for r in json.load(f)['pipelines']}
+    print(f"{'pipeline':<12}{'stage':<11}{'base s':>10}{'new s':>10}{'speedup':>9}")
+    for name in new:
+        if name not in base:
+            continue
+        for stage in ['total'] + STAGES:
+            before = base[name]['seconds'] if stage == 'total' else base[name]['stages'].get(stage, 0.0)
+            after = new[name]['seconds'] if stage == 'total' else new[name]['stages'].get(stage, 0.0)
+            speedup = f"{before / after:.2f}x" if after else '-'
+            print(f"{name:<12}{stage:<11}{before:>10.3f}{after:>10.3f}{speedup:>9}")
+        for label, before, after in [
+            ('frame MB', base[name].get('frame_bytes'), new[name].get('frame_bytes')),
+            ('RSS+ MB', _rss_growth(base[name]), _rss_growth(new[name])),
+        ]:
+            if before and after:
+                print(f"{name:<12}{label:<11}{before / 2**20:>10.1f}{after / 2**20:>10.1f}{before / after:>8.2f}x")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time the staging pipelines on a data folder.")
+    parser.add_argument('--data', default='.', help="folder with the three feeds (.xlsx or .csv)")
+    parser.add_argument('--dsn', default=os.environ.get('ETL_BENCHMARK_DSN'), help="default: the .env settings (db.py)")
+    parser.add_argument('--pipelines', nargs='+', choices=list(SOURCE_STEMS), default=list(SOURCE_STEMS))
+    parser.add_argument('--chunksize', type=int, help="stream the sources in chunks of this many rows")
+    parser.add_argument('--parse-cache', action='store_true', help="read workbooks through the parse cache")
+    parser.add_argument('--keep-caches', action='store_true', help="use the normal ETL_CACHE_DIR")
+    parser.add_argument('--sql-load', action='store_true', help="also time TL_combine.sql")
+    parser.add_argument('--frame-memory', action='store_true', help="report the memory of the cleaned frames")
+    parser.add_argument('--label', help="free text stored with the results")
+    parser.add_argument('--output', help="JSON file to write (default benchmark_results/<timestamp>.json)")
+    parser.add_argument('--compare', nargs=2, metavar=('BASE', 'NEW'), help="compare two result files")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    if not args.keep_caches:
+        # Before the ETL modules are imported, they read ETL_CACHE_DIR at import time
+        os.environ['ETL_CACHE_DIR'] = tempfile.mkdtemp(prefix='etl-benchmark-')
+
+    from sqlalchemy import create_engine
+    from db import get_engine
+    engine = create_engine(args.dsn) if args.dsn else get_engine()
+    started = datetime.datetime.now()
+    summary = run_benchmark(args.data, engine, args.pipelines, chunksize=args.chunksize,
+                            parse_cache=args.parse_cache, sql_load=args.sql_load, frame_memory=args.frame_memory)
+    engine.dispose()
+
+    report = {
+        'label': args.label,
+        'started_at': started.isoformat(timespec='seconds'),
+        'host': {
+            'platform': platform.platform(),
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'cpu_count': os.cpu_count(),
+        },
+        'params': {
+            'data': os.path.abspath(args.data),
+            'chunksize': args.chunksize,
+            'parse_cache': args.parse_cache,
+            'keep_caches': args.keep_caches,
+            'frame_memory': args.frame_memory,
+        },
+        **summary,
+    }
+    output = args.output or os.path.join('benchmark_results', f"benchmark-{started:%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    for r in report['pipelines']:
+        stages = ', '.join(f"{stage} {r['stages'][stage]:.2f}s" for stage in STAGES)
+        print(f"{r['pipeline']:<11} {r['rows']:>10} rows {r['seconds']:>8.2f}s ({r['rows_per_sec']:,.0f} rows/sec) | {stages}")
+    if 'sql_load_seconds' in report:
+        print(f"TL_combine.sql {report['sql_load_seconds']:.2f}s")
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
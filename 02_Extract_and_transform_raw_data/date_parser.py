@@ -0,0 +1,192 @@
+# date_parser.py
+# Bulk date normalization for DateOfJoining / ExpenseDate / ProcessDate.
+#
+# Each distinct raw value is parsed once. Known formats are tried as vectorized passes
+# (ISO, DD-MM-YYYY, Excel serials) and only whatever is left falls back to the old
+# per-value pd.to_datetime guessing. The raw value -> date mapping is kept in a small
+# JSON cache on disk, so repeated runs over the same feeds skip parsing altogether.
+# The cache is written once per pipeline run (and at exit), not per chunk, and holds at
+# most ETL_DATE_CACHE_SIZE values: past that, the ones the run did not use go first.
+import atexit
+import datetime
+import json
+import os
+import tempfile
+import warnings
+
+import numpy as np
+import pandas as pd
+
+
+CACHE_DIR = os.environ.get('ETL_CACHE_DIR', '.etl_cache')
+CACHE_VERSION = 1
+CACHE_SIZE = int(os.environ.get('ETL_DATE_CACHE_SIZE', '200000'))
+
+KNOWN_FORMATS = ['%Y-%m-%d', '%d-%m-%Y']
+EXCEL_EPOCH = '1899-12-30'
+EXCEL_MAX_SERIAL = 2958465  # 9999-12-31
+
+
+def _cache_key(value):
+    # Only plain strings and numbers are worth caching, everything else is parsed directly
+    if isinstance(value, str):
+        return 's:' + value
+    if isinstance(value, (int, float, np.integer, np.floating)) and not isinstance(value, bool) and not pd.isna(value):
+        return 'n:' + repr(float(value))
+    return None
+
+
+class DateCache:
+    """Persistent raw value -> 'YYYY-MM-DD' mapping (None marks a value that cannot be parsed)."""
+
+    def __init__(self, path=None, max_entries=None):
+        self.path = path or os.path.join(CACHE_DIR, 'date_cache.json')
+        self.max_entries = CACHE_SIZE if max_entries is None else max_entries
+        self.entries = {}
+        self._used = set()
+        self._dirty = False
+        if os.path.exists(self.path):
+            try:
+                with open(self.path) as f:
+                    payload = json.load(f)
+                if payload.get('version') == CACHE_VERSION:
+                    self.entries = payload.get('entries', {})
+            except (OSError, ValueError):
+                self.entries = {}
+
+    def __len__(self):
+        return len(self.entries)
+
+    def lookup(self, keys):
+        """The cached dates of keys, as {key: date}; keys not in the cache are left out."""
+        found = {key: self.entries[key] for key in keys if key is not None and key in self.entries}
+        self._used.update(found)
+        return found
+
+    def update(self, mapping):
+        if mapping:
+            self.entries.update(mapping)
+            self._used.update(mapping)
+            self._dirty = True
+
+    def _prune(self):
+        # Oldest first: values this process has not used, in the order they were cached
+        excess = len(self.entries) - self.max_entries
+        if excess <= 0:
+            return
+        stale = [key for key in self.entries if key not in self._used][:excess]
+        for key in stale:
+            del self.entries[key]
+        for key in list(self.entries)[:excess - len(stale)]:
+            del self.entries[key]
+
+    def save(self):
+        """Write the cache if anything was added since it was read or last saved."""
+        if not self._dirty:
+            return
+        self._prune()
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        # Write-then-rename so concurrent pipelines never read a half-written file
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.path) or '.', suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump({'version': CACHE_VERSION, 'entries': self.entries}, f)
+        os.replace(tmp_path, self.path)
+        self._dirty = False
+
+
+_default_cache = None
+
+
+def get_date_cache():
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = DateCache()
+        # Pipelines save it when they finish; this covers scripts that stop early
+        atexit.register(_default_cache.save)
+    return _default_cache
+
+
+def _legacy_parse(value):
+    # Same two attempts the pipelines used to make per row
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        try:
+            return pd.to_datetime(value).strftime('%Y-%m-%d')
+        except (ValueError, TypeError, OverflowError):
+            try:
+                return pd.to_datetime(value, dayfirst=True).strftime('%Y-%m-%d')
+            except (ValueError, TypeError, OverflowError):
+                return None
+
+
+def parse_distinct(values):
+    """Parse an array of distinct raw values, returning an object array of 'YYYY-MM-DD' or None."""
+    raw = pd.Series(values, dtype=object)
+    out = pd.Series(None, index=raw.index, dtype=object)
+
+    # Cells openpyxl already typed as dates
+    is_date = raw.map(lambda v: isinstance(v, (datetime.date, pd.Timestamp)) and not pd.isna(v))
+    if is_date.any():
+        out[is_date] = pd.to_datetime(raw[is_date]).dt.strftime('%Y-%m-%d')
+
+    # Known text formats, one vectorized pass each
+    is_text = raw.map(lambda v: isinstance(v, str))
+    text = raw[is_text].str.strip()
+    for fmt in KNOWN_FORMATS:
+        todo = text[out[text.index].isna()]
+        if todo.empty:
+            break
+        parsed = pd.to_datetime(todo, format=fmt, errors='coerce')
+        ok = parsed.notna()
+        out[parsed.index[ok]] = parsed[ok].dt.strftime('%Y-%m-%d')
+
+    # Excel serial day numbers, either numeric cells or digit-only text
+    is_number = raw.map(lambda v: isinstance(v, (int, float, np.integer, np.floating)) and not isinstance(v, bool))
+    serial = pd.to_numeric(raw.where(is_number | (is_text & raw.astype(str).str.strip().str.fullmatch(r'\d+(\.\d+)?'))),
+                           errors='coerce')
+    serial = serial[out.isna() & serial.between(1, EXCEL_MAX_SERIAL)]
+    if not serial.empty:
+        parsed = pd.to_datetime(serial.astype(float), unit='D', origin=EXCEL_EPOCH)
+        out[parsed.index] = parsed.dt.strftime('%Y-%m-%d')
+
+    # Anything else gets the old free-form guess, once per distinct value
+    leftovers = out.isna() & is_text
+    if leftovers.any():
+        out[leftovers] = raw[leftovers].map(_legacy_parse)
+
+    return out.to_numpy(dtype=object)
+
+
+def normalize_dates(values, fallback=np.nan, cache=None):
+    """Normalize a column of raw dates to 'YYYY-MM-DD' strings.
+
+    Returns (dates, invalid) where invalid is a boolean array marking the positions that
+    could not be parsed; those positions hold `fallback` (NaN for HR and Finance,
+    '1957-01-01' for Operations). Newly parsed values are added to the cache, which is
+    written by cache.save().
+    """
+    values = pd.Series(values, dtype=object)
+    cache = cache if cache is not None else get_date_cache()
+
+    codes, uniques = pd.factorize(values, use_na_sentinel=True)
+    uniques = np.asarray(uniques, dtype=object)
+    keys = [_cache_key(v) for v in uniques]
+
+    parsed = np.empty(len(uniques), dtype=object)
+    cached = cache.lookup(keys)
+    missing = []
+    for i, key in enumerate(keys):
+        if key in cached:
+            parsed[i] = cached[key]
+        else:
+            missing.append(i)
+
+    if missing:
+        parsed[missing] = parse_distinct(uniques[missing])
+        cache.update({keys[i]: parsed[i] for i in missing if keys[i] is not None})
+
+    # NaN cells (code -1) pick up the trailing None
+    result = np.append(parsed, None)[codes]
+    invalid = pd.isna(result)
+    result[invalid] = fallback
+    return pd.Series(result, index=values.index, dtype=object), invalid
@@ -0,0 +1,203 @@
+# db.py
+# Connection settings, the per-process connection pool, and pipeline sessions.
+#
+# The DSN is built from the repository's .env (HOST, PORT, USERNAME, PASSWORD and an
+# optional DATABASE, default ETL_DB). ETL_ENV_FILE points at another file, and
+# ETL_DATABASE_URL replaces the DSN as a whole. get_engine() hands out one pooled engine
+# per process. Its size is set with ETL_POOL_SIZE, ETL_POOL_MAX_OVERFLOW,
+# ETL_POOL_TIMEOUT and ETL_POOL_RECYCLE, and pool_stats() reports its state and counters.
+#
+# A Session is one pooled connection with one open transaction. It can be passed
+# wherever the ETL modules take an engine: raw_connection(), connect() and begin() all
+# hand out that same connection, and the commits the modules make are deferred to the
+# end of the session. A pipeline run in a session writes staging, DQ log, state and
+# audit together, or nothing at all if it fails.
+import contextlib
+import functools
+import os
+import threading
+
+from sqlalchemy import URL, create_engine, event
+
+
+ENV_FILE = os.environ.get('ETL_ENV_FILE')
+ROOT_ENV_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, '.env')
+
+DEFAULTS = {'HOST': 'localhost', 'PORT': '5432', 'USERNAME': 'postgres', 'PASSWORD': 'root', 'DATABASE': 'ETL_DB'}
+
+
+def read_env_file(path):
+    """KEY = value pairs of a .env file; quotes around values are dropped."""
+    settings = {}
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#') or '=' not in line:
+                continue
+            key, value = (part.strip() for part in line.split('=', 1))
+            if len(value) >= 2 and value[0] == value[-1] and value[0] in '\'"':
+                value = value[1:-1]
+            settings[key] = value
+    return settings
+
+
+def settings():
+    """Connection and pool settings: defaults, then the .env file, then ETL_* environment variables."""
+    values = dict(DEFAULTS)
+    for path in [ENV_FILE, '.env', ROOT_ENV_FILE]:
+        if path and os.path.isfile(path):
+            values.update({k: v for k, v in read_env_file(path).items() if v != ''})
+            break
+    values.update({k: v for k, v in os.environ.items() if k.startswith('ETL_')})
+    return values
+
+
+def database_url(values=None):
+    values = values or settings()
+    if values.get('ETL_DATABASE_URL'):
+        return values['ETL_DATABASE_URL']
+    return URL.create(
+        'postgresql+psycopg2',
+        username=values['USERNAME'],
+        password=values['PASSWORD'],
+        host=values['HOST'],
+        port=int(values['PORT']),
+        database=values['DATABASE'],
+    )
+
+
+class _PoolCounters:
+    def __init__(self):
+        self.connects = 0
+        self.checkouts = 0
+        self.checkins = 0
+        self._lock = threading.Lock()
+
+    def listen(self, engine):
+        event.listen(engine, 'connect', self._count('connects'))
+        event.listen(engine, 'checkout', self._count('checkouts'))
+        event.listen(engine, 'checkin', self._count('checkins'))
+
+    def _count(self, name):
+        def count(*args):
+            with self._lock:
+                setattr(self, name, getattr(self, name) + 1)
+        return count
+
+
+_engines = {}
+_counters = {}
+
+
+def get_engine():
+    """The pooled engine of this process (worker processes get their own)."""
+    key = os.getpid()
+    for pid in [pid for pid in _engines if pid != key]:
+        # Inherited from the parent of a worker process: leave its connections to the parent
+        _engines.pop(pid).dispose(close=False)
+    if key not in _engines:
+        values = settings()
+        engine = create_engine(
+            database_url(values),
+            pool_size=int(values.get('ETL_POOL_SIZE', 5)),
+            max_overflow=int(values.get('ETL_POOL_MAX_OVERFLOW', 10)),
+            pool_timeout=float(values.get('ETL_POOL_TIMEOUT', 30)),
+            pool_recycle=int(values.get('ETL_POOL_RECYCLE', 1800)),
+            pool_pre_ping=True,
+        )
+        _counters[engine] = _PoolCounters()
+        _counters[engine].listen(engine)
+        _engines[key] = engine
+    return _engines[key]
+
+
+def pool_stats(engine=None):
+    """Current state of an engine's pool, plus connect / checkout counts for pools from get_engine()."""
+    engine = engine or get_engine()
+    pool = engine.pool
+    stats = {'pool': type(pool).__name__}
+    for name in ['size', 'checkedin', 'checkedout', 'overflow']:
+        if hasattr(pool, name):
+            stats[name] = getattr(pool, name)()
+    counters = _counters.get(engine)
+    if counters is not None:
+        stats.update(connects=counters.connects, checkouts=counters.checkouts, checkins=counters.checkins)
+    return stats
+
+
+class _SessionConnection:
+    # The session's DBAPI connection as the modules see it: commit, rollback and close
+    # are left to the session
+    def __init__(self, connection):
+        self._connection = connection
+
+    def cursor(self, *args, **kwargs):
+        return self._connection.cursor(*args, **kwargs)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class Session:
+    """One connection and one transaction, usable in place of an engine.
+
+        with Session(get_engine()) as session:
+            with CopyLoader(session, 'staging_finance', 'stg', truncate=True) as staging:
+                staging.write(df)
+            copy_frame(session, audit_log, 'audit_log', 'dw')
+        # both committed here, or both rolled back
+
+    session.engine is the pool itself, for work that must commit on its own.
+    """
+
+    def __init__(self, engine=None):
+        self.engine = engine or get_engine()
+        self._connection = None
+        self._transaction = None
+
+    def __enter__(self):
+        self._connection = self.engine.connect()
+        self._transaction = self._connection.begin()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                self._transaction.commit()
+            else:
+                self._transaction.rollback()
+        finally:
+            self._connection.close()
+            self._connection = self._transaction = None
+        return False
+
+    def raw_connection(self):
+        return _SessionConnection(self._connection.connection)
+
+    def connect(self):
+        return contextlib.nullcontext(self._connection)
+
+    def begin(self):
+        return contextlib.nullcontext(self._connection)
+
+
+def autonomous(engine):
+    """The pool behind a Session (or the engine itself), for writes that commit straight away."""
+    return engine.engine if isinstance(engine, Session) else engine
+
+
+def in_session(pipeline):
+    """Run a pipeline inside one Session, on the engine it is given or the process's pool."""
+    @functools.wraps(pipeline)
+    def run(job_id=None, engine=None, **kwargs):
+        if isinstance(engine, Session):
+            return pipeline(job_id, engine=engine, **kwargs)
+        with Session(engine or get_engine()) as session:
+            return pipeline(job_id, engine=session, **kwargs)
+    return run
@@ -0,0 +1,180 @@
+# delta.py
+# Change detection between runs of the staging pipelines.
+#
+# A SHA-256 fingerprint of each source file lets a run skip a file that has not changed
+# since its last load. For a changed file, the content hash of every cleaned row is
+# compared with the hashes staged last time: only new or changed rows go into staging,
+# and rows that have disappeared make up the deletion set in stg.staging_deletions.
+# A source made of several files (sources.py) keeps every file each row came from, so the
+# rows of a file skipped as already loaded are carried over without reading it again, and
+# a row only counts as deleted once no file of the source has it any more.
+# The state (stg.source_file_state / stg.source_row_state) is only advanced after the
+# staging load has committed, so a failed run is simply redone against the old state.
+#
+# The row state only covers the last load. stg.loaded_row_hashes keeps the hash of every
+# row of a source that has reached the facts (LoadedRows); a row that is new against the
+# last load but already in that index was loaded by an earlier run, and is dropped as a
+# duplicate before it reaches staging instead of in the fact loads. The fact loads of
+# TL_combine.sql fill the index from the staged row_hash of the rows they load, so a row
+# the fact load turned away (Finance rows without a known employee) is staged again when
+# the source re-sends it.
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+from extract import row_hashes
+from load import CopyLoader
+
+
+def _signed(hashes):
+    # Row hashes are uint64, the state table stores them as BIGINT
+    return np.asarray(hashes, dtype='uint64').view('int64')
+
+
+class SourceState:
+    """Fingerprint and row hashes of one source as of its last load.
+
+    key names the column identifying a row across versions (HR EmployeeID). With a key,
+    a row only counts as deleted when its key is gone from the source altogether; a key
+    that is still there with new content is a change, staged as a new row. Without a key
+    every row hash that disappeared is reported.
+    """
+
+    def __init__(self, engine, source_name, key=None):
+        self.engine = engine
+        self.source_name = source_name
+        self.key = key
+        self.fingerprint = None
+        self.previous = {}
+        self.previous_files = {}
+        self._hashes = []
+        self._keys = []
+        self._files = []
+
+        with engine.connect() as conn:
+            self.fingerprint = conn.execute(
+                text("SELECT fingerprint FROM stg.source_file_state WHERE source_name = :source"),
+                {'source': source_name},
+            ).scalar()
+            rows = conn.execute(
+                text("SELECT row_hash, row_key, file_hash FROM stg.source_row_state WHERE source_name = :source"),
+                {'source': source_name},
+            ).fetchall()
+            self.previous = {h: k for h, k, _ in rows}
+            for h, _, f in rows:
+                if f is not None:
+                    self.previous_files.setdefault(h, set()).add(f)
+
+    def unchanged(self, fingerprint):
+        return self.fingerprint is not None and self.fingerprint == fingerprint
+
+    def changed(self, df, hashes=None, file_hash=None):
+        """Boolean mask of the rows that were not staged last time; records every row seen.
+
+        hashes are the frame's row_hashes(), when the caller has them already; file_hash is
+        the fingerprint of the file the rows come from.
+        """
+        hashes = self.record(df, hashes, file_hash)
+        return np.fromiter((h not in self.previous for h in hashes.tolist()), dtype=bool, count=len(hashes))
+
+    def seen(self, hashes):
+        """Boolean mask of the row_hashes() the last load had."""
+        hashes = _signed(hashes)
+        return np.fromiter((h in self.previous for h in hashes.tolist()), dtype=bool, count=len(hashes))
+
+    def record(self, df, hashes=None, file_hash=None):
+        """Record rows as seen in file_hash without staging them (duplicates dropped on the way)."""
+        hashes = _signed(row_hashes(df) if hashes is None else hashes)
+        self._hashes.append(hashes)
+        self._files.append(np.full(len(hashes), file_hash, dtype=object))
+        if self.key is not None:
+            self._keys.append(df[self.key].astype(str).to_numpy(dtype=object))
+        return hashes
+
+    def retain(self, file_hashes):
+        """Carry the rows of files loaded before and not read this time over as current."""
+        file_hashes = set(file_hashes)
+        kept = [(h, f) for h, files in self.previous_files.items() for f in files & file_hashes]
+        if not kept:
+            return 0
+        self._hashes.append(np.array([h for h, _ in kept], dtype='int64'))
+        self._files.append(np.array([f for _, f in kept], dtype=object))
+        if self.key is not None:
+            self._keys.append(np.array([self.previous[h] for h, _ in kept], dtype=object))
+        return len(kept)
+
+    def _current(self):
+        hashes = np.concatenate(self._hashes) if self._hashes else np.array([], dtype='int64')
+        keys = np.concatenate(self._keys) if self._keys else np.full(len(hashes), None, dtype=object)
+        files = np.concatenate(self._files) if self._files else np.full(len(hashes), None, dtype=object)
+        return pd.DataFrame({'source_name': self.source_name, 'row_hash': hashes, 'row_key': keys,
+                             'file_hash': files})
+
+    def deletions(self):
+        """Rows staged by the last load that are gone from the source now."""
+        current = self._current()
+        hashes = set(current['row_hash'].tolist())
+        gone = {h: k for h, k in self.previous.items() if h not in hashes}
+        if self.key is not None:
+            keys = set(current['row_key'].tolist())
+            gone = {h: k for h, k in gone.items() if k not in keys}
+        return pd.DataFrame({
+            'source_name': self.source_name,
+            'row_hash': pd.Series(list(gone), dtype='int64'),
+            'row_key': pd.Series(list(gone.values()), dtype=object),
+        })
+
+    def save(self, fingerprint, job_id):
+        """Record this run's fingerprint and row hashes, once per file they are in, as the state for the next run."""
+        current = self._current().drop_duplicates(['row_hash', 'file_hash'])
+        with CopyLoader(self.engine, 'source_row_state', 'stg', replace={'source_name': self.source_name}) as rows:
+            rows.write(current)
+        with self.engine.begin() as conn:
+            conn.execute(text("""
+                INSERT INTO stg.source_file_state (source_name, fingerprint, row_count, job_id, loaded_at)
+                VALUES (:source, :fingerprint, :row_count, :job_id, CURRENT_TIMESTAMP)
+                ON CONFLICT (source_name) DO UPDATE
+                SET fingerprint = EXCLUDED.fingerprint,
+                    row_count = EXCLUDED.row_count,
+                    job_id = EXCLUDED.job_id,
+                    loaded_at = EXCLUDED.loaded_at
+            """), {'source': self.source_name, 'fingerprint': fingerprint,
+                   'row_count': current['row_hash'].nunique(), 'job_id': job_id})
+
+
+class LoadedRows:
+    """Hashes of every row of a source that has reached the fact tables, across all its loads.
+
+    The index is held as one sorted int64 array (8 bytes a row) and probed with a
+    binary search per chunk, so checking a chunk is a single vectorized call. The
+    pipelines only read it: the fact loads add the row_hash of every staged row that is
+    in the facts once they are done (TL_combine.sql).
+
+        loaded = LoadedRows(engine, 'raw_finance')
+        is_reloaded = loaded.contains(row_hashes(df))
+    """
+
+    def __init__(self, engine, source_name):
+        self.engine = engine
+        self.source_name = source_name
+
+        with engine.connect() as conn:
+            rows = conn.execute(
+                text("SELECT row_hash FROM stg.loaded_row_hashes WHERE source_name = :source"),
+                {'source': source_name},
+            )
+            self.hashes = np.unique(np.fromiter((h for h, in rows), dtype='int64'))
+
+    def __len__(self):
+        return len(self.hashes)
+
+    def contains(self, hashes):
+        """Boolean mask of the row_hashes() already loaded by an earlier run."""
+        hashes = _signed(hashes)
+        if not len(self.hashes):
+            return np.zeros(len(hashes), dtype=bool)
+        position = np.searchsorted(self.hashes, hashes).clip(max=len(self.hashes) - 1)
+        return self.hashes[position] == hashes
+
+    def loaded(self, df):
+        return self.contains(row_hashes(df))
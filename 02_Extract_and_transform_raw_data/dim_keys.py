@@ -0,0 +1,85 @@
+# dim_keys.py
+# Surrogate-key resolution for the small name dimensions.
+#
+# dim_department, dim_process, dim_location and dim_expense_type are keyed by a name. The
+# name -> id map of a dimension is read once per pipeline run; names it has not seen are
+# inserted in one multi-row statement that returns their ids, and the ids are stamped onto
+# the frames before they are staged. The SQL load phase then reads the ids straight from
+# staging instead of adding members with NOT IN and mapping them with UPDATE joins.
+#
+# Names are compared the way the loads always have, trimmed and upper-cased. New members
+# are committed straight away, outside a pipeline's Session: dimension rows are insert-only,
+# and a short transaction keeps the pipelines (HR and Operations both add departments)
+# from waiting on each other.
+import pandas as pd
+from psycopg2.extras import execute_values
+
+from db import autonomous
+
+
+# dimension -> (table, name column, id column)
+DIMENSIONS = {
+    'department': ('dim_department', 'department_name', 'department_id'),
+    'process': ('dim_process', 'process_name', 'process_id'),
+    'location': ('dim_location', 'location_name', 'location_id'),
+    'expense_type': ('dim_expense_type', 'expense_type_name', 'expense_type_id'),
+}
+
+
+def normalize_names(names):
+    return pd.Series(names, dtype=object).map(lambda n: n if pd.isna(n) else str(n).strip().upper())
+
+
+class DimensionKeys:
+    """name -> surrogate id of one dimension, adding unseen names on first use.
+
+        expense_types = DimensionKeys(engine, 'expense_type')
+        df['expense_type_id'] = expense_types.ids(df['expense_type'])
+    """
+
+    def __init__(self, engine, dimension):
+        self.engine = autonomous(engine)
+        self.table, self.name_column, self.id_column = DIMENSIONS[dimension]
+        self.added = 0
+        conn = self.engine.raw_connection()
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute(f"SELECT UPPER(TRIM({self.name_column})), {self.id_column} FROM dw.{self.table}")
+                self.keys = dict(cursor.fetchall())
+        finally:
+            conn.close()
+
+    def _add(self, names):
+        conn = self.engine.raw_connection()
+        try:
+            with conn.cursor() as cursor:
+                # DO UPDATE (a no-op) so ids of names another pipeline just added come back too
+                rows = execute_values(cursor, f"""
+                    INSERT INTO dw.{self.table} ({self.name_column}) VALUES %s
+                    ON CONFLICT ({self.name_column}) DO UPDATE SET {self.name_column} = EXCLUDED.{self.name_column}
+                    RETURNING UPPER(TRIM({self.name_column})), {self.id_column}
+                """, [(n,) for n in names], fetch=True)
+            conn.commit()
+        finally:
+            conn.close()
+        self.keys.update(dict(rows))
+        self.added += len(names)
+
+    def ids(self, names):
+        """Surrogate ids for the names (nullable Int64, NULL for a missing name)."""
+        if isinstance(getattr(names, 'dtype', None), pd.CategoricalDtype):
+            # One lookup per category in use, spread over the rows by their codes
+            names = names.cat.remove_unused_categories()
+            category_ids = self.ids(pd.Series(names.cat.categories, dtype=object))
+            ids = category_ids.take(names.cat.codes.clip(lower=0)).where(names.cat.codes.to_numpy() >= 0)
+            return ids.set_axis(names.index).astype('Int64')
+        index = names.index if isinstance(names, pd.Series) else None
+        normalized = normalize_names(names)
+        # Sorted, so concurrent inserts of the same names lock them in the same order
+        new = sorted(set(normalized.dropna()) - self.keys.keys())
+        if new:
+            self._add(new)
+        ids = normalized.map(self.keys).astype('Int64')
+        if index is not None:
+            ids.index = index
+        return ids
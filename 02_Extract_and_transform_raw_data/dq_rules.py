@@ -0,0 +1,154 @@
+# dq_rules.py
+# Column-level data quality rules shared by the HR, Finance and Operations pipelines.
+#
+# Every check is a boolean mask over the whole column. The matching rows are fixed
+# with one vectorized assignment and logged as one block of dw.data_quality_log rows,
+# instead of looping over the frame and appending one dict per bad cell.
+import numpy as np
+import pandas as pd
+
+
+DQ_LOG_COLUMNS = ['job_id', 'table_name', 'column_name', 'row_reference', 'original_value', 'issue']
+
+
+class DQRule:
+    """One data quality check.
+
+    mask(df)            -> boolean Series, True for every offending row
+    issue               -> issue text, or callable(df) returning one text per row
+    fix                 -> value written into `target` for offending rows (scalar or callable(df))
+    original_value(df)  -> value to log, defaults to the target column before the fix
+    row_reference       -> column name or callable(df), defaults to the log's row reference
+    table_name          -> overrides the log's table name for this rule only
+    """
+
+    def __init__(self, column_name, mask, issue, fix=None, target=None,
+                 original_value=None, row_reference=None, table_name=None):
+        self.column_name = column_name
+        self.mask = mask
+        self.issue = issue
+        self.fix = fix
+        self.target = target or column_name
+        self.original_value = original_value
+        self.row_reference = row_reference
+        self.table_name = table_name
+
+
+def _values(value, df):
+    # Resolve a rule attribute to something aligned with df (Series or scalar)
+    return value(df) if callable(value) else value
+
+
+def _logged(value):
+    # Integral floats are logged as integers (1004.0 as 1004, -10000.0 as -10000). The old
+    # per-row loops logged str(value), which depends on how the column was read: float64 in
+    # a streamed chunk or a whole file with blanks, int64 otherwise. This is a deliberate
+    # change, so a value is logged the same way in every mode
+    return int(value) if isinstance(value, float) and value.is_integer() else value
+
+
+def _logged_values(values):
+    if isinstance(values, (pd.Series, pd.Index, np.ndarray, list)):
+        return [_logged(v) for v in np.asarray(values, dtype=object)]
+    return _logged(values)
+
+
+def _masked(value, mask):
+    if isinstance(value, (pd.Series, pd.Index, np.ndarray, list)):
+        return np.asarray(value, dtype=object)[mask]
+    return np.full(mask.sum(), value, dtype=object)
+
+
+class DQLog:
+    """Collects data quality issues for one job/table as column blocks.
+
+    row_reference is the column used to identify a row in the log. When it is None
+    the 1-based row number (frame index + 1) is used, which is what the Operations
+    pipeline logs. Chunked readers index each chunk by file position, so the numbers
+    stay global across chunks.
+    """
+
+    def __init__(self, job_id, table_name, row_reference=None):
+        self.job_id = job_id
+        self.table_name = table_name
+        self.row_reference = row_reference
+        self._frames = []
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def _row_reference(self, df, row_reference=None):
+        row_reference = row_reference if row_reference is not None else self.row_reference
+        if row_reference is None:
+            return (np.asarray(df.index) + 1).astype(str)
+        if callable(row_reference):
+            return row_reference(df)
+        return df[row_reference]
+
+    def add(self, column_name, row_reference, original_value, issue, table_name=None):
+        """Append a block of issues; every argument may be a scalar or an array."""
+        block = pd.DataFrame({
+            'row_reference': _logged_values(row_reference),
+            'original_value': _logged_values(original_value),
+            'issue': issue,
+        })
+        if block.empty:
+            return
+        block.insert(0, 'column_name', column_name)
+        block.insert(0, 'table_name', table_name or self.table_name)
+        block.insert(0, 'job_id', self.job_id)
+        self._frames.append(block.reset_index(drop=True))
+        self._count += len(block)
+
+    def add_rows(self, column_name, df, issue, row_reference=None):
+        """Append one issue per row of df (dropped rows), logging each row as its {column: value} text."""
+        if df.empty:
+            return
+        self.add(column_name, self._row_reference(df, row_reference),
+                 [str({column: _logged(value) for column, value in row.items()}) for row in df.to_dict('records')],
+                 issue)
+
+    def apply(self, df, *rules):
+        """Evaluate rules in order against df, fixing it in place and logging every hit."""
+        for rule in rules:
+            mask = np.asarray(pd.Series(rule.mask(df), index=df.index).fillna(False), dtype=bool)
+            if not mask.any():
+                continue
+
+            original = rule.original_value(df) if rule.original_value is not None else df[rule.target]
+            self.add(
+                rule.column_name,
+                _masked(self._row_reference(df, rule.row_reference), mask),
+                _masked(original, mask),
+                _masked(_values(rule.issue, df), mask),
+                table_name=rule.table_name,
+            )
+
+            if rule.fix is not None:
+                fix = _values(rule.fix, df)
+                if isinstance(fix, pd.Series):
+                    fix = fix[mask]
+                # Text fallbacks (TEMP_n, UNKNOWN, ...) written into numeric columns need an object column
+                is_text = fix.map(lambda v: isinstance(v, str)).any() if isinstance(fix, pd.Series) else isinstance(fix, str)
+                if is_text and pd.api.types.is_numeric_dtype(df[rule.target]):
+                    df[rule.target] = df[rule.target].astype(object)
+                # and categorical columns need them added as categories first
+                if isinstance(df[rule.target].dtype, pd.CategoricalDtype):
+                    values = pd.unique(fix if isinstance(fix, pd.Series) else pd.Series([fix]))
+                    new = [v for v in values if v not in df[rule.target].cat.categories]
+                    if new:
+                        df[rule.target] = df[rule.target].cat.add_categories(new)
+                df.loc[mask, rule.target] = fix
+        return df
+
+    def drain(self):
+        """Return the issues collected since the last drain and release them; len() keeps counting."""
+        frame = self.to_frame()
+        self._frames = []
+        return frame
+
+    def to_frame(self):
+        if not self._frames:
+            return pd.DataFrame(columns=DQ_LOG_COLUMNS)
+        return pd.concat(self._frames, ignore_index=True)[DQ_LOG_COLUMNS]
@@ -0,0 +1,148 @@
+# dq_sink.py
+# Buffered writer for dw.data_quality_log.
+#
+# The pipelines hand the sink the DQ issues of every chunk (DQLog.drain()). The blocks stay
+# in memory, column by column, until they pass ETL_DQ_BUFFER_ROWS rows; then they are
+# written out as COPY-ready CSV to a temporary spill file, so a very dirty feed costs
+# disk, not memory. Nothing reaches the database until the sink is closed: all issues of
+# the job/table go in with one COPY, in one transaction, or not at all if the run failed.
+#
+# With collapse (ETL_DQ_COLLAPSE=1) identical issues (same column, original value and issue
+# text) are written as one row, with the number of hits in `occurrences` and the row
+# reference of the first hit. The rows are COPYed into a temp table and grouped there, so
+# collapsing a spilled log does not need it back in memory.
+import os
+import tempfile
+import time
+
+import pandas as pd
+
+from dq_rules import DQ_LOG_COLUMNS
+from load import NULL, _csv_buffer
+
+
+BUFFER_ROWS = int(os.environ.get('ETL_DQ_BUFFER_ROWS', '100000'))
+COLLAPSE = os.environ.get('ETL_DQ_COLLAPSE', '').lower() in ('1', 'true', 'yes')
+
+COPY_SQL = f"COPY {{table}} ({', '.join(DQ_LOG_COLUMNS)}) FROM STDIN WITH (FORMAT csv, NULL '{NULL}')"
+
+
+class DQSink:
+    """Collects DQ issue blocks and writes them to dw.data_quality_log once, on close.
+
+        with DQSink(engine) as dq_sink:
+            for chunk in chunks:
+                ...
+                dq_sink.write(dq_log.drain())
+        print(dq_sink.summary())
+    """
+
+    def __init__(self, engine, buffer_rows=None, collapse=None, spill_dir=None):
+        self.engine = engine
+        self.buffer_rows = BUFFER_ROWS if buffer_rows is None else buffer_rows
+        self.collapse = COLLAPSE if collapse is None else collapse
+        self.spill_dir = spill_dir
+        self.rows = 0
+        self.rows_written = 0
+        self.spilled_rows = 0
+        self.seconds = 0.0
+        self._blocks = []
+        self._buffered = 0
+        self._pending = 0
+        self._spill = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                self.flush()
+        finally:
+            self._discard()
+        return False
+
+    def _discard(self):
+        self._blocks = []
+        self._buffered = 0
+        self._pending = 0
+        if self._spill is not None:
+            self._spill.close()
+            self._spill = None
+
+    def write(self, df):
+        """Buffer a block of issues (DQ_LOG_COLUMNS), spilling to disk past buffer_rows."""
+        if df.empty:
+            return
+        self._blocks.append(df[DQ_LOG_COLUMNS])
+        self._buffered += len(df)
+        self._pending += len(df)
+        self.rows += len(df)
+        if self._buffered >= self.buffer_rows:
+            self.spilled_rows += self._buffered
+            self._spill_blocks()
+
+    def _spill_blocks(self):
+        if self._spill is None:
+            self._spill = tempfile.TemporaryFile('w+', encoding='utf-8', newline='',
+                                                 prefix='dq-spill-', dir=self.spill_dir)
+        if self._blocks:
+            pd.concat(self._blocks, ignore_index=True).to_csv(self._spill, index=False, header=False, na_rep=NULL)
+        self._blocks = []
+        self._buffered = 0
+
+    def _payload(self):
+        # Everything collected, as one CSV stream
+        if self._spill is None:
+            return _csv_buffer(pd.concat(self._blocks, ignore_index=True))
+        self._spill_blocks()
+        self._spill.seek(0)
+        return self._spill
+
+    def flush(self):
+        """Write everything collected so far in one transaction (the sink does it on close)."""
+        if not self._pending:
+            return
+        start = time.perf_counter()
+        conn = self.engine.raw_connection()
+        try:
+            with conn.cursor() as cursor:
+                if not self.collapse:
+                    cursor.copy_expert(COPY_SQL.format(table='dw.data_quality_log'), self._payload())
+                    self.rows_written += self._pending
+                else:
+                    cursor.execute("""
+                        CREATE TEMP TABLE dq_issues (
+                          seq BIGSERIAL,
+                          job_id UUID, table_name TEXT, column_name TEXT,
+                          row_reference TEXT, original_value TEXT, issue TEXT
+                        ) ON COMMIT DROP
+                    """)
+                    cursor.copy_expert(COPY_SQL.format(table='dq_issues'), self._payload())
+                    cursor.execute("""
+                        INSERT INTO dw.data_quality_log (
+                          job_id, table_name, column_name, row_reference, original_value, issue, occurrences
+                        )
+                        SELECT
+                          job_id, table_name, column_name,
+                          (ARRAY_AGG(row_reference ORDER BY seq))[1],
+                          original_value, issue, COUNT(*)
+                        FROM dq_issues
+                        GROUP BY job_id, table_name, column_name, original_value, issue
+                        ORDER BY MIN(seq)
+                    """)
+                    self.rows_written += cursor.rowcount
+                    # In a Session the commit is deferred, and another flush may follow before it
+                    cursor.execute("DROP TABLE dq_issues")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+        self._discard()
+        self.seconds += time.perf_counter() - start
+
+    def summary(self):
+        collapsed = f", {self.rows_written} rows after collapsing" if self.collapse else ''
+        return f'dw.data_quality_log: {self.rows} issues ({self.spilled_rows} spilled){collapsed} in {self.seconds:.2f}s'
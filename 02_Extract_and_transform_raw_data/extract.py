@@ -0,0 +1,197 @@
+# extract.py
+# Source readers for the HR, Finance and Operations feeds.
+#
+# read_source() yields the source as DataFrames. Without a chunksize the whole file is
+# returned as a single frame (plain pd.read_excel / pd.read_csv). With a chunksize the
+# workbook is streamed row by row through openpyxl's read-only mode and handed out in
+# frames of at most `chunksize` rows, so peak memory stays bounded by the chunk size.
+# Every frame is indexed by its row position in the file, which keeps row references
+# (TEMP_<n>, Operations row numbers) stable across chunk boundaries. Numeric columns of
+# streamed chunks are always float64, so a chunk without blanks has the same dtypes
+# (and row hashes) as one with blanks.
+#
+# Parsed workbooks are kept in the Arrow parse cache (parse_cache.py), keyed by the file's
+# content hash, so a rerun over unchanged files skips openpyxl altogether.
+import functools
+import hashlib
+import os
+
+import numpy as np
+import pandas as pd
+from openpyxl import load_workbook
+
+from parse_cache import get_parse_cache
+
+
+# Same strings pd.read_excel / pd.read_csv turn into NaN by default
+NA_VALUES = ['', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND',
+             '1.#QNAN', '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null']
+
+
+def _is_csv(path):
+    return os.path.splitext(path)[1].lower() == '.csv'
+
+
+@functools.lru_cache(maxsize=64)
+def _sha256(path, size, mtime_ns, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def file_fingerprint(path):
+    """SHA-256 of the file contents, hashed once per path, size and modification time."""
+    stat = os.stat(path)
+    return _sha256(os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+
+
+def _stable_dtypes(df):
+    numeric = df.select_dtypes(include='number').columns
+    df[numeric] = df[numeric].astype('float64')
+    return df
+
+
+def _frame(rows, header, start):
+    df = pd.DataFrame.from_records(rows, columns=header)
+    df.index = pd.RangeIndex(start, start + len(df))
+    # Empty cells come back as None; read_excel gives NaN for those and for the NA strings
+    df = df.mask(df.isna() | df.isin(NA_VALUES), np.nan).infer_objects()
+    return _stable_dtypes(df)
+
+
+def _iter_xlsx(path, chunksize, sheet_name=0):
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        ws = wb.worksheets[sheet_name] if isinstance(sheet_name, int) else wb[sheet_name]
+        rows = ws.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        # Read-only sheets can report trailing empty columns
+        width = max(i + 1 for i, name in enumerate(header) if name is not None)
+        header = list(header[:width])
+
+        batch, start = [], 0
+        for row in rows:
+            row = row[:width]
+            if all(v is None for v in row):
+                continue
+            batch.append(row)
+            if len(batch) == chunksize:
+                yield _frame(batch, header, start)
+                start += len(batch)
+                batch = []
+        if batch:
+            yield _frame(batch, header, start)
+    finally:
+        wb.close()
+
+
+def _read(path, chunksize=None, sheet_name=0):
+    if chunksize is None:
+        if _is_csv(path):
+            yield pd.read_csv(path)
+        else:
+            yield pd.read_excel(path, sheet_name=sheet_name)
+        return
+
+    if _is_csv(path):
+        for chunk in pd.read_csv(path, chunksize=chunksize):
+            yield _stable_dtypes(chunk)
+    else:
+        yield from _iter_xlsx(path, chunksize, sheet_name)
+
+
+def _rechunk(frames, chunksize):
+    # Cached chunks were written with whatever chunksize filled the cache
+    pending = []
+    for df in frames:
+        pending.append(df)
+        buffered = pd.concat(pending) if len(pending) > 1 else df
+        while len(buffered) >= chunksize:
+            yield _stable_dtypes(buffered.iloc[:chunksize].infer_objects())
+            buffered = buffered.iloc[chunksize:]
+        pending = [buffered] if len(buffered) else []
+    if pending:
+        yield _stable_dtypes(pending[0].infer_objects())
+
+
+def read_source(path, chunksize=None, sheet_name=0, cache=None):
+    """Yield the source file as DataFrames (one frame, or chunks of `chunksize` rows).
+
+    Workbooks go through the parse cache unless cache=False (or ETL_PARSE_CACHE=0).
+    """
+    cache = get_parse_cache() if cache is None else cache
+    if not cache or _is_csv(path):
+        yield from _read(path, chunksize, sheet_name)
+        return
+
+    digest = file_fingerprint(path)
+    mode = 'frame' if chunksize is None else 'chunks'
+    cached = cache.get(digest, sheet_name, mode)
+    if cached is not None:
+        yield from (cached if chunksize is None else _rechunk(cached, chunksize))
+        return
+
+    # Frames are encoded before they are handed out, the pipelines modify them in place
+    writer = cache.writer(digest, sheet_name, mode, source=os.path.abspath(path))
+    complete = False
+    try:
+        for df in _read(path, chunksize, sheet_name):
+            writer.add(df)
+            yield df
+        complete = True
+    finally:
+        if complete:
+            writer.commit()
+        else:
+            writer.abort()
+
+
+def id_text(series):
+    """Render ID columns as text, without the '.0' integer IDs pick up when stored as floats."""
+    return series.apply(
+        lambda x: str(int(x)) if isinstance(x, float) and x.is_integer() else str(x)
+    ).str.strip()
+
+
+def category_text(values, normalize):
+    """Low-cardinality text column as a categorical, normalized once per distinct value.
+
+    Values are rendered the way astype(str) renders them (NaN as 'nan'), normalize(str) -> str
+    runs on every distinct value rather than every row, and values that normalize to the same
+    text share one category.
+    """
+    codes, uniques = pd.factorize(values, use_na_sentinel=False)
+    label_codes, labels = pd.factorize(pd.Index([normalize(str(u)) for u in uniques], dtype=object))
+    return pd.Series(pd.Categorical.from_codes(label_codes[codes], categories=labels),
+                     index=getattr(values, 'index', None))
+
+
+def row_hashes(df):
+    """64-bit content hash per row, used to spot duplicates across chunks and runs.
+
+    Numeric columns are hashed as float64, so a value hashes the same whether its column
+    was read as int64 or float64 (a file, chunk or run with or without blanks). Categorical
+    columns hash the same as their values as plain strings.
+    """
+    numeric = df.select_dtypes(include='number').columns
+    if len(numeric):
+        df = df.astype({column: 'float64' for column in numeric})
+    return pd.util.hash_pandas_object(df, index=False).to_numpy()
+
+
+class DuplicateTracker:
+    """Remembers the rows already staged in this run so duplicates are caught across chunks."""
+
+    def __init__(self):
+        self.seen = set()
+
+    def duplicated(self, df, hashes=None):
+        hashes = (row_hashes(df) if hashes is None else hashes).tolist()
+        mask = pd.Series(hashes).duplicated().to_numpy()
+        mask |= np.fromiter((h in self.seen for h in hashes), dtype=bool, count=len(hashes))
+        self.seen.update(hashes)
+        return mask
@@ -0,0 +1,282 @@
+# generate_data.py
+# Synthetic HR / Finance / Operations feeds of any size for load and performance testing.
+#
+# The files have the columns of the *_Dataset_Dirty.xlsx samples and the same kinds of dirt,
+# each at a configurable rate: unknown genders and mixed-case departments, DD-MM-YYYY and
+# unparseable dates, negative salaries, the "Travell" typo, missing and invalid values,
+# misspelt locations and exact duplicate rows. Rows are generated and written in blocks,
+# so memory stays flat from 10k to 10M rows. Workbooks are written in openpyxl's write-only
+# mode; above the Excel row limit (or for speed) use --format csv, read_source() takes both.
+#
+#   python generate_data.py --rows 100000 --out bench_data
+#   python generate_data.py --rows 10000000 --format csv --rate duplicate=0.05 --out bench_data
+import argparse
+import datetime
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook
+
+
+BLOCK_ROWS = 100_000
+EXCEL_MAX_ROWS = 1_048_575  # plus the header row
+
+FILE_NAMES = {
+    'hr': 'HR_Dataset_Dirty',
+    'finance': 'Finance_Dataset_Dirty',
+    'operations': 'Operations_Dataset_Dirty',
+}
+
+# Share of rows that get each kind of dirt
+DIRT_RATES = {
+    'bad_gender': 0.05,        # 'male', 'Female', 'X', blank ... instead of M / F
+    'department_case': 0.10,   # 'It', ' hr ' ... instead of the canonical name
+    'dmy_date': 0.10,          # DD-MM-YYYY instead of YYYY-MM-DD
+    'invalid_date': 0.02,      # unparseable or missing date
+    'negative_salary': 0.02,
+    'travell': 0.05,           # the "Travell" typo for Travel
+    'refund': 0.05,            # negative expense amount
+    'invalid_amount': 0.01,    # non-numeric or missing amount / downtime
+    'blank': 0.03,             # missing names, departments, managers, approvers, processes
+    'location_typo': 0.03,     # 'Remot Site A'
+    'unknown_employee': 0.02,  # finance rows for employees missing from HR
+    'duplicate': 0.02,         # exact copies of other rows in the same block
+}
+
+DEPARTMENTS = ['IT', 'HR', 'Finance', 'Operations', 'Marketing', 'Legal', 'Sales', 'Research']
+GENDER_DIRT = ['male', 'Female', 'X', 'U', 'unknown', '']
+STATUSES = ['Active', 'Resigned']
+EXPENSE_TYPES = ['Travel', 'Meals', 'Supplies', 'Training', 'Equipment']
+PROCESSES = ['Server Maintenance', 'Security Audit', 'Data Backup', 'System Upgrade',
+             'Inventory Check', 'Network Patch']
+LOCATIONS = ['Warehouse', 'Remote Site A', 'Remote Site B', 'Head Office', 'Plant 2']
+INVALID_DATES = ['31-31-2023', 'not a date', '2023/13/45', None]
+INVALID_AMOUNTS = ['abc', 'N/A', None]
+
+
+def _pick(rng, values, n):
+    return np.asarray(values, dtype=object)[rng.integers(0, len(values), n)]
+
+
+def _hit(rng, rates, kind, n):
+    return rng.random(n) < rates[kind]
+
+
+def _dates(rng, rates, n, start, end):
+    days = (np.datetime64(end) - np.datetime64(start)).astype(int)
+    dates = np.datetime64(start) + rng.integers(0, days + 1, n).astype('timedelta64[D]')
+    iso = pd.Series(pd.to_datetime(dates).strftime('%Y-%m-%d'), dtype=object)
+    dmy = _hit(rng, rates, 'dmy_date', n)
+    iso[dmy] = pd.to_datetime(dates[dmy]).strftime('%d-%m-%Y').to_numpy()
+    invalid = _hit(rng, rates, 'invalid_date', n)
+    iso[invalid] = _pick(rng, INVALID_DATES, int(invalid.sum()))
+    return iso
+
+
+def _department_dirt(rng, values):
+    variants = [str.lower, str.upper, str.title, lambda v: f' {v.lower()} ', lambda v: v[:1] + v[1:].lower()]
+    return pd.Series([variants[i](v) for v, i in zip(values, rng.integers(0, len(variants), len(values)))],
+                     dtype=object)
+
+
+def _blank(rng, rates, series):
+    series = series.astype(object)
+    series[_hit(rng, rates, 'blank', len(series))] = None
+    return series
+
+
+def _with_duplicates(rng, rates, df):
+    n = int(len(df) * rates['duplicate'])
+    if not n:
+        return df
+    copies = df.iloc[rng.integers(0, len(df), n)]
+    return pd.concat([df, copies]).sample(frac=1, random_state=int(rng.integers(1 << 31))).reset_index(drop=True)
+
+
+def hr_block(rng, rates, start_id, n):
+    employee_id = pd.Series(np.arange(start_id, start_id + n), dtype=object)
+    department = pd.Series(_pick(rng, DEPARTMENTS, n), dtype=object)
+    cased = _hit(rng, rates, 'department_case', n)
+    department[cased] = _department_dirt(rng, department[cased]).to_numpy()
+    gender = pd.Series(_pick(rng, ['M', 'F'], n), dtype=object)
+    bad = _hit(rng, rates, 'bad_gender', n)
+    gender[bad] = _pick(rng, GENDER_DIRT, int(bad.sum()))
+    salary = rng.integers(30_000, 150_000, n)
+    salary = np.where(_hit(rng, rates, 'negative_salary', n), -salary, salary)
+
+    df = pd.DataFrame({
+        'EmployeeID': employee_id,
+        'Name': _blank(rng, rates, 'Employee ' + employee_id.astype(str)),
+        'Department': _blank(rng, rates, department),
+        'Gender': gender,
+        'DateOfJoining': _dates(rng, rates, n, '2010-01-01', '2024-12-31'),
+        'ManagerID': _blank(rng, rates, pd.Series(rng.integers(2001, 2010, n))),
+        'Salary': salary,
+        'Status': _pick(rng, STATUSES, n),
+    })
+    return _with_duplicates(rng, rates, df)
+
+
+def finance_block(rng, rates, employee_ids, n):
+    employee_id = employee_ids[rng.integers(0, len(employee_ids), n)].astype(object)
+    unknown = _hit(rng, rates, 'unknown_employee', n)
+    employee_id[unknown] = rng.integers(90_000_000, 99_999_999, int(unknown.sum()))
+    expense_type = pd.Series(_pick(rng, EXPENSE_TYPES, n), dtype=object)
+    expense_type[_hit(rng, rates, 'travell', n)] = 'Travell'
+    amount = pd.Series(np.round(rng.uniform(10, 2000, n), 2), dtype=object)
+    refund = _hit(rng, rates, 'refund', n)
+    amount[refund] = -amount[refund]
+    invalid = _hit(rng, rates, 'invalid_amount', n)
+    amount[invalid] = _pick(rng, INVALID_AMOUNTS, int(invalid.sum()))
+
+    df = pd.DataFrame({
+        'EmployeeID': employee_id,
+        'ExpenseType': _blank(rng, rates, expense_type),
+        'ExpenseAmount': amount,
+        'ExpenseDate': _dates(rng, rates, n, '2023-01-01', '2025-12-31'),
+        'ApprovedBy': _blank(rng, rates, pd.Series(rng.integers(2001, 2010, n).astype(float))),
+    })
+    return _with_duplicates(rng, rates, df)
+
+
+def operations_block(rng, rates, n):
+    department = pd.Series(_pick(rng, DEPARTMENTS, n), dtype=object)
+    cased = _hit(rng, rates, 'department_case', n)
+    department[cased] = _department_dirt(rng, department[cased]).to_numpy()
+    location = pd.Series(_pick(rng, LOCATIONS, n), dtype=object)
+    typo = _hit(rng, rates, 'location_typo', n)
+    location[typo] = location[typo].str.replace('Remote', 'Remot').str.replace('Warehouse', 'Warehose')
+    downtime = pd.Series(np.round(rng.uniform(0.25, 12, n), 2), dtype=object)
+    invalid = _hit(rng, rates, 'invalid_amount', n)
+    downtime[invalid] = _pick(rng, INVALID_AMOUNTS, int(invalid.sum()))
+
+    df = pd.DataFrame({
+        'Department': _blank(rng, rates, department),
+        'ProcessName': _blank(rng, rates, pd.Series(_pick(rng, PROCESSES, n))),
+        'DowntimeHours': downtime,
+        'ProcessDate': _dates(rng, rates, n, '2023-01-01', '2025-12-31'),
+        'Location': _blank(rng, rates, location),
+    })
+    return _with_duplicates(rng, rates, df)
+
+
+class _Writer:
+    """Appends blocks to one .xlsx (write-only workbook) or .csv file."""
+
+    def __init__(self, path):
+        self.path = path
+        self.rows = 0
+        self._csv = path.endswith('.csv')
+        self._wb = None if self._csv else Workbook(write_only=True)
+        self._ws = None if self._csv else self._wb.create_sheet()
+
+    def write(self, df):
+        if self._csv:
+            df.to_csv(self.path, mode='a' if self.rows else 'w', header=not self.rows, index=False)
+        else:
+            if not self.rows:
+                self._ws.append(list(df.columns))
+            for row in df.itertuples(index=False):
+                self._ws.append([None if pd.isna(v) else v for v in row])
+        self.rows += len(df)
+
+    def close(self):
+        if not self._csv:
+            self._wb.save(self.path)
+
+
+def _blocks(total, block_rows):
+    done = 0
+    while done < total:
+        n = min(block_rows, total - done)
+        yield done, n
+        done += n
+
+
+def generate(out_dir, hr_rows, finance_rows, operations_rows, fmt='xlsx', rates=None, seed=42,
+             block_rows=BLOCK_ROWS):
+    """Write the three feeds into out_dir; returns {dataset: {path, rows, bytes, seconds}}.
+
+    Row counts are before duplicates, which are added on top at the 'duplicate' rate.
+    """
+    rates = {**DIRT_RATES, **(rates or {})}
+    if fmt == 'xlsx':
+        largest = max(hr_rows, finance_rows, operations_rows) * (1 + rates['duplicate'])
+        if largest > EXCEL_MAX_ROWS:
+            raise ValueError(f"{int(largest)} rows do not fit in one worksheet, use --format csv")
+    os.makedirs(out_dir, exist_ok=True)
+    seeds = np.random.SeedSequence(seed).spawn(3)
+    employee_ids = np.arange(1001, 1001 + max(hr_rows, 1))
+
+    plans = {
+        'hr': (hr_rows, lambda rng, start, n: hr_block(rng, rates, 1001 + start, n)),
+        'finance': (finance_rows, lambda rng, start, n: finance_block(rng, rates, employee_ids, n)),
+        'operations': (operations_rows, lambda rng, start, n: operations_block(rng, rates, n)),
+    }
+    summary = {}
+    for (name, (rows, make_block)), seq in zip(plans.items(), seeds):
+        start_time = time.perf_counter()
+        rng = np.random.default_rng(seq)
+        writer = _Writer(os.path.join(out_dir, f'{FILE_NAMES[name]}.{fmt}'))
+        for start, n in _blocks(rows, block_rows):
+            writer.write(make_block(rng, start, n))
+        writer.close()
+        summary[name] = {
+            'path': writer.path,
+            'rows': writer.rows,
+            'bytes': os.path.getsize(writer.path),
+            'seconds': round(time.perf_counter() - start_time, 2),
+        }
+    return summary
+
+
+def parse_rates(items):
+    rates = {}
+    for item in items or []:
+        kind, _, value = item.partition('=')
+        if kind not in DIRT_RATES:
+            raise argparse.ArgumentTypeError(f"unknown dirt kind {kind!r}, one of {', '.join(DIRT_RATES)}")
+        rates[kind] = float(value)
+    return rates
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate dirty HR / Finance / Operations feeds.")
+    parser.add_argument('--rows', type=int, default=10_000, help="rows per dataset (default 10000)")
+    parser.add_argument('--hr-rows', type=int, help="HR rows, defaults to --rows")
+    parser.add_argument('--finance-rows', type=int, help="Finance rows, defaults to --rows")
+    parser.add_argument('--operations-rows', type=int, help="Operations rows, defaults to --rows")
+    parser.add_argument('--format', choices=['xlsx', 'csv'], default='xlsx')
+    parser.add_argument('--out', default='generated_data', help="output folder")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--dirt-scale', type=float, default=1.0, help="multiply every dirt rate")
+    parser.add_argument('--rate', action='append', metavar='KIND=RATE',
+                        help=f"override one dirt rate ({', '.join(DIRT_RATES)})")
+    args = parser.parse_args(argv)
+
+    try:
+        overrides = parse_rates(args.rate)
+    except argparse.ArgumentTypeError as e:
+        parser.error(str(e))
+    rates = {kind: min(1.0, rate * args.dirt_scale) for kind, rate in DIRT_RATES.items()}
+    rates.update(overrides)
+
+    try:
+        summary = generate(
+            args.out,
+            args.hr_rows if args.hr_rows is not None else args.rows,
+            args.finance_rows if args.finance_rows is not None else args.rows,
+            args.operations_rows if args.operations_rows is not None else args.rows,
+            fmt=args.format, rates=rates, seed=args.seed,
+        )
+    except ValueError as e:
+        parser.error(str(e))
+    print(json.dumps({'generated_at': datetime.datetime.now().isoformat(timespec='seconds'),
+                      'seed': args.seed, 'rates': rates, 'datasets': summary}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+# group_stats.py
+# Running downtime totals per (department, process, location), kept in stg.ops_downtime_group_stats.
+#
+# The Operations pipeline fills a missing downtime_hours with the mean of its group. The
+# mean used to come from the file being loaded only, so a small batch imputed from a
+# handful of rows. The table keeps the sum and count of every known downtime loaded so
+# far; a run reads it once, adds the stats of its own new rows for the imputation, and
+# adds those same stats to the table when it is done. Rows staged by an earlier load, and
+# the repeats of a row within the run, are left out of a run's stats, so a re-sent or fully
+# refreshed file, or a row sent twice, is not counted twice.
+import pandas as pd
+from psycopg2.extras import execute_values
+
+
+GROUP_KEYS = ['department_name', 'process_name', 'location_name']
+
+
+def empty_group_stats():
+    return pd.DataFrame(
+        {'sum': pd.Series(dtype='float64'), 'count': pd.Series(dtype='int64')},
+        index=pd.MultiIndex.from_arrays([[], [], []], names=GROUP_KEYS),
+    )
+
+
+def load_group_stats(engine):
+    """Stored sum and count of known downtime per group, indexed by GROUP_KEYS."""
+    conn = engine.raw_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("""
+                SELECT department_name, process_name, location_name, downtime_sum, downtime_count
+                FROM stg.ops_downtime_group_stats
+            """)
+            rows = cursor.fetchall()
+    finally:
+        conn.close()
+    if not rows:
+        return empty_group_stats()
+    stats = pd.DataFrame(rows, columns=GROUP_KEYS + ['sum', 'count']).set_index(GROUP_KEYS)
+    return stats.astype({'sum': 'float64', 'count': 'int64'})
+
+
+def save_group_stats(engine, stats, job_id):
+    """Add a run's per-group sums and counts to the stored totals."""
+    if stats.empty:
+        return
+    records = [(*keys, float(total), int(count), job_id)
+               for keys, total, count in zip(stats.index, stats['sum'].tolist(), stats['count'].tolist())]
+    conn = engine.raw_connection()
+    try:
+        with conn.cursor() as cursor:
+            execute_values(cursor, """
+                INSERT INTO stg.ops_downtime_group_stats (
+                  department_name, process_name, location_name, downtime_sum, downtime_count, job_id
+                ) VALUES %s
+                ON CONFLICT (department_name, process_name, location_name) DO UPDATE
+                SET downtime_sum = stg.ops_downtime_group_stats.downtime_sum + EXCLUDED.downtime_sum,
+                    downtime_count = stg.ops_downtime_group_stats.downtime_count + EXCLUDED.downtime_count,
+                    job_id = EXCLUDED.job_id,
+                    updated_at = CURRENT_TIMESTAMP
+            """, records)
+        conn.commit()
+    finally:
+        conn.close()
@@ -0,0 +1,311 @@
+# kpi.py
+# Cached access to the warehouse KPIs (the dw.vw_kpi_* views of 04_KPI/KPIs.sql).
+#
+# One function per KPI, each taking optional filters and returning a DataFrame:
+#
+#     from kpi import headcount, net_expenses, cache_stats
+#     headcount(start='2024-01-01', end='2024-03-31')
+#     net_expenses(department='FINANCE', expense_type=['TRAVEL', 'MEALS'])
+#
+# Results are kept in a KPICache, an LRU of ETL_KPI_CACHE_SIZE entries that each expire
+# ETL_KPI_CACHE_TTL seconds after they were read. The cache also watches dw.audit_log:
+# any record of a table a KPI is built on (a fact load, a dim_employee merge, even one
+# that only expires rows, or the 'kpi_aggregates' record of dw.refresh_kpi_aggregates())
+# drops the entries of that KPI, so a dashboard never waits out the TTL on data that has
+# changed. The audit log is checked at most every ETL_KPI_CACHE_CHECK seconds, with a
+# scan of the log_ids after the last one seen. Every invalidation bumps a generation per
+# table, and a query result is only stored if the generations of its tables did not move
+# while it ran, so a result read before a load is not cached after it.
+# cache_stats() reports hits, misses, evictions, expirations and invalidations.
+import collections
+import datetime
+import os
+import sys
+import threading
+import time
+
+import pandas as pd
+
+from db import get_engine
+
+
+CACHE_SIZE = int(os.environ.get('ETL_KPI_CACHE_SIZE', '256'))
+CACHE_TTL = float(os.environ.get('ETL_KPI_CACHE_TTL', '900'))
+CACHE_CHECK = float(os.environ.get('ETL_KPI_CACHE_CHECK', '5'))
+
+# The tables behind each KPI, as named in dw.audit_log
+KPI_TABLES = {
+    'headcount': ['fact_employee', 'kpi_aggregates'],
+    'resignations': ['fact_employee', 'kpi_aggregates'],
+    'avg_salary_by_gender': ['fact_employee', 'dim_employee'],
+    'gross_expenses': ['fact_expenses', 'kpi_aggregates'],
+    'net_expenses': ['fact_expenses', 'kpi_aggregates'],
+    'net_expenses_by_expense_type': ['fact_expenses', 'kpi_aggregates'],
+    'downtime_by_process': ['fact_downtime', 'kpi_aggregates'],
+    'downtime_by_dept': ['fact_downtime', 'kpi_aggregates'],
+}
+
+
+def _as_list(value):
+    if value is None or isinstance(value, (list, tuple)):
+        return None if value is None else list(value)
+    return [value]
+
+
+def _cache_key(name, filters):
+    return (name,) + tuple(
+        (column, tuple(value) if isinstance(value, list) else str(value))
+        for column, value in sorted(filters.items()) if value is not None
+    )
+
+
+class KPICache:
+    """LRU + TTL cache of KPI results, invalidated by new records in dw.audit_log."""
+
+    def __init__(self, engine=None, maxsize=None, ttl=None, check_interval=None):
+        self.engine = engine or get_engine()
+        self.maxsize = CACHE_SIZE if maxsize is None else maxsize
+        self.ttl = CACHE_TTL if ttl is None else ttl
+        self.check_interval = CACHE_CHECK if check_interval is None else check_interval
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self._entries = collections.OrderedDict()
+        self._generations = collections.Counter()
+        self._lock = threading.Lock()
+        self._check_lock = threading.Lock()
+        self._last_log_id = None
+        self._checked_at = None
+
+    def get(self, name, filters, query):
+        """The cached result of a KPI query, or query() run and cached."""
+        self._check_loads()
+        key = _cache_key(name, filters)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] <= now:
+                del self._entries[key]
+                self.expirations += 1
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0].copy()
+            self.misses += 1
+            generation = self._generation(name)
+
+        result = query()
+        with self._lock:
+            if self._generation(name) != generation:
+                # Invalidated while the query ran, the result may predate the load
+                return result.copy()
+            self._entries[key] = (result, time.monotonic() + self.ttl, name)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return result.copy()
+
+    def _generation(self, name):
+        return tuple(self._generations[table] for table in KPI_TABLES.get(name, []))
+
+    def invalidate(self, tables=None):
+        """Drop the entries of KPIs built on tables (all entries when tables is None)."""
+        with self._lock:
+            for table in ({t for names in KPI_TABLES.values() for t in names} if tables is None else tables):
+                self._generations[table] += 1
+            stale = [key for key, entry in self._entries.items()
+                     if tables is None or set(KPI_TABLES.get(entry[2], [])) & set(tables)]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += len(stale)
+        return len(stale)
+
+    def _check_loads(self):
+        with self._check_lock:
+            now = time.monotonic()
+            if self._checked_at is not None and now - self._checked_at < self.check_interval:
+                return
+            self._checked_at = now
+            self._read_loads()
+
+    def _read_loads(self):
+        tables = sorted({table for names in KPI_TABLES.values() for table in names})
+        conn = self.engine.raw_connection()
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("""
+                    SELECT table_name, MAX(log_id)
+                    FROM dw.audit_log
+                    WHERE log_id > %s
+                      AND table_name = ANY(%s)
+                    GROUP BY table_name
+                """, (self._last_log_id or 0, tables))
+                loads = dict(cursor.fetchall())
+                if self._last_log_id is None:
+                    cursor.execute("SELECT COALESCE(MAX(log_id), 0) FROM dw.audit_log")
+                    last_log_id = cursor.fetchone()[0]
+        finally:
+            conn.close()
+        if self._last_log_id is None:
+            # First check: the entries (if any) were read after these loads
+            self._last_log_id = last_log_id
+            return
+        if loads:
+            self._last_log_id = max(self._last_log_id, *loads.values())
+            self.invalidate(list(loads))
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 3) if lookups else None,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations,
+            }
+
+
+_cache = None
+
+
+def get_cache():
+    """The KPI cache of this process, on the process's pooled engine."""
+    global _cache
+    if _cache is None:
+        _cache = KPICache()
+    return _cache
+
+
+def cache_stats():
+    return get_cache().stats()
+
+
+def _read(engine, view, where, order_by):
+    clauses = [clause for clause, value in where if value is not None]
+    params = [value for _, value in where if value is not None]
+    sql = f"SELECT * FROM dw.{view}"
+    if clauses:
+        sql += " WHERE " + " AND ".join(clauses)
+    sql += f" ORDER BY {order_by}"
+    conn = engine.raw_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(sql, params)
+            columns = [c[0] for c in cursor.description]
+            rows = cursor.fetchall()
+    finally:
+        conn.close()
+    return pd.DataFrame(rows, columns=columns)
+
+
+def _kpi(name, view, where, order_by, filters, cache):
+    cache = cache or get_cache()
+    return cache.get(name, filters, lambda: _read(cache.engine, view, where, order_by))
+
+
+def _month(value):
+    # First day of the month of a date (or 'YYYY-MM-DD' string)
+    if value is None:
+        return None
+    value = pd.Timestamp(value).date()
+    return datetime.date(value.year, value.month, 1)
+
+
+def headcount(start=None, end=None, cache=None):
+    """Active headcount per day, between the dates start and end (inclusive)."""
+    filters = {'start': start, 'end': end}
+    where = [("make_date(year, month, day) >= %s::date", start), ("make_date(year, month, day) <= %s::date", end)]
+    return _kpi('headcount', 'vw_kpi_headcount', where, 'year, month, day', filters, cache)
+
+
+def resignations(start=None, end=None, cache=None):
+    """Resignations per day, between the dates start and end (inclusive)."""
+    filters = {'start': start, 'end': end}
+    where = [("make_date(year, month, day) >= %s::date", start), ("make_date(year, month, day) <= %s::date", end)]
+    return _kpi('resignations', 'vw_kpi_resignations', where, 'year, month, day', filters, cache)
+
+
+def avg_salary_by_gender(gender=None, cache=None):
+    """Average salary of current employees per gender ('M', 'F', 'U' or a list of them)."""
+    gender = _as_list(gender)
+    filters = {'gender': gender}
+    where = [("gender = ANY(%s)", gender)]
+    return _kpi('avg_salary_by_gender', 'vw_kpi_avg_salary_by_gender', where, 'gender', filters, cache)
+
+
+def _expense_filters(start, end, department, expense_type):
+    start, end = _month(start), _month(end)
+    department, expense_type = _as_list(department), _as_list(expense_type)
+    filters = {'start': start, 'end': end, 'department': department, 'expense_type': expense_type}
+    where = [
+        ("make_date(year, month, 1) >= %s", start),
+        ("make_date(year, month, 1) <= %s", end),
+        ("department_name = ANY(%s)", department),
+        ("expense_type_name = ANY(%s)", expense_type),
+    ]
+    return filters, where
+
+
+def gross_expenses(start=None, end=None, department=None, expense_type=None, cache=None):
+    """Monthly expenses without refunds per department and expense type, for the months start to end."""
+    filters, where = _expense_filters(start, end, department, expense_type)
+    return _kpi('gross_expenses', 'vw_kpi_gross_monthly_expenses_by_dept', where,
+                'year, month, department_name, expense_type_name', filters, cache)
+
+
+def net_expenses(start=None, end=None, department=None, expense_type=None, cache=None):
+    """Monthly expenses net of refunds per department and expense type, for the months start to end."""
+    filters, where = _expense_filters(start, end, department, expense_type)
+    return _kpi('net_expenses', 'vw_kpi_net_monthly_expenses_by_dept', where,
+                'year, month, department_name, expense_type_name', filters, cache)
+
+
+def net_expenses_by_expense_type(start=None, end=None, expense_type=None, cache=None):
+    """Monthly expenses net of refunds per expense type, for the months start to end."""
+    filters, where = _expense_filters(start, end, None, expense_type)
+    return _kpi('net_expenses_by_expense_type', 'vw_kpi_net_monthly_expenses_by_expense', where,
+                'year, month, expense_type_name', filters, cache)
+
+
+def downtime_by_process(process=None, cache=None):
+    """Total and average downtime hours per process."""
+    process = _as_list(process)
+    filters = {'process': process}
+    where = [("process_name = ANY(%s)", process)]
+    return _kpi('downtime_by_process', 'vw_kpi_downtime_by_process', where, 'total_downtime DESC', filters, cache)
+
+
+def downtime_by_dept(department=None, cache=None):
+    """Total and average downtime hours per department."""
+    department = _as_list(department)
+    filters = {'department': department}
+    where = [("department_name = ANY(%s)", department)]
+    return _kpi('downtime_by_dept', 'vw_kpi_downtime_by_dept', where, 'total_downtime DESC', filters, cache)
+
+
+KPIS = {
+    'headcount': headcount,
+    'resignations': resignations,
+    'avg_salary_by_gender': avg_salary_by_gender,
+    'gross_expenses': gross_expenses,
+    'net_expenses': net_expenses,
+    'net_expenses_by_expense_type': net_expenses_by_expense_type,
+    'downtime_by_process': downtime_by_process,
+    'downtime_by_dept': downtime_by_dept,
+}
+
+
+if __name__ == "__main__":
+    for name in sys.argv[1:] or list(KPIS):
+        print(f"== {name}")
+        print(KPIS[name]().to_string(index=False))
+    print(cache_stats())
@@ -0,0 +1,100 @@
+# load.py
+# Bulk loading into the pre-created staging tables and the DQ / audit logs.
+#
+# Frames are streamed into PostgreSQL with COPY ... FROM STDIN (CSV) instead of the
+# INSERT batches DataFrame.to_sql generates. Staging tables are truncated and reloaded
+# rather than dropped and re-created, so the typed columns from combined_dw_schema.sql
+# survive every run. Each loader keeps track of rows and COPY time to report rows/sec.
+import io
+import time
+
+
+NULL = r'\N'
+
+
+def _quote(name):
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def _csv_buffer(df):
+    buf = io.StringIO()
+    df.to_csv(buf, index=False, header=False, na_rep=NULL)
+    buf.seek(0)
+    return buf
+
+
+class CopyLoader:
+    """COPY DataFrames into one existing table over a single connection.
+
+    With truncate=True the table is emptied when the loader is opened; with replace, a
+    {column: value} filter, only the matching rows are deleted (tables shared by the
+    pipelines, one slice per source). Nothing is visible to other sessions until the
+    loader is closed without an error, so a failed run leaves the previous contents of
+    the table in place.
+
+        with CopyLoader(engine, 'staging_employee', 'stg', truncate=True) as staging:
+            for chunk in chunks:
+                staging.write(chunk)
+        print(staging.summary())
+    """
+
+    def __init__(self, engine, table, schema, truncate=False, replace=None):
+        self.engine = engine
+        self.table = table
+        self.schema = schema
+        self.truncate = truncate
+        self.replace = replace
+        self.rows = 0
+        self.seconds = 0.0
+        self._conn = None
+
+    @property
+    def qualified_name(self):
+        return f'{_quote(self.schema)}.{_quote(self.table)}'
+
+    @property
+    def rows_per_sec(self):
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    def __enter__(self):
+        self._conn = self.engine.raw_connection()
+        with self._conn.cursor() as cursor:
+            if self.truncate:
+                cursor.execute(f'TRUNCATE TABLE {self.qualified_name}')
+            elif self.replace:
+                where = ' AND '.join(f'{_quote(column)} = %s' for column in self.replace)
+                cursor.execute(f'DELETE FROM {self.qualified_name} WHERE {where}', list(self.replace.values()))
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                self._conn.commit()
+            else:
+                self._conn.rollback()
+        finally:
+            self._conn.close()
+            self._conn = None
+        return False
+
+    def write(self, df):
+        """COPY the frame's columns into the table's columns of the same name."""
+        if df.empty:
+            return
+        start = time.perf_counter()
+        columns = ', '.join(_quote(c) for c in df.columns)
+        sql = f"COPY {self.qualified_name} ({columns}) FROM STDIN WITH (FORMAT csv, NULL '{NULL}')"
+        with self._conn.cursor() as cursor:
+            cursor.copy_expert(sql, _csv_buffer(df))
+        self.seconds += time.perf_counter() - start
+        self.rows += len(df)
+
+    def summary(self):
+        return f'{self.schema}.{self.table}: {self.rows} rows in {self.seconds:.2f}s ({self.rows_per_sec:,.0f} rows/sec)'
+
+
+def copy_frame(engine, df, table, schema, truncate=False, replace=None):
+    """One-shot COPY of a single frame (audit records and other small appends)."""
+    with CopyLoader(engine, table, schema, truncate=truncate, replace=replace) as loader:
+        loader.write(df)
+    return loader
@@ -0,0 +1,167 @@
+# metrics.py
+# Per-stage timing, memory and throughput of the staging pipelines, kept in dw.etl_stage_metrics.
+#
+# Each step of a pipeline runs inside `metrics.stage(name)`. A stage records wall time,
+# CPU time of the process, how much it raised the process's peak RSS, and the rows that
+# went in and came out. Stages that run once per chunk are summed into one record per
+# stage name (with the number of calls), which the pipeline writes next to its audit
+# record when it finishes, together with a 'total' record covering the whole run. A stage
+# opened inside another one is also counted in the outer stage ('clean.dates' is part of
+# 'clean'); whatever no stage covers (commits, audit records) only shows in 'total'.
+#
+# ETL_METRICS=0 turns it off: stage() then hands back one shared do-nothing context, so
+# the instrumented code costs a method call per stage and nothing is written.
+import os
+import sys
+import time
+
+import pandas as pd
+
+from load import copy_frame
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+ENABLED = os.environ.get('ETL_METRICS', '1').lower() not in ('0', 'false', 'no', 'off')
+
+METRIC_COLUMNS = ['job_id', 'pipeline', 'stage', 'calls', 'rows_in', 'rows_out',
+                  'wall_seconds', 'cpu_seconds', 'peak_rss_delta_kb', 'peak_rss_kb']
+
+
+def peak_rss_kb():
+    """Peak resident set size of this process so far, in KB (None where unavailable)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KB, macOS bytes
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+
+class _Stage:
+    """One timed run of a stage; set rows_in / rows_out on it inside the with block."""
+
+    def __init__(self, metrics, name, rows_in):
+        self.metrics = metrics
+        self.name = name
+        self.rows_in = rows_in
+        self.rows_out = None
+
+    def __enter__(self):
+        self._rss = peak_rss_kb()
+        self._cpu = time.process_time()
+        self._wall = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        wall = time.perf_counter() - self._wall
+        cpu = time.process_time() - self._cpu
+        rss = peak_rss_kb()
+        self.metrics._record(self.name, wall, cpu, self._rss, rss, self.rows_in, self.rows_out)
+        return False
+
+
+class _NoStage:
+    rows_in = None
+    rows_out = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def __setattr__(self, name, value):
+        pass
+
+
+_NO_STAGE = _NoStage()
+
+
+class StageMetrics:
+    """Stage records of one pipeline run.
+
+        metrics = StageMetrics(job_id, 'hr')
+        for df in metrics.iterate('extract', read_source(source)):
+            with metrics.stage('clean', rows_in=len(df)) as stage:
+                df = clean(df)
+                stage.rows_out = len(df)
+        metrics.finish(rows_in=original_rows, rows_out=staged_rows)
+        metrics.save(engine)
+    """
+
+    def __init__(self, job_id, pipeline, enabled=None):
+        self.job_id = job_id
+        self.pipeline = pipeline
+        self.enabled = ENABLED if enabled is None else enabled
+        self.stages = {}
+        self._run = _Stage(self, 'total', None).__enter__() if self.enabled else None
+
+    def stage(self, name, rows_in=None):
+        if not self.enabled:
+            return _NO_STAGE
+        return _Stage(self, name, rows_in)
+
+    def iterate(self, name, iterable, rows=len):
+        """Yield from iterable, timing each step as a stage whose rows_out is rows(item), the item's length."""
+        if not self.enabled:
+            return iterable
+        return self._iterate(name, iterable, rows)
+
+    def _iterate(self, name, iterable, rows):
+        iterator = iter(iterable)
+        while True:
+            with self.stage(name) as stage:
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+                stage.rows_out = rows(item)
+            yield item
+
+    def _record(self, name, wall, cpu, rss_before, rss_after, rows_in, rows_out):
+        record = self.stages.setdefault(name, {
+            'calls': 0, 'rows_in': None, 'rows_out': None, 'wall_seconds': 0.0, 'cpu_seconds': 0.0,
+            'peak_rss_delta_kb': None, 'peak_rss_kb': None,
+        })
+        record['calls'] += 1
+        record['wall_seconds'] += wall
+        record['cpu_seconds'] += cpu
+        if rows_in is not None:
+            record['rows_in'] = (record['rows_in'] or 0) + rows_in
+        if rows_out is not None:
+            record['rows_out'] = (record['rows_out'] or 0) + rows_out
+        if rss_after is not None:
+            record['peak_rss_delta_kb'] = (record['peak_rss_delta_kb'] or 0) + rss_after - rss_before
+            record['peak_rss_kb'] = max(record['peak_rss_kb'] or 0, rss_after)
+
+    def records(self):
+        """One row per stage, in the order the stages first ran."""
+        rows = [{'job_id': self.job_id, 'pipeline': self.pipeline, 'stage': name, **record}
+                for name, record in self.stages.items()]
+        df = pd.DataFrame(rows, columns=METRIC_COLUMNS)
+        df[['wall_seconds', 'cpu_seconds']] = df[['wall_seconds', 'cpu_seconds']].astype(float).round(3)
+        for column in ['rows_in', 'rows_out', 'peak_rss_delta_kb', 'peak_rss_kb']:
+            df[column] = df[column].astype('Int64')
+        return df
+
+    def finish(self, rows_in=None, rows_out=None):
+        """Close the 'total' record of the run."""
+        if self._run is not None:
+            self._run.rows_in, self._run.rows_out = rows_in, rows_out
+            self._run.__exit__(None, None, None)
+            self._run = None
+
+    def save(self, engine):
+        self.finish()
+        if self.stages:
+            copy_frame(engine, self.records(), 'etl_stage_metrics', 'dw')
+
+    def summary(self):
+        return ', '.join(f"{name} {record['wall_seconds']:.2f}s" for name, record in self.stages.items())
+
+
+# Default for helpers that take an optional StageMetrics
+NO_METRICS = StageMetrics(None, None, enabled=False)
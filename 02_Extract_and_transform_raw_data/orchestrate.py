@@ -0,0 +1,238 @@
+# orchestrate.py
+# Runs an ETL job as a dependency graph: the staging pipelines, then the SQL load steps.
+#
+# TL_combine.sql loads every fact table in turn. Its sections are marked with
+# `-- @node <name> after <node>, ...`, and here each section is a node of a graph
+# together with the HR, Finance and Operations pipelines (extract, transform and
+# staging). A node starts as soon as the nodes it comes after have succeeded, so
+# fact_downtime loads while fact_employee and fact_expenses are still going, and the
+# Operations load does not wait for the HR pipeline. The loads share one dim_time node
+# that extends dim_time and creates their partitions first, as doing that concurrently
+# deadlocks. A node whose dependency failed is skipped.
+#
+# The pipelines run in worker processes as in ET_combined.run_etl_job. Every SQL node
+# runs in one transaction on its own connection from the engine's pool, and is given
+# the job id through its own temp_etl_job. The load scripts' in-script stage marks
+# assume one session, so they are turned off here. Instead each node's wall time goes
+# to dw.etl_stage_metrics (pipeline 'orchestrator'), and a failed or skipped node gets a
+# dw.audit_log record with the error.
+import argparse
+import os
+import re
+import sys
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+import pandas as pd
+
+from ET_combined import CHUNKSIZE, FULL_REFRESH, PIPELINES, WORKERS, run_pipeline
+from db import get_engine, pool_stats
+from load import copy_frame
+from metrics import METRIC_COLUMNS
+from sources import file_workers
+
+
+TL_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir,
+                         '03_load_into_fact_and_dim_tables', 'TL_combine.sql')
+
+NODE_MARKER = re.compile(r'^--\s*@node\s+(\w+)(?:\s+after\s+(.+?))?\s*$', re.MULTILINE)
+
+
+class Node:
+    """One step of the graph: run() does the work and returns a message."""
+
+    def __init__(self, name, run, after=(), kind='sql'):
+        self.name = name
+        self.run = run
+        self.after = list(after)
+        self.kind = kind
+
+
+class Dag:
+    """Nodes run on a thread pool, each as soon as everything it comes after succeeded.
+
+        dag = Dag([Node('a', load_a), Node('b', load_b, after=['a'])])
+        results = dag.run(max_workers=4)
+    """
+
+    def __init__(self, nodes):
+        self.nodes = {node.name: node for node in nodes}
+        self.order = self._topological_order()
+
+    def _topological_order(self):
+        order, visiting, done = [], set(), set()
+
+        def visit(name, path):
+            if name in done:
+                return
+            if name not in self.nodes:
+                raise ValueError(f"{path[-1]} comes after unknown node {name}")
+            if name in visiting:
+                raise ValueError(f"Dependency cycle: {' -> '.join(path + [name])}")
+            visiting.add(name)
+            for dependency in self.nodes[name].after:
+                visit(dependency, path + [name])
+            visiting.discard(name)
+            done.add(name)
+            order.append(name)
+
+        for name in self.nodes:
+            visit(name, [name])
+        return order
+
+    def _run_node(self, node, started_at):
+        start = time.perf_counter()
+        try:
+            message = node.run()
+            status = 'success'
+        except Exception as e:
+            message = f"{type(e).__name__}: {e}"
+            status = 'failed'
+        # A pipeline reports its own failure instead of raising
+        if isinstance(message, dict):
+            status, message = message['status'], message['message']
+        return {
+            'node': node.name,
+            'kind': node.kind,
+            'status': status,
+            'started': round(start - started_at, 3),
+            'seconds': round(time.perf_counter() - start, 3),
+            'message': message,
+        }
+
+    def run(self, max_workers=None):
+        """Run the graph and return one result record per node, in topological order."""
+        started_at = time.perf_counter()
+        results = {}
+        pending = list(self.order)
+        running = {}
+        with ThreadPoolExecutor(max_workers=max_workers or len(self.nodes) or 1) as pool:
+            while pending or running:
+                for name in list(pending):
+                    node = self.nodes[name]
+                    states = [results[d]['status'] if d in results else None for d in node.after]
+                    blocked = [d for d, state in zip(node.after, states) if state not in (None, 'success')]
+                    if blocked:
+                        pending.remove(name)
+                        results[name] = {'node': name, 'kind': node.kind, 'status': 'skipped',
+                                         'started': None, 'seconds': None,
+                                         'message': f"Skipped, {', '.join(blocked)} did not succeed"}
+                    elif all(state == 'success' for state in states):
+                        pending.remove(name)
+                        running[pool.submit(self._run_node, node, started_at)] = name
+                if not running:
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    results[running.pop(future)] = future.result()
+        return [results[name] for name in self.order]
+
+
+def load_nodes(engine, job_id, path=TL_SCRIPT):
+    """The @node sections of TL_combine.sql as SQL nodes; the text before the first marker is left out."""
+    with open(path) as f:
+        script = f.read()
+    markers = list(NODE_MARKER.finditer(script))
+    nodes = []
+    for marker, following in zip(markers, markers[1:] + [None]):
+        sql = script[marker.end():following.start() if following else len(script)]
+        after = [d.strip() for d in marker.group(2).split(',')] if marker.group(2) else []
+        nodes.append(Node(marker.group(1), lambda sql=sql: run_sql(engine, job_id, sql), after))
+    return nodes
+
+
+def run_sql(engine, job_id, sql):
+    """Run one load section in a transaction of its own, under job_id."""
+    conn = engine.raw_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SET LOCAL etl.metrics = off")
+            cursor.execute("CREATE TEMP TABLE temp_etl_job (job_id UUID) ON COMMIT DROP")
+            cursor.execute("INSERT INTO temp_etl_job VALUES (%s)", (job_id,))
+            cursor.execute(sql)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    return 'Loaded'
+
+
+def save_results(engine, job_id, results, seconds):
+    """Per-node timings to dw.etl_stage_metrics, failed and skipped nodes to dw.audit_log."""
+    metrics = pd.DataFrame([{
+        'job_id': job_id, 'pipeline': 'orchestrator', 'stage': r['node'], 'calls': 1,
+        'wall_seconds': r['seconds'],
+    } for r in results if r['seconds'] is not None] + [{
+        'job_id': job_id, 'pipeline': 'orchestrator', 'stage': 'total', 'calls': 1, 'wall_seconds': seconds,
+    }], columns=METRIC_COLUMNS)
+    copy_frame(engine, metrics, 'etl_stage_metrics', 'dw')
+
+    failures = [r for r in results if r['status'] != 'success']
+    if failures:
+        audit_log = pd.DataFrame([{
+            'job_id': job_id,
+            'table_name': r['node'],
+            'etl_stage': f"orchestrator_{r['kind']}",
+            'rows_processed': 0,
+            'rows_failed': 0,
+            'status': r['status'],
+            'message': r['message'],
+        } for r in failures])
+        copy_frame(engine, audit_log, 'audit_log', 'dw')
+
+
+def run_job(job_id=None, engine=None, workers=None, chunksize=None, pipelines=None, full_refresh=False,
+            load=True):
+    """Run the pipelines and the SQL load steps of one job as a graph.
+
+    pipelines limits the staging pipelines that run; load steps that come after a
+    pipeline left out still run, against whatever is staged. load=False runs the
+    pipelines only. Returns the job summary with one result record per node.
+    """
+    engine = engine or get_engine()
+    job_id = job_id or str(uuid.uuid4())
+    names = list(pipelines or PIPELINES)
+    workers = max(1, min(workers or len(names), len(names)))
+    start = time.perf_counter()
+
+    # Pipelines side by side share the CPUs the pool leaves over for parsing their files
+    parsers = file_workers(workers)
+    with ProcessPoolExecutor(max_workers=workers) as processes:
+        nodes = [Node(name, lambda name=name: processes.submit(run_pipeline, name, job_id, chunksize,
+                                                               full_refresh, parsers).result(), kind='pipeline')
+                 for name in names]
+        if load:
+            sql_nodes = load_nodes(engine, job_id)
+            for node in sql_nodes:
+                node.after = [d for d in node.after if d in names or d not in PIPELINES]
+            nodes += sql_nodes
+        results = Dag(nodes).run()
+
+    seconds = round(time.perf_counter() - start, 3)
+    save_results(engine, job_id, results, seconds)
+    return {
+        'job_id': job_id,
+        'status': 'success' if all(r['status'] == 'success' for r in results) else 'failed',
+        'workers': workers,
+        'seconds': seconds,
+        'nodes': results,
+        'pool': pool_stats(engine),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the staging pipelines and the SQL load as one dependency graph.")
+    parser.add_argument('--pipelines', nargs='+', choices=list(PIPELINES), help="pipelines to run (default: all)")
+    parser.add_argument('--no-load', action='store_true', help="run the pipelines only")
+    args = parser.parse_args()
+
+    summary = run_job(workers=WORKERS, chunksize=CHUNKSIZE, pipelines=args.pipelines, full_refresh=FULL_REFRESH,
+                      load=not args.no_load)
+    for result in summary['nodes']:
+        timing = f"+{result['started']}s, {result['seconds']}s" if result['seconds'] is not None else '-'
+        print(f"[{result['status']}] {result['node']} ({timing}): {result['message']}")
+    print(f"ETL job {summary['job_id']} {summary['status']} in {summary['seconds']}s | pool {summary['pool']}")
+    sys.exit(0 if summary['status'] == 'success' else 1)
@@ -0,0 +1,279 @@
+# parse_cache.py
+# On-disk cache of parsed source workbooks, stored as Arrow IPC files.
+#
+# Parsing .xlsx through openpyxl is the slowest step of every run, and reruns, retries and
+# debugging sessions parse the very same bytes again. An entry holds the raw frames a
+# reader produced for one (file content hash, sheet, read mode) and is read back through
+# a memory map on later runs. Whole-file reads are cached as one part, streamed reads as
+# one part per chunk, so filling the cache never needs more than a chunk in memory.
+#
+# Arrow columns have one type, while Excel columns often mix text, numbers and dates. Such
+# object columns are stored as tagged text ("i:42", "s:abc", "D:2020-01-01T00:00:00") and
+# decoded back to the same Python values, so a cached frame is identical to a parsed one.
+#
+# The cache is bounded by ETL_PARSE_CACHE_MB (least recently used entries are evicted)
+# and can be disabled with ETL_PARSE_CACHE=0 or emptied with `python parse_cache.py --clear`.
+import datetime
+import json
+import os
+import re
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+
+CACHE_DIR = os.path.join(os.environ.get('ETL_CACHE_DIR', '.etl_cache'), 'frames')
+MAX_BYTES = int(os.environ.get('ETL_PARSE_CACHE_MB', '512')) * 1024 * 1024
+ENABLED = os.environ.get('ETL_PARSE_CACHE', '1').lower() not in ('0', 'false', 'no', 'off')
+CACHE_VERSION = 1
+
+META_FILE = 'meta.json'
+
+
+# Tagged text for mixed object columns
+def _tag(value):
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return None
+    if isinstance(value, str):
+        return 's:' + value
+    if isinstance(value, (bool, np.bool_)):
+        return 'b:' + ('1' if value else '0')
+    if isinstance(value, (int, np.integer)):
+        return 'i:' + str(int(value))
+    if isinstance(value, (float, np.floating)):
+        return 'f:' + repr(float(value))
+    if isinstance(value, datetime.datetime):
+        return 'D:' + value.isoformat()
+    if isinstance(value, datetime.date):
+        return 'd:' + value.isoformat()
+    if isinstance(value, datetime.time):
+        return 't:' + value.isoformat()
+    raise TypeError(f"cannot cache value of type {type(value).__name__}")
+
+
+_UNTAG = {
+    's': lambda v: v,
+    'b': lambda v: v == '1',
+    'i': int,
+    'f': float,
+    'D': datetime.datetime.fromisoformat,
+    'd': datetime.date.fromisoformat,
+    't': datetime.time.fromisoformat,
+}
+
+
+def _untag(values):
+    out = pd.Series(np.nan, index=values.index, dtype=object)
+    present = values.notna()
+    tags = values[present].str[0]
+    payload = values[present].str[2:]
+    for tag, convert in _UNTAG.items():
+        hit = tags == tag
+        if hit.any():
+            out[hit[hit].index] = payload[hit].map(convert)
+    return out
+
+
+def _encode(df):
+    """DataFrame -> (Arrow table, metadata needed to rebuild the exact frame)."""
+    arrays, kinds = [], []
+    for i in range(df.shape[1]):
+        column = df.iloc[:, i]
+        if column.dtype == object:
+            present = column[column.notna()]
+            if present.map(lambda v: isinstance(v, str)).all():
+                # Plain text with blanks, the common case
+                arrays.append(pa.array(column.where(column.notna(), None), type=pa.string()))
+                kinds.append('text')
+            else:
+                arrays.append(pa.array(column.map(_tag), type=pa.string()))
+                kinds.append('tagged')
+        else:
+            arrays.append(pa.array(column.to_numpy()))
+            kinds.append(str(column.dtype))
+    names = [f'c{i}' for i in range(df.shape[1])]
+    meta = {
+        'columns': [None if pd.isna(c) else c for c in df.columns],
+        'kinds': kinds,
+        'start': int(df.index[0]) if len(df) else 0,
+    }
+    return pa.Table.from_arrays(arrays, names=names), meta
+
+
+def _decode(table, meta):
+    data = {}
+    for i, kind in enumerate(meta['kinds']):
+        values = table.column(i).to_pandas()
+        if kind == 'text':
+            values = values.astype(object).where(values.notna(), np.nan)
+        elif kind == 'tagged':
+            values = _untag(values)
+        else:
+            values = values.astype(kind)
+        data[i] = values.to_numpy()
+    df = pd.DataFrame(data)
+    df.columns = [np.nan if c is None else c for c in meta['columns']]
+    df.index = pd.RangeIndex(meta['start'], meta['start'] + len(df))
+    return df
+
+
+def _key(digest, sheet_name, mode):
+    sheet = re.sub(r'[^A-Za-z0-9_.-]', '_', str(sheet_name))
+    return f'{digest}-{sheet}-{mode}'
+
+
+class ParseCache:
+    """Directory of cached parses, one sub-directory per (file hash, sheet, mode)."""
+
+    def __init__(self, path=None, max_bytes=MAX_BYTES):
+        self.path = path or CACHE_DIR
+        self.max_bytes = max_bytes
+
+    def _entry(self, digest, sheet_name, mode):
+        return os.path.join(self.path, _key(digest, sheet_name, mode))
+
+    def get(self, digest, sheet_name, mode):
+        """Generator over the cached frames, or None when there is no (complete) entry."""
+        entry = self._entry(digest, sheet_name, mode)
+        try:
+            with open(os.path.join(entry, META_FILE)) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if meta.get('version') != CACHE_VERSION:
+            return None
+        # Mark as recently used for eviction
+        os.utime(entry)
+        return self._read_parts(entry, meta['parts'])
+
+    def _read_parts(self, entry, parts):
+        for part in parts:
+            with pa.memory_map(os.path.join(entry, part['file']), 'r') as source:
+                df = _decode(pa.ipc.open_file(source).read_all(), part)
+            yield df
+
+    def writer(self, digest, sheet_name, mode, source=None):
+        return CacheWriter(self, self._entry(digest, sheet_name, mode), source, sheet_name, mode)
+
+    def entries(self):
+        """(path, bytes, last used) for every complete entry, least recently used first."""
+        if not os.path.isdir(self.path):
+            return []
+        found = []
+        for name in os.listdir(self.path):
+            entry = os.path.join(self.path, name)
+            if not os.path.exists(os.path.join(entry, META_FILE)):
+                continue
+            size = sum(os.path.getsize(os.path.join(entry, f)) for f in os.listdir(entry))
+            found.append((entry, size, os.stat(entry).st_mtime))
+        return sorted(found, key=lambda e: e[2])
+
+    def evict(self, keep=None):
+        """Drop least recently used entries until the cache fits in max_bytes."""
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for entry, size, _ in entries:
+            if total <= self.max_bytes:
+                break
+            if entry == keep:
+                continue
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
+
+    def invalidate(self, source=None):
+        """Remove the entries of one source file (by name), or every entry."""
+        if source is None:
+            removed = len(self.entries())
+            shutil.rmtree(self.path, ignore_errors=True)
+            return removed
+        removed = 0
+        for entry, _, _ in self.entries():
+            with open(os.path.join(entry, META_FILE)) as f:
+                cached_source = json.load(f).get('source')
+            if cached_source is None or os.path.abspath(cached_source) != os.path.abspath(source):
+                continue
+            shutil.rmtree(entry, ignore_errors=True)
+            removed += 1
+        return removed
+
+
+class CacheWriter:
+    """Collects the frames of one read into a new entry; commit() publishes it atomically."""
+
+    def __init__(self, cache, entry, source, sheet_name, mode):
+        self.cache = cache
+        self.entry = entry
+        self.source = source
+        self.sheet_name = sheet_name
+        self.mode = mode
+        self.parts = []
+        os.makedirs(cache.path, exist_ok=True)
+        self._tmp = tempfile.mkdtemp(dir=cache.path, prefix='.tmp-')
+        self._failed = False
+
+    def add(self, df):
+        if self._failed:
+            return
+        try:
+            table, meta = _encode(df)
+        except (TypeError, pa.ArrowException):
+            # Values we cannot round-trip exactly: read this source without the cache
+            self._failed = True
+            return
+        meta['file'] = f'part-{len(self.parts):05d}.arrow'
+        with pa.OSFile(os.path.join(self._tmp, meta['file']), 'wb') as sink:
+            with pa.ipc.new_file(sink, table.schema) as ipc:
+                ipc.write_table(table)
+        self.parts.append(meta)
+
+    def commit(self):
+        if self._failed:
+            return self.abort()
+        with open(os.path.join(self._tmp, META_FILE), 'w') as f:
+            json.dump({
+                'version': CACHE_VERSION,
+                'source': self.source,
+                'sheet_name': self.sheet_name,
+                'mode': self.mode,
+                'created': time.time(),
+                'parts': self.parts,
+            }, f)
+        shutil.rmtree(self.entry, ignore_errors=True)
+        try:
+            os.replace(self._tmp, self.entry)
+        except OSError:
+            # Another process published the same entry first
+            return self.abort()
+        self.cache.evict(keep=self.entry)
+
+    def abort(self):
+        shutil.rmtree(self._tmp, ignore_errors=True)
+
+
+_default_cache = None
+
+
+def get_parse_cache():
+    """The shared cache, or None when caching is switched off."""
+    global _default_cache
+    if not ENABLED:
+        return None
+    if _default_cache is None:
+        _default_cache = ParseCache()
+    return _default_cache
+
+
+if __name__ == "__main__":
+    # python parse_cache.py --clear [source files...]
+    if '--clear' not in sys.argv:
+        print("usage: python parse_cache.py --clear [source files...]")
+        sys.exit(2)
+    files = [a for a in sys.argv[1:] if a != '--clear']
+    cache = ParseCache()
+    removed = sum(cache.invalidate(f) for f in files) if files else cache.invalidate()
+    print(f"Removed {removed} cached parse(s) from {cache.path}")
@@ -0,0 +1,173 @@
+# scd2.py
+# SCD Type 2 merge of the cleaned HR rows into dw.dim_employee.
+#
+# The current version of every employee (employee_id -> employee_sk, row_hash) is read once.
+# Each batch of staged rows is hashed, diffed against it in memory, and only the two
+# resulting sets go to the database: one UPDATE expiring the changed (or removed)
+# employees and one multi-row INSERT of their new versions. The counts come from that
+# diff, so they are exact for the run instead of "everything with valid_from = today".
+import hashlib
+from decimal import ROUND_HALF_UP, Decimal
+
+import numpy as np
+import pandas as pd
+from psycopg2.extras import execute_values
+
+from dim_keys import DimensionKeys
+
+
+HASH_COLUMNS = ['Name', 'Gender', 'DateOfJoining', 'ManagerID', 'Department', 'Salary', 'Status']
+
+CENT = Decimal('0.01')
+
+
+def _salary_text(value):
+    # Same text as the NUMERIC(12,2) staging column gives in SQL
+    if pd.isna(value):
+        return np.nan
+    return str(Decimal(repr(float(value))).quantize(CENT, rounding=ROUND_HALF_UP))
+
+
+def employee_row_hashes(df):
+    """md5 of the HASH_COLUMNS joined with '::', skipping blanks like concat_ws in SQL.
+
+    Matches the row_hash the SQL load used to write, so existing dim_employee rows
+    compare equal to unchanged staged rows.
+    """
+    parts = df[HASH_COLUMNS].astype(object).copy()
+    parts['Salary'] = parts['Salary'].map(_salary_text)
+    parts = parts.where(parts.notna(), None)
+    texts = ['::'.join(str(v) for v in row if v is not None) for row in parts.itertuples(index=False)]
+    return pd.Series([hashlib.md5(t.encode()).hexdigest() for t in texts], index=df.index)
+
+
+class EmployeeSCD2:
+    """Merge staged HR rows into dw.dim_employee within one transaction.
+
+        with EmployeeSCD2(engine) as dim:
+            dim.merge(hr_df)
+            dim.expire(removed_employee_ids)
+        print(dim.summary())
+
+    When an employee appears more than once in a run, in one batch or across batches,
+    the last row wins: a version the run has inserted is revised in place, so each run
+    adds at most one version per employee.
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.current = {}
+        self.departments = None
+        self.inserted = 0
+        self.expired = 0
+        self.unchanged = 0
+        self.revised = 0
+        self._added = set()
+        self._conn = None
+
+    def __enter__(self):
+        self._conn = self.engine.raw_connection()
+        with self._conn.cursor() as cursor:
+            cursor.execute("SELECT employee_id, employee_sk, row_hash FROM dw.dim_employee WHERE is_current = TRUE")
+            self.current = {employee_id: (sk, row_hash) for employee_id, sk, row_hash in cursor.fetchall()}
+        self.departments = DimensionKeys(self.engine, 'department')
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                self._conn.commit()
+            else:
+                self._conn.rollback()
+        finally:
+            self._conn.close()
+            self._conn = None
+        return False
+
+    def _expire(self, sks):
+        if not sks:
+            return
+        with self._conn.cursor() as cursor:
+            cursor.execute("""
+                UPDATE dw.dim_employee
+                SET valid_to = CURRENT_DATE, is_current = FALSE
+                WHERE employee_sk = ANY(%s)
+            """, (list(sks),))
+        self.expired += len(sks)
+
+    def _record(self, rows):
+        # (EmployeeID, Name, Gender, DateOfJoining, ManagerID, department_id, row_hash) tuples
+        records = list(zip(
+            rows['EmployeeID'],
+            rows['Name'],
+            # dim_employee.gender is CHAR(1), UNKNOWN is stored as U
+            rows['Gender'].str[:1],
+            rows['DateOfJoining'],
+            rows['ManagerID'],
+            self.departments.ids(rows['Department']).astype(object),
+            rows['row_hash'],
+        ))
+        return [tuple(None if pd.isna(v) else v for v in r) for r in records]
+
+    def _revise(self, rows, sks):
+        # Overwrite versions inserted earlier in this run with the employees' later rows
+        if rows.empty:
+            return
+        records = [r + (sk,) for r, sk in zip(self._record(rows), sks)]
+        with self._conn.cursor() as cursor:
+            execute_values(cursor, """
+                UPDATE dw.dim_employee AS e
+                SET name = v.name, gender = v.gender, date_of_joining = v.date_of_joining,
+                    manager_id = v.manager_id, department_id = v.department_id, row_hash = v.row_hash
+                FROM (VALUES %s) AS v (
+                  employee_id, name, gender, date_of_joining, manager_id, department_id, row_hash, employee_sk
+                )
+                WHERE e.employee_sk = v.employee_sk
+            """, records, template="(%s, %s, %s, %s::DATE, %s::TEXT, %s::INT, %s, %s::INT)", page_size=1000)
+        self.current.update({e: (sk, h) for e, sk, h in zip(rows['EmployeeID'], sks, rows['row_hash'])})
+        self.revised += len(rows)
+
+    def merge(self, df):
+        """Diff one batch of staged rows against the current versions and apply it."""
+        if df.empty:
+            return
+        batch = df.assign(row_hash=employee_row_hashes(df))
+        batch = batch[batch['EmployeeID'].notna()].drop_duplicates('EmployeeID', keep='last')
+
+        known = batch['EmployeeID'].map(lambda e: self.current.get(e, (None, None)))
+        current_sk = known.str[0]
+        current_hash = known.str[1]
+        is_unchanged = current_hash.eq(batch['row_hash'])
+        is_changed = current_sk.notna() & ~is_unchanged
+        self.unchanged += int(is_unchanged.sum())
+
+        # An employee already seen in an earlier batch of this run: last row wins
+        is_revised = is_changed & batch['EmployeeID'].isin(self._added)
+        self._revise(batch[is_revised], [int(sk) for sk in current_sk[is_revised]])
+        self._expire([int(sk) for sk in current_sk[is_changed & ~is_revised]])
+
+        to_insert = batch[~is_unchanged & ~is_revised]
+        if to_insert.empty:
+            return
+        records = self._record(to_insert)
+        with self._conn.cursor() as cursor:
+            rows = execute_values(cursor, """
+                INSERT INTO dw.dim_employee (
+                  employee_id, name, gender, date_of_joining, manager_id,
+                  department_id, row_hash, valid_from, valid_to, is_current
+                ) VALUES %s
+                RETURNING employee_id, employee_sk, row_hash
+            """, records, template="(%s, %s, %s, %s::DATE, %s, %s, %s, CURRENT_DATE, NULL, TRUE)",
+                page_size=1000, fetch=True)
+        self.current.update({employee_id: (sk, row_hash) for employee_id, sk, row_hash in rows})
+        self._added.update(employee_id for employee_id, _, _ in rows)
+        self.inserted += len(rows)
+
+    def expire(self, employee_ids):
+        """Expire the current versions of employees removed from the source."""
+        sks = [self.current.pop(e)[0] for e in set(employee_ids) if e in self.current]
+        self._expire(sks)
+
+    def summary(self):
+        return (f"Inserted: {self.inserted}, Expired: {self.expired}, Unchanged: {self.unchanged}, "
+                f"Revised in run: {self.revised}")
@@ -0,0 +1,237 @@
+# sources.py
+# Input files of the staging pipelines, and the manifest of the files each job processed.
+#
+# A pipeline's source is a file, a directory (every .xlsx / .csv in it) or a glob, so a
+# day's drop of many workbooks for a domain loads as one source. resolve_sources() turns
+# it into a sorted list of files. read_sources() hands their frames out in file order,
+# read in this process one file (or, with a chunksize, one chunk) at a time, and the
+# pipeline cleans, dedups and stages them into its one staging load as it would a single
+# file. Row positions run on from one file to the next, so row references (TEMP_<n>,
+# Operations row numbers) stay unique within the load.
+#
+# Whole-file reads of several files are sped up by a pool of ETL_FILE_WORKERS processes
+# that parse the files ahead of the pipeline, at most one per worker, while it cleans and
+# stages the ones before. Workbooks are parsed into the Arrow parse cache (parse_cache.py)
+# and stay on disk until the pipeline reads them back, so nothing is pickled between
+# processes; CSVs, and workbooks when the parse cache is off, come back as frames. Only
+# parsing runs ahead: cleaning, dedup and change detection stay in file order in the
+# pipeline, and streamed reads (a chunksize) parse in process to keep memory bounded by
+# the chunk. file_workers() sizes the pool from the CPUs the pipelines running side by
+# side leave over (run_etl_job and orchestrate pass it per pipeline).
+#
+# stg.source_file_manifest records every file a job saw: its path, SHA-256, size, rows
+# read and status. 'loaded' files were read by the job, 'skipped' ones had been loaded
+# before with the same bytes, 'duplicate' ones have the same bytes as another input of the
+# job, and 'removed' ones were loaded before and are no longer among the inputs. Skipped
+# files are not read again: their rows are still in the change-detection state (delta.py),
+# so only the rows of removed files count as deletions.
+import collections
+import contextlib
+import glob
+import hashlib
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import pandas as pd
+from sqlalchemy import text
+
+from extract import file_fingerprint, read_source
+from load import copy_frame
+from parse_cache import get_parse_cache
+
+
+FILE_WORKERS = int(os.environ['ETL_FILE_WORKERS']) if os.environ.get('ETL_FILE_WORKERS') else None
+
+SOURCE_EXTENSIONS = ('.xlsx', '.csv')
+
+# Files a source still holds as of its last load
+PRESENT = ('loaded', 'skipped', 'duplicate')
+
+
+def _listing(directory):
+    # Excel lock files (~$name.xlsx) and hidden files are not inputs
+    return [os.path.join(directory, name) for name in os.listdir(directory)
+            if os.path.splitext(name)[1].lower() in SOURCE_EXTENSIONS and not name.startswith(('~$', '.'))]
+
+
+def resolve_sources(source):
+    """Sorted input files of a source: a file, a directory, a glob, or a list of those."""
+    patterns = [source] if isinstance(source, (str, os.PathLike)) else list(source)
+    paths = []
+    for pattern in map(os.fspath, patterns):
+        if os.path.isdir(pattern):
+            paths += _listing(pattern)
+        elif os.path.isfile(pattern):
+            paths.append(pattern)
+        else:
+            paths += [p for p in glob.glob(pattern, recursive=True) if os.path.isfile(p)]
+    paths = sorted(set(map(os.path.normpath, paths)))
+    if not paths:
+        raise FileNotFoundError(f"No source files match {source}")
+    return paths
+
+
+class SourceFile:
+    """One input file: path, content hash and size, and the rows a job read from it."""
+
+    def __init__(self, path, fingerprint, size):
+        self.path = path
+        self.fingerprint = fingerprint
+        self.size = size
+        self.rows = None
+        self.status = 'loaded'
+
+
+def file_workers(pipelines=1):
+    """File parsing processes per pipeline: ETL_FILE_WORKERS, else the CPUs left over by
+    `pipelines` pipelines running side by side, shared out between them (at least 1)."""
+    return FILE_WORKERS or max(1, ((os.cpu_count() or 1) - pipelines) // pipelines)
+
+
+def _parse(path, cached):
+    # Workbooks are parsed into the parse cache and their frame stays in the worker;
+    # anything else comes back as its frames
+    if cached:
+        for _ in read_source(path):
+            pass
+        return None
+    return list(read_source(path, cache=False))
+
+
+def _with_offset(frames, offset):
+    for df in frames:
+        if offset:
+            df.index = df.index + offset
+        yield df
+
+
+def read_sources(files, chunksize=None, workers=None):
+    """Yield (file, frame) for every frame of the SourceFiles, in file order.
+
+    Each file's rows are counted into file.rows. Whole-file reads of more than one file
+    are parsed ahead on a process pool of `workers` (default file_workers()); workers=1
+    reads everything in this process.
+    """
+    files = list(files)
+    paths = [file.path for file in files] if chunksize is None else []
+    workers = max(1, min(workers or file_workers(), len(paths)))
+
+    with contextlib.ExitStack() as stack:
+        parsing = {}
+        if workers > 1:
+            pool = stack.enter_context(ProcessPoolExecutor(max_workers=workers))
+            queue = iter(paths)
+            cache = bool(get_parse_cache())
+
+            def parse_next():
+                path = next(queue, None)
+                if path is not None:
+                    cached = cache and os.path.splitext(path)[1].lower() == '.xlsx'
+                    parsing[path] = pool.submit(_parse, path, cached)
+
+            for _ in range(workers):
+                parse_next()
+
+        offset = 0
+        for file in files:
+            frames = None
+            if file.path in parsing:
+                frames = parsing.pop(file.path).result()
+                parse_next()
+            file.rows = 0
+            for df in _with_offset(frames or read_source(file.path, chunksize), offset):
+                file.rows += len(df)
+                yield file, df
+            offset += file.rows
+
+
+class SourceManifest:
+    """The input files of one source for a job, checked against the files loaded before.
+
+        manifest = SourceManifest(engine, 'raw_finance', 'drops/finance/*.xlsx')
+        state.retain(f.fingerprint for f in manifest.skipped)
+        for file, df in read_sources(manifest.to_load, chunksize):
+            ...
+        manifest.save(job_id)
+
+    Files loaded before with the same bytes are skipped unless full_refresh is set.
+    """
+
+    def __init__(self, engine, source_name, source, full_refresh=False, workers=None):
+        self.engine = engine
+        self.source_name = source_name
+        paths = resolve_sources(source)
+
+        # Hashing is I/O bound and hashlib releases the GIL, so threads will do
+        with ThreadPoolExecutor(max_workers=max(1, min(workers or file_workers(), len(paths)))) as pool:
+            fingerprints = list(pool.map(file_fingerprint, paths))
+        self.files = [SourceFile(path, fingerprint, os.path.getsize(path))
+                      for path, fingerprint in zip(paths, fingerprints)]
+
+        with engine.connect() as conn:
+            rows = conn.execute(text("""
+                SELECT DISTINCT ON (file_hash) file_hash, file_path, row_count, status
+                FROM stg.source_file_manifest
+                WHERE source_name = :source
+                ORDER BY file_hash, manifest_id DESC
+            """), {'source': source_name})
+            self.previous = {h: (path, count) for h, path, count, status in rows if status in PRESENT}
+
+        seen = set()
+        for file in self.files:
+            if file.fingerprint in seen:
+                file.status = 'duplicate'
+            elif file.fingerprint in self.previous and not full_refresh:
+                file.status = 'skipped'
+                file.rows = self.previous[file.fingerprint][1]
+            seen.add(file.fingerprint)
+        self.removed = {h: path for h, (path, _) in self.previous.items() if h not in seen}
+
+    @property
+    def fingerprint(self):
+        """Fingerprint of the whole input: the file's own hash for a single file."""
+        hashes = sorted({file.fingerprint for file in self.files})
+        if len(hashes) == 1:
+            return hashes[0]
+        return hashlib.sha256('\n'.join(hashes).encode()).hexdigest()
+
+    @property
+    def to_load(self):
+        return [file for file in self.files if file.status == 'loaded']
+
+    @property
+    def skipped(self):
+        return [file for file in self.files if file.status == 'skipped']
+
+    def skip(self):
+        """Mark every input skipped, for a source unchanged as a whole."""
+        for file in self.to_load:
+            file.status = 'skipped'
+            file.rows = self.previous.get(file.fingerprint, (None, None))[1]
+        self.removed = {}
+
+    def summary(self):
+        counts = collections.Counter(file.status for file in self.files)
+        counts['removed'] = len(self.removed)
+        return ', '.join(f"{counts[status]} {status}" for status in PRESENT + ('removed',) if counts[status])
+
+    def save(self, job_id):
+        """Record this job's files, and the files loaded before that are gone, in the manifest."""
+        records = pd.DataFrame([{
+            'job_id': job_id,
+            'source_name': self.source_name,
+            'file_path': os.path.abspath(file.path),
+            'file_hash': file.fingerprint,
+            'file_size': file.size,
+            'row_count': file.rows,
+            'status': file.status,
+        } for file in self.files] + [{
+            'job_id': job_id,
+            'source_name': self.source_name,
+            'file_path': path,
+            'file_hash': fingerprint,
+            'status': 'removed',
+        } for fingerprint, path in self.removed.items()],
+            columns=['job_id', 'source_name', 'file_path', 'file_hash', 'file_size', 'row_count', 'status'])
+        copy_frame(self.engine, records.astype({'file_size': 'Int64', 'row_count': 'Int64'}),
+                   'source_file_manifest', 'stg')
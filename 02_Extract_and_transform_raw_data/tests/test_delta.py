@@ -0,0 +1,70 @@
+import uuid
+
+import pandas as pd
+import pytest
+
+from delta import SourceState
+
+pytestmark = pytest.mark.postgres
+
+
+def frame(*rows):
+    return pd.DataFrame(rows, columns=['EmployeeID', 'Name'])
+
+
+@pytest.fixture
+def source():
+    return f'test_{uuid.uuid4().hex[:8]}'
+
+
+def load(session, source, files, key=None, skipped=()):
+    # One run: files is {file_hash: frame}; returns the state, its changed masks and deletions
+    state = SourceState(session, source, key=key)
+    state.retain(skipped)
+    changed = {f: state.changed(df, file_hash=f).tolist() for f, df in files.items()}
+    deletions = state.deletions()
+    state.save('fingerprint-' + '-'.join(sorted(files) + sorted(skipped)), None)
+    return state, changed, deletions
+
+
+def test_first_load_stages_everything(session, source):
+    _, changed, deletions = load(session, source, {'f1': frame(('E1', 'Ann'), ('E2', 'Bob'))})
+    assert changed == {'f1': [True, True]}
+    assert deletions.empty
+    assert SourceState(session, source).unchanged('fingerprint-f1')
+
+
+def test_only_new_rows_change_and_gone_rows_are_deleted(session, source):
+    load(session, source, {'f1': frame(('E1', 'Ann'), ('E2', 'Bob'))})
+    _, changed, deletions = load(session, source, {'f1': frame(('E1', 'Ann'), ('E3', 'Cy'))})
+    assert changed == {'f1': [False, True]}
+    assert len(deletions) == 1
+
+
+def test_with_a_key_a_changed_row_is_not_a_deletion(session, source):
+    load(session, source, {'f1': frame(('E1', 'Ann'), ('E2', 'Bob'))}, key='EmployeeID')
+    _, changed, deletions = load(session, source, {'f1': frame(('E1', 'Ann'), ('E2', 'Robert'))}, key='EmployeeID')
+    assert changed == {'f1': [False, True]}
+    assert deletions.empty
+
+    _, _, deletions = load(session, source, {'f1': frame(('E1', 'Ann'))}, key='EmployeeID')
+    assert deletions['row_key'].tolist() == ['E2']
+
+
+def test_rows_of_skipped_files_carry_over(session, source):
+    load(session, source, {'f1': frame(('E1', 'Ann')), 'f2': frame(('E2', 'Bob'))})
+    # f1 unchanged and skipped, f2 re-read with one row less
+    _, _, deletions = load(session, source, {'f2': frame()}, skipped=['f1'])
+    assert len(deletions) == 1
+    _, _, deletions = load(session, source, {}, skipped=['f1'])
+    assert deletions.empty
+
+
+def test_row_shared_by_two_files_survives_removal_of_one(session, source):
+    shared = ('E1', 'Ann')
+    load(session, source, {'f1': frame(shared, ('E2', 'Bob')), 'f2': frame(shared)})
+    # f1 removed, f2 skipped: only E2's row is gone
+    _, _, deletions = load(session, source, {}, skipped=['f2'])
+    assert len(deletions) == 1
+    state = SourceState(session, source)
+    assert len(state.previous) == 1
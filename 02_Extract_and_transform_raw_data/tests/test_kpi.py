@@ -0,0 +1,127 @@
+import time
+
+import pandas as pd
+import pytest
+from sqlalchemy import text
+
+from kpi import KPICache
+
+
+class Query:
+    """Counts how often a KPI query really runs."""
+
+    def __init__(self, value=1):
+        self.value = value
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return pd.DataFrame({'value': [self.value]})
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = KPICache(engine=object(), maxsize=3, ttl=60)
+    # The audit log is checked in the postgres tests
+    monkeypatch.setattr(cache, '_read_loads', lambda: None)
+    return cache
+
+
+def test_hit_returns_a_copy(cache):
+    query = Query()
+    first = cache.get('headcount', {'start': '2024-01-01'}, query)
+    first.loc[0, 'value'] = 99
+    assert cache.get('headcount', {'start': '2024-01-01'}, query)['value'].tolist() == [1]
+    assert query.calls == 1
+    assert cache.stats()['hits'] == 1
+
+
+def test_filters_are_part_of_the_key(cache):
+    query = Query()
+    cache.get('net_expenses', {'department': 'FINANCE'}, query)
+    cache.get('net_expenses', {'department': 'HR'}, query)
+    cache.get('net_expenses', {'department': 'FINANCE', 'expense_type': None}, query)
+    assert query.calls == 2
+
+
+def test_invalidate_drops_only_the_kpis_on_those_tables(cache):
+    expenses, downtime = Query(), Query()
+    cache.get('net_expenses', {}, expenses)
+    cache.get('downtime_by_dept', {}, downtime)
+
+    assert cache.invalidate(['fact_expenses']) == 1
+    cache.get('net_expenses', {}, expenses)
+    cache.get('downtime_by_dept', {}, downtime)
+    assert (expenses.calls, downtime.calls) == (2, 1)
+
+    assert cache.invalidate() == 2
+    assert cache.stats()['size'] == 0
+
+
+def test_entries_expire_and_the_least_recent_is_evicted(cache):
+    cache.ttl = 0.05
+    query = Query()
+    cache.get('headcount', {}, query)
+    time.sleep(0.1)
+    cache.get('headcount', {}, query)
+    assert query.calls == 2
+    assert cache.stats()['expirations'] == 1
+
+    cache.ttl = 60
+    for department in ['A', 'B', 'C']:
+        cache.get('downtime_by_dept', {'department': department}, query)
+    assert cache.stats()['evictions'] == 1
+    assert cache.stats()['size'] == 3
+
+
+def test_result_read_across_an_invalidation_is_not_stored(cache):
+    expenses, downtime = Query(), Query()
+
+    def during_load(query):
+        def run():
+            cache.invalidate(['fact_expenses'])
+            return query()
+        return run
+
+    assert cache.get('net_expenses', {}, during_load(expenses))['value'].tolist() == [1]
+    cache.get('net_expenses', {}, expenses)
+    assert expenses.calls == 2
+
+    # A KPI on other tables is still stored
+    cache.get('downtime_by_dept', {}, during_load(downtime))
+    cache.get('downtime_by_dept', {}, downtime)
+    assert downtime.calls == 1
+
+
+@pytest.mark.postgres
+def test_fact_load_in_audit_log_invalidates(session):
+    cache = KPICache(engine=session, ttl=60, check_interval=0)
+    expenses, downtime = Query(), Query()
+    cache.get('net_expenses', {}, expenses)
+    cache.get('downtime_by_dept', {}, downtime)
+
+    def audit(table, rows, status='success'):
+        with session.begin() as conn:
+            conn.execute(text("""
+                INSERT INTO dw.audit_log (table_name, etl_stage, rows_processed, rows_failed, status, message)
+                VALUES (:table, 'test', :rows, 0, :status, 'test load')
+            """), {'table': table, 'rows': rows, 'status': status})
+
+    # Records of tables no KPI is built on keep the entries
+    audit('raw_finance', 10)
+    cache.get('net_expenses', {}, expenses)
+    assert expenses.calls == 1
+
+    audit('fact_expenses', 10)
+    cache.get('net_expenses', {}, expenses)
+    cache.get('downtime_by_dept', {}, downtime)
+    assert (expenses.calls, downtime.calls) == (2, 1)
+
+    # Any record invalidates, also one that processed no rows (e.g. a merge that only expires)
+    audit('fact_expenses', 0)
+    cache.get('net_expenses', {}, expenses)
+    assert expenses.calls == 3
+
+    audit('kpi_aggregates', 5)
+    cache.get('downtime_by_dept', {}, downtime)
+    assert downtime.calls == 2
@@ -0,0 +1,73 @@
+import pandas as pd
+import pytest
+from sqlalchemy import text
+
+from load import CopyLoader, _quote, copy_frame
+
+
+def read(engine, schema, table):
+    with engine.connect() as conn:
+        return conn.execute(text(f'SELECT id, name, amount, source FROM {schema}.{table} ORDER BY id')).fetchall()
+
+
+def test_quote_doubles_embedded_quotes():
+    assert _quote('staging "x"') == '"staging ""x"""'
+    assert CopyLoader(None, 'staging_employee', 'stg').qualified_name == '"stg"."staging_employee"'
+
+
+@pytest.mark.postgres
+def test_write_round_trips_nulls_and_quoting(engine, scratch_table):
+    schema, table = scratch_table
+    df = pd.DataFrame({
+        'id': [1, 2, 3],
+        'name': ['plain', 'comma, "quoted"\nand a newline', None],
+        'amount': [1.5, None, -2.25],
+        'source': ['a', 'a', 'b'],
+    })
+    with CopyLoader(engine, table, schema) as loader:
+        loader.write(df.iloc[:2])
+        loader.write(df.iloc[2:])
+        loader.write(df.iloc[:0])
+    assert loader.rows == 3
+    rows = read(engine, schema, table)
+    assert [(r.id, r.name, None if r.amount is None else float(r.amount), r.source) for r in rows] == [
+        (1, 'plain', 1.5, 'a'),
+        (2, 'comma, "quoted"\nand a newline', None, 'a'),
+        (3, None, -2.25, 'b'),
+    ]
+
+
+@pytest.mark.postgres
+def test_truncate_and_replace(engine, scratch_table):
+    schema, table = scratch_table
+    copy_frame(engine, pd.DataFrame({'id': [1, 2], 'source': ['a', 'b']}), table, schema)
+
+    copy_frame(engine, pd.DataFrame({'id': [3], 'source': ['a']}), table, schema, replace={'source': 'a'})
+    assert [(r.id, r.source) for r in read(engine, schema, table)] == [(2, 'b'), (3, 'a')]
+
+    copy_frame(engine, pd.DataFrame({'id': [4], 'source': ['c']}), table, schema, truncate=True)
+    assert [(r.id, r.source) for r in read(engine, schema, table)] == [(4, 'c')]
+
+
+@pytest.mark.postgres
+def test_error_leaves_previous_contents(engine, scratch_table):
+    schema, table = scratch_table
+    copy_frame(engine, pd.DataFrame({'id': [1], 'source': ['a']}), table, schema)
+
+    with pytest.raises(RuntimeError):
+        with CopyLoader(engine, table, schema, truncate=True) as loader:
+            loader.write(pd.DataFrame({'id': [2], 'source': ['b']}))
+            raise RuntimeError('pipeline failed')
+    assert [(r.id, r.source) for r in read(engine, schema, table)] == [(1, 'a')]
+
+
+@pytest.mark.postgres
+def test_session_defers_the_commit(engine, scratch_table):
+    schema, table = scratch_table
+    from db import Session
+
+    with pytest.raises(RuntimeError):
+        with Session(engine) as session:
+            copy_frame(session, pd.DataFrame({'id': [1], 'source': ['a']}), table, schema)
+            raise RuntimeError('a later step failed')
+    assert read(engine, schema, table) == []
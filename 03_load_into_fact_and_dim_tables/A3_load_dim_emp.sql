@@ -10,95 +10,50 @@ BEGIN
   END;
 END $$;
 
---  Insert new departments from staging to dim_department
-INSERT INTO dw.dim_department (department_name)
-SELECT DISTINCT UPPER(TRIM("Department"))
-FROM stg.staging_employee
-WHERE UPPER(TRIM("Department")) NOT IN (
-  SELECT UPPER(TRIM(department_name)) FROM dw.dim_department
-);
+--  Stage metrics (dw.etl_stage_metrics), every mark closes the stage before it
+SELECT dw.log_stage_metric((SELECT job_id FROM temp_etl_job), 'sql_load', 'start');
 
---  Add row_hash to staging if not exists
-DO $$ BEGIN
-    ALTER TABLE stg.staging_employee ADD COLUMN row_hash TEXT;
-EXCEPTION WHEN duplicate_column THEN RAISE NOTICE 'column row_hash already exists, skipping';
-END $$;
-
-UPDATE stg.staging_employee
-SET row_hash = md5(concat_ws('::', "Name", "Gender", "DateOfJoining", "ManagerID", "Department", "Salary", "Status"));
-
---  Map department_id from dim_department into staging_employee
-DO $$ BEGIN
-    ALTER TABLE stg.staging_employee ADD COLUMN department_id INT;
-EXCEPTION WHEN duplicate_column THEN RAISE NOTICE 'department_id already exists, skipping';
-END $$;
-
-UPDATE stg.staging_employee s
-SET department_id = d.department_id
-FROM dw.dim_department d
-WHERE UPPER(s."Department") = UPPER(d.department_name);
-
---  Expire existing dim_employee rows that have changed
-UPDATE dw.dim_employee d
-SET valid_to = CURRENT_DATE,
-    is_current = FALSE
-FROM stg.staging_employee s
-WHERE d.employee_id::TEXT = s."EmployeeID"::TEXT
-  AND d.is_current = TRUE
-  AND d.row_hash IS DISTINCT FROM s.row_hash;
-
--- Insert new or changed rows (SCD2 logic with CASE for valid_from)
-INSERT INTO dw.dim_employee (
-  employee_id, name, gender, date_of_joining, manager_id,
-  department_id, row_hash, valid_from, valid_to, is_current
-)
-SELECT
-  s."EmployeeID"::TEXT, s."Name", s."Gender", s."DateOfJoining"::DATE, s."ManagerID"::TEXT,
-  s.department_id, s.row_hash, CURRENT_DATE, NULL, TRUE
-FROM stg.staging_employee s
-LEFT JOIN dw.dim_employee d
-  ON s."EmployeeID"::TEXT = d.employee_id::TEXT AND d.is_current = TRUE
-WHERE d.row_hash IS DISTINCT FROM s.row_hash OR d.row_hash IS NULL;
+--  dim_employee (and the departments it references) is merged by the HR pipeline
+--  (02_Extract_and_transform_raw_data/scd2.py), which also writes its audit record
 
 
--- Audit log for dim_employee insert
-WITH inserted_rows AS (
-  SELECT COUNT(*) AS count
-  FROM dw.dim_employee
-  WHERE valid_from = CURRENT_DATE
-)
-INSERT INTO dw.audit_log (
-  job_id, table_name, etl_stage, rows_processed, rows_failed, status, message
-)
-SELECT
-  (SELECT job_id FROM temp_etl_job),
-  'dim_employee',
-  'dim_load',
-  r.count,
-  CASE WHEN r.count = 0 THEN 1 ELSE 0 END,
-  CASE WHEN r.count = 0 THEN 'partial' ELSE 'success' END,
-  'SCD Type 2 load applied to dim_employee'
-FROM inserted_rows r;
-
+--  Add today to dim_time if needed, and the partition of today's snapshot month
+SELECT dw.extend_dim_time(ARRAY[dw.date_key(CURRENT_DATE)]);
+SELECT dw.create_fact_partitions('fact_employee', ARRAY[dw.date_key(CURRENT_DATE)]);
 
 --  Load snapshot into fact_employee
+--  Staging only holds new/changed employees, the others carry their last snapshot forward
 INSERT INTO dw.fact_employee (
-  employee_sk, time_id, salary, status
+  employee_sk, time_id, salary, status, job_id
 )
 SELECT
-  e.employee_sk, t.time_id, s."Salary", s."Status"
+  e.employee_sk, dw.date_key(CURRENT_DATE), s."Salary", s."Status", (SELECT job_id FROM temp_etl_job)
 FROM dw.dim_employee e
 JOIN stg.staging_employee s
   ON e.employee_id::TEXT = s."EmployeeID"::TEXT
   AND e.is_current = TRUE
-JOIN dw.dim_time t
-  ON t.full_date = CURRENT_DATE;
+UNION ALL
+SELECT
+  e.employee_sk, dw.date_key(CURRENT_DATE), last.salary, last.status, (SELECT job_id FROM temp_etl_job)
+FROM dw.dim_employee e
+JOIN LATERAL (
+  SELECT f.salary, f.status
+  FROM dw.fact_employee f
+  WHERE f.employee_sk = e.employee_sk
+  ORDER BY f.time_id DESC, f.fact_id DESC
+  LIMIT 1
+) last ON TRUE
+WHERE e.is_current = TRUE
+  AND NOT EXISTS (
+    SELECT 1 FROM stg.staging_employee s
+    WHERE s."EmployeeID"::TEXT = e.employee_id::TEXT
+  );
 
 --  Audit log for fact_employee snapshot
 WITH inserted_rows AS (
   SELECT COUNT(*) AS count
   FROM dw.fact_employee
-  WHERE time_id = (SELECT time_id FROM dw.dim_time WHERE full_date = CURRENT_DATE)
+  WHERE time_id = dw.date_key(CURRENT_DATE)
 )
 INSERT INTO dw.audit_log (
   job_id, table_name, etl_stage, rows_processed, rows_failed, status, message
@@ -113,6 +68,8 @@ SELECT
   'Inserted snapshot records into fact_employee'
 FROM inserted_rows r;
 
+SELECT dw.log_stage_metric((SELECT job_id FROM temp_etl_job), 'sql_load', 'fact_employee', 'stg.staging_employee', 'dw.fact_employee');
+
 JOIN dw.dim_time t
   ON t.full_date = CURRENT_DATE;
 
@@ -120,7 +77,7 @@ JOIN dw.dim_time t
 WITH inserted_rows AS (
   SELECT COUNT(*) AS count
   FROM dw.fact_employee
-  WHERE time_id = (SELECT time_id FROM dw.dim_time WHERE full_date = CURRENT_DATE)
+  WHERE time_id = dw.date_key(CURRENT_DATE)
 )
 INSERT INTO dw.audit_log (
   job_id, table_name, etl_stage, rows_processed, rows_failed, status, message
@@ -134,3 +91,7 @@ SELECT
   CASE WHEN r.count = 0 THEN 'partial' ELSE 'success' END,
   'Inserted snapshot records into fact_employee'
 FROM inserted_rows r;
+
+--  Refresh the KPI aggregate buckets this job's facts fall into
+SELECT dw.refresh_kpi_aggregates((SELECT job_id FROM temp_etl_job));
+SELECT dw.log_stage_metric((SELECT job_id FROM temp_etl_job), 'sql_load', 'kpi_aggregates');
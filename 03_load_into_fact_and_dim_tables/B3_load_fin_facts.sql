@@ -8,26 +8,16 @@ DO $$ BEGIN
   END;
 END $$;
 
+--  Stage metrics (dw.etl_stage_metrics), every mark closes the stage before it
+SELECT dw.log_stage_metric((SELECT job_id FROM temp_etl_job), 'sql_load', 'start');
 
---  Insert new expense types into dim_expense_type
-INSERT INTO dw.dim_expense_type (expense_type_name)
-SELECT DISTINCT UPPER(TRIM(expense_type))
-FROM stg.staging_finance
-WHERE UPPER(TRIM(expense_type)) NOT IN (
-  SELECT UPPER(TRIM(expense_type_name)) FROM dw.dim_expense_type
-);
 
--- Add expense_type_id to staging if not exists
-DO $$ BEGIN
-    ALTER TABLE stg.staging_finance ADD COLUMN expense_type_id INT;
-EXCEPTION WHEN duplicate_column THEN RAISE NOTICE 'column expense_type_id already exists, skipping';
-END $$;
+--  expense_type_id is resolved against dw.dim_expense_type (new types added) by the
+--  Finance pipeline (02_Extract_and_transform_raw_data/dim_keys.py) and staged with each row
 
--- Map expense_type_id from dim_expense_type
-UPDATE stg.staging_finance s
-SET expense_type_id = d.expense_type_id
-FROM dw.dim_expense_type d
-WHERE UPPER(TRIM(s.expense_type)) = UPPER(TRIM(d.expense_type_name));
+--  stg.finance_fact_rows is the staged rows plus the ones earlier loads could not match to
+--  an employee (stg.pending_finance). Delta loads stage a row only once, so those are kept
+--  and retried here until their employee arrives in dim_employee
 
 
 -- Log unmatched employee_id values
@@ -39,7 +29,7 @@ SELECT
   s.employee_id,
   s.employee_id,
   'EmployeeID not found in dim_employee'
-FROM stg.staging_finance s
+FROM stg.finance_fact_rows s
 LEFT JOIN dw.dim_employee e
   ON s.employee_id = e.employee_id AND e.is_current = TRUE
 WHERE e.employee_id IS NULL;
@@ -58,11 +48,21 @@ SELECT
   COUNT(*),
   CASE WHEN COUNT(*) = 0 THEN 'success' ELSE 'partial' END,
   'EmployeeID lookup validation against dim_employee completed'
-FROM stg.staging_finance s
+FROM stg.finance_fact_rows s
 LEFT JOIN dw.dim_employee e
   ON s.employee_id = e.employee_id AND e.is_current = TRUE
 WHERE e.employee_id IS NULL;
 
+SELECT dw.log_stage_metric((SELECT job_id FROM temp_etl_job), 'sql_load', 'validate_employee_fk', 'stg.staging_finance', NULL);
+
+--  Extend dim_time to the staged expense dates, and create the month partitions they fall into
+SELECT dw.extend_dim_time(ARRAY(
+  SELECT DISTINCT dw.date_key(s.expense_date::DATE) FROM stg.finance_fact_rows s
+));
+SELECT dw.create_fact_partitions('fact_expenses', ARRAY(
+  SELECT DISTINCT dw.date_key(s.expense_date::DATE) FROM stg.finance_fact_rows s
+));
+
 -- Define candidate + inserted rows
 WITH candidate_rows AS (
   SELECT
@@ -70,37 +70,37 @@ WITH candidate_rows AS (
     s.expense_type_id,
     s.expense_amount,
     s.approved_by,
-    t.time_id,
+    dw.date_key(s.expense_date::DATE) AS time_id,
     s.is_refund,
-    e.employee_sk
-  FROM stg.staging_finance s
-  JOIN dw.dim_time t
-    ON t.full_date = s.expense_date::DATE
+    e.employee_sk,
+    md5(ROW(s.employee_id, dw.date_key(s.expense_date::DATE), s.expense_type_id, s.expense_amount, s.approved_by, s.is_refund)::TEXT) AS natural_key_hash,
+    s.row_hash
+  FROM stg.finance_fact_rows s
   JOIN dw.dim_employee e
     ON e.employee_id = s.employee_id AND e.is_current = TRUE
-),inserted_rows AS (
-  SELECT *
-  FROM candidate_rows cr
-  WHERE NOT EXISTS (
-    SELECT 1
-    FROM dw.fact_expenses f
-    JOIN dw.dim_employee e ON f.employee_sk = e.employee_sk
-    WHERE e.employee_id = cr.employee_id
-      AND f.time_id = cr.time_id
-      AND f.expense_type_id = cr.expense_type_id
-      AND f.expense_amount = cr.expense_amount
-      AND f.approved_by = cr.approved_by
-      AND f.is_refund = cr.is_refund
-  )
+  WHERE s.expense_date IS NOT NULL
 ),
+-- Facts already loaded (and repeats within this batch) hit the unique natural-key index
 do_insert AS (
   INSERT INTO dw.fact_expenses (
-    employee_sk, expense_type_id, expense_amount, approved_by, time_id, is_refund
+    employee_sk, expense_type_id, expense_amount, approved_by, time_id, is_refund, natural_key_hash, job_id
   )
   SELECT
-    employee_sk, expense_type_id, expense_amount, approved_by, time_id, is_refund
-  FROM inserted_rows
-  RETURNING *
+    employee_sk, expense_type_id, expense_amount, approved_by, time_id, is_refund, natural_key_hash,
+    (SELECT job_id FROM temp_etl_job)
+  FROM candidate_rows
+  ON CONFLICT (natural_key_hash, time_id) DO NOTHING
+  RETURNING 1
+),
+-- Rows now in the facts (inserted, or there already) join the loaded-row index
+indexed AS (
+  INSERT INTO stg.loaded_row_hashes (source_name, row_hash, job_id)
+  SELECT DISTINCT 'raw_finance', c.row_hash, (SELECT job_id FROM temp_etl_job)
+  FROM candidate_rows c
+  WHERE c.row_hash IS NOT NULL
+    AND NOT EXISTS (
+      SELECT 1 FROM stg.loaded_row_hashes l WHERE l.source_name = 'raw_finance' AND l.row_hash = c.row_hash
+    )
 )
 
 --  audit log
@@ -124,3 +124,34 @@ SELECT
     (SELECT COUNT(*) FROM do_insert),
     (SELECT COUNT(*) FROM candidate_rows) - (SELECT COUNT(*) FROM do_insert)
   );
+
+--  Rows still without a current employee wait for the next load; rows gone from the
+--  source (stg.staging_deletions) are dropped
+WITH unmatched AS (
+  SELECT s.*
+  FROM stg.finance_fact_rows s
+  WHERE s.expense_date IS NOT NULL
+    AND NOT EXISTS (
+      SELECT 1 FROM dw.dim_employee e WHERE e.employee_id = s.employee_id AND e.is_current = TRUE
+    )
+    AND NOT EXISTS (
+      SELECT 1 FROM stg.staging_deletions d WHERE d.source_name = 'raw_finance' AND d.row_hash = s.row_hash
+    )
+),
+cleared AS (
+  DELETE FROM stg.pending_finance
+)
+INSERT INTO stg.pending_finance (
+  employee_id, expense_type, expense_amount, expense_date, approved_by, is_refund, expense_type_id, row_hash,
+  pending_since
+)
+SELECT
+  employee_id, expense_type, expense_amount, expense_date, approved_by, is_refund, expense_type_id, row_hash,
+  COALESCE(pending_since, CURRENT_TIMESTAMP)
+FROM unmatched;
+
+SELECT dw.log_stage_metric((SELECT job_id FROM temp_etl_job), 'sql_load', 'fact_expenses', 'stg.staging_finance', 'dw.fact_expenses');
+
+--  Refresh the KPI aggregate buckets this job's facts fall into
+SELECT dw.refresh_kpi_aggregates((SELECT job_id FROM temp_etl_job));
+SELECT dw.log_stage_metric((SELECT job_id FROM temp_etl_job), 'sql_load', 'kpi_aggregates');
@@ -10,62 +10,21 @@ BEGIN
     INSERT INTO temp_etl_job VALUES (gen_random_uuid());
   END;
 END $$;
---  Insert new process names into dim_process
-INSERT INTO dw.dim_process (process_name)
-SELECT DISTINCT process_name
-FROM stg.staging_operations
-WHERE process_name NOT IN (
-  SELECT process_name FROM dw.dim_process
-);
 
-INSERT INTO dw.dim_department (department_name)
-SELECT DISTINCT department_name
-FROM stg.staging_operations
-WHERE department_name NOT IN (
-  SELECT department_name FROM dw.dim_department
-);
-
--- Insert new locations into dim_location
-INSERT INTO dw.dim_location (location_name)
-SELECT DISTINCT location_name
-FROM stg.staging_operations
-WHERE location_name NOT IN (
-  SELECT location_name FROM dw.dim_location
-);
-
---  Add foreign keys to staging if not exists
-DO $$ BEGIN
-  ALTER TABLE stg.staging_operations ADD COLUMN process_id INT;
-EXCEPTION WHEN duplicate_column THEN RAISE NOTICE 'process_id already exists';
-END $$;
-
-DO $$ BEGIN
-  ALTER TABLE stg.staging_operations ADD COLUMN location_id INT;
-EXCEPTION WHEN duplicate_column THEN RAISE NOTICE 'location_id already exists';
-END $$;
-
-DO $$ BEGIN
-  ALTER TABLE stg.staging_operations ADD COLUMN department_id INT;
-EXCEPTION WHEN duplicate_column THEN RAISE NOTICE 'department_id already exists';
-END $$;
-
--- Map dim IDs to staging
-UPDATE stg.staging_operations s
-SET process_id = p.process_id
-FROM dw.dim_process p
-WHERE s.process_name = p.process_name;
-
-UPDATE stg.staging_operations s
-SET location_id = l.location_id
-FROM dw.dim_location l
-WHERE s.location_name = l.location_name;
-
-UPDATE stg.staging_operations s
-SET department_id = d.department_id
-FROM dw.dim_department d
-WHERE s.department_name = d.department_name;
+--  Stage metrics (dw.etl_stage_metrics), every mark closes the stage before it
+SELECT dw.log_stage_metric((SELECT job_id FROM temp_etl_job), 'sql_load', 'start');
+--  department_id, process_id and location_id are resolved against their dimensions (new
+--  members added) by the Operations pipeline (02_Extract_and_transform_raw_data/dim_keys.py)
+--  and staged with each row
 
 
+--  Extend dim_time to the staged process dates, and create the month partitions they fall into
+SELECT dw.extend_dim_time(ARRAY(
+  SELECT DISTINCT dw.date_key(s.process_date::DATE) FROM stg.staging_operations s
+));
+SELECT dw.create_fact_partitions('fact_downtime', ARRAY(
+  SELECT DISTINCT dw.date_key(s.process_date::DATE) FROM stg.staging_operations s
+));
 
 --  Insert + audit for fact_downtime
 WITH candidate_rows AS (
@@ -73,30 +32,34 @@ WITH candidate_rows AS (
     s.department_id,
     s.process_id,
     s.location_id,
-    t.time_id,
-    s.downtime_hours
+    dw.date_key(s.process_date::DATE) AS time_id,
+    s.downtime_hours,
+    md5(ROW(s.department_id, s.process_id, s.location_id, dw.date_key(s.process_date::DATE), s.downtime_hours)::TEXT) AS natural_key_hash,
+    s.row_hash
   FROM stg.staging_operations s
-  JOIN dw.dim_time t
-    ON t.full_date = s.process_date::DATE
-),
-inserted_rows AS (
-  SELECT *
-  FROM candidate_rows c
-  WHERE NOT EXISTS (
-    SELECT 1 FROM dw.fact_downtime f
-    WHERE f.department_id = c.department_id
-      AND f.process_id = c.process_id
-      AND f.location_id = c.location_id
-      AND f.time_id = c.time_id
-      AND f.downtime_hours = c.downtime_hours
-  )
+  WHERE s.process_date IS NOT NULL
 ),
+-- Facts already loaded (and repeats within this batch) hit the unique natural-key index
 do_insert AS (
   INSERT INTO dw.fact_downtime (
-    department_id, process_id, location_id, time_id, downtime_hours
+    department_id, process_id, location_id, time_id, downtime_hours, natural_key_hash, job_id
   )
-  SELECT * FROM inserted_rows
-  RETURNING *
+  SELECT
+    department_id, process_id, location_id, time_id, downtime_hours, natural_key_hash,
+    (SELECT job_id FROM temp_etl_job)
+  FROM candidate_rows
+  ON CONFLICT (natural_key_hash, time_id) DO NOTHING
+  RETURNING 1
+),
+-- Rows now in the facts (inserted, or there already) join the loaded-row index
+indexed AS (
+  INSERT INTO stg.loaded_row_hashes (source_name, row_hash, job_id)
+  SELECT DISTINCT 'raw_operations', c.row_hash, (SELECT job_id FROM temp_etl_job)
+  FROM candidate_rows c
+  WHERE c.row_hash IS NOT NULL
+    AND NOT EXISTS (
+      SELECT 1 FROM stg.loaded_row_hashes l WHERE l.source_name = 'raw_operations' AND l.row_hash = c.row_hash
+    )
 )
 
 -- Audit log
@@ -119,4 +82,10 @@ SELECT
     (SELECT COUNT(*) FROM candidate_rows),
     (SELECT COUNT(*) FROM do_insert),
     (SELECT COUNT(*) FROM candidate_rows) - (SELECT COUNT(*) FROM do_insert)
-  );
\ No newline at end of file
+  );
+
+SELECT dw.log_stage_metric((SELECT job_id FROM temp_etl_job), 'sql_load', 'fact_downtime', 'stg.staging_operations', 'dw.fact_downtime');
+
+--  Refresh the KPI aggregate buckets this job's facts fall into
+SELECT dw.refresh_kpi_aggregates((SELECT job_id FROM temp_etl_job));
+SELECT dw.log_stage_metric((SELECT job_id FROM temp_etl_job), 'sql_load', 'kpi_aggregates');
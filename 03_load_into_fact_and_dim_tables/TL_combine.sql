@@ -1,5 +1,9 @@
 -- A3_load_dim_emp
 
+--  Runs top to bottom as one script. orchestrate.py (02_Extract_and_transform_raw_data) runs
+--  the sections between the @node markers instead, each one once the nodes named after
+--  `after` are done, on its own connection and with the job id it passes in.
+
 --  Ensure job_id table exists
 DO $$
 BEGIN
@@ -11,95 +15,66 @@ BEGIN
   END;
 END $$;
 
---  Insert new departments from staging to dim_department
-INSERT INTO dw.dim_department (department_name)
-SELECT DISTINCT UPPER(TRIM("Department"))
-FROM stg.staging_employee
-WHERE UPPER(TRIM("Department")) NOT IN (
-  SELECT UPPER(TRIM(department_name)) FROM dw.dim_department
-);
-
---  Add row_hash to staging if not exists
-DO $$ BEGIN
-    ALTER TABLE stg.staging_employee ADD COLUMN row_hash TEXT;
-EXCEPTION WHEN duplicate_column THEN RAISE NOTICE 'column row_hash already exists, skipping';
-END $$;
-
-UPDATE stg.staging_employee
-SET row_hash = md5(concat_ws('::', "Name", "Gender", "DateOfJoining", "ManagerID", "Department", "Salary", "Status"));
-
---  Map department_id from dim_department into staging_employee
-DO $$ BEGIN
-    ALTER TABLE stg.staging_employee ADD COLUMN department_id INT;
-EXCEPTION WHEN duplicate_column THEN RAISE NOTICE 'department_id already exists, skipping';
-END $$;
-
-UPDATE stg.staging_employee s
-SET department_id = d.department_id
-FROM dw.dim_department d
-WHERE UPPER(s."Department") = UPPER(d.department_name);
-
---  Expire existing dim_employee rows that have changed
-UPDATE dw.dim_employee d
-SET valid_to = CURRENT_DATE,
-    is_current = FALSE
-FROM stg.staging_employee s
-WHERE d.employee_id::TEXT = s."EmployeeID"::TEXT
-  AND d.is_current = TRUE
-  AND d.row_hash IS DISTINCT FROM s.row_hash;
-
--- Insert new or changed rows (SCD2 logic with CASE for valid_from)
-INSERT INTO dw.dim_employee (
-  employee_id, name, gender, date_of_joining, manager_id,
-  department_id, row_hash, valid_from, valid_to, is_current
-)
-SELECT
-  s."EmployeeID"::TEXT, s."Name", s."Gender", s."DateOfJoining"::DATE, s."ManagerID"::TEXT,
-  s.department_id, s.row_hash, CURRENT_DATE, NULL, TRUE
-FROM stg.staging_employee s
-LEFT JOIN dw.dim_employee d
-  ON s."EmployeeID"::TEXT = d.employee_id::TEXT AND d.is_current = TRUE
-WHERE d.row_hash IS DISTINCT FROM s.row_hash OR d.row_hash IS NULL;
-
-
--- Audit log for dim_employee insert
-WITH inserted_rows AS (
-  SELECT COUNT(*) AS count
-  FROM dw.dim_employee
-  WHERE valid_from = CURRENT_DATE
-)
-INSERT INTO dw.audit_log (
-  job_id, table_name, etl_stage, rows_processed, rows_failed, status, message
-)
-SELECT
-  (SELECT job_id FROM temp_etl_job),
-  'dim_employee',
-  'dim_load',
-  r.count,
-  CASE WHEN r.count = 0 THEN 1 ELSE 0 END,
-  CASE WHEN r.count = 0 THEN 'partial' ELSE 'success' END,
-  'SCD Type 2 load applied to dim_employee'
-FROM inserted_rows r;
+--  Stage metrics (dw.etl_stage_metrics), every mark closes the stage before it
+SELECT dw.log_stage_metric((SELECT job_id FROM temp_etl_job), 'sql_load', 'start');
+
+-- @node dim_time after finance, operations
+--  Extend dim_time to today and the staged expense and process dates, and create the month
+--  partitions the fact loads below insert into. This is one node ahead of the fact loads
+--  rather than a step of each: creating a partition clones its foreign key to dim_time,
+--  which locks dim_time against the inserts into it, so two loads extending dim_time and
+--  creating partitions at the same time could deadlock each other.
+SELECT dw.extend_dim_time(ARRAY(
+  SELECT dw.date_key(CURRENT_DATE)
+  UNION SELECT dw.date_key(s.expense_date::DATE) FROM stg.finance_fact_rows s
+  UNION SELECT dw.date_key(s.process_date::DATE) FROM stg.staging_operations s
+));
+SELECT dw.create_fact_partitions('fact_employee', ARRAY[dw.date_key(CURRENT_DATE)]);
+SELECT dw.create_fact_partitions('fact_expenses', ARRAY(
+  SELECT DISTINCT dw.date_key(s.expense_date::DATE) FROM stg.finance_fact_rows s
+));
+SELECT dw.create_fact_partitions('fact_downtime', ARRAY(
+  SELECT DISTINCT dw.date_key(s.process_date::DATE) FROM stg.staging_operations s
+));
+
+-- @node fact_employee after hr, dim_time
+--  dim_employee (and the departments it references) is merged by the HR pipeline
+--  (02_Extract_and_transform_raw_data/scd2.py), which also writes its audit record
 
 
 --  Load snapshot into fact_employee
+--  Staging only holds new/changed employees, the others carry their last snapshot forward
 INSERT INTO dw.fact_employee (
-  employee_sk, time_id, salary, status
+  employee_sk, time_id, salary, status, job_id
 )
 SELECT
-  e.employee_sk, t.time_id, s."Salary", s."Status"
+  e.employee_sk, dw.date_key(CURRENT_DATE), s."Salary", s."Status", (SELECT job_id FROM temp_etl_job)
 FROM dw.dim_employee e
 JOIN stg.staging_employee s
   ON e.employee_id::TEXT = s."EmployeeID"::TEXT
   AND e.is_current = TRUE
-JOIN dw.dim_time t
-  ON t.full_date = CURRENT_DATE;
+UNION ALL
+SELECT
+  e.employee_sk, dw.date_key(CURRENT_DATE), last.salary, last.status, (SELECT job_id FROM temp_etl_job)
+FROM dw.dim_employee e
+JOIN LATERAL (
+  SELECT f.salary, f.status
+  FROM dw.fact_employee f
+  WHERE f.employee_sk = e.employee_sk
+  ORDER BY f.time_id DESC, f.fact_id DESC
+  LIMIT 1
+) last ON TRUE
+WHERE e.is_current = TRUE
+  AND NOT EXISTS (
+    SELECT 1 FROM stg.staging_employee s
+    WHERE s."EmployeeID"::TEXT = e.employee_id::TEXT
+  );
 
 --  Audit log for fact_employee snapshot
 WITH inserted_rows AS (
   SELECT COUNT(*) AS count
   FROM dw.fact_employee
-  WHERE time_id = (SELECT time_id FROM dw.dim_time WHERE full_date = CURRENT_DATE)
+  WHERE time_id = dw.date_key(CURRENT_DATE)
 )
 INSERT INTO dw.audit_log (
   job_id, table_name, etl_stage, rows_processed, rows_failed, status, message
@@ -114,28 +89,18 @@ SELECT
   'Inserted snapshot records into fact_employee'
 FROM inserted_rows r;
 
+SELECT dw.log_stage_metric((SELECT job_id FROM temp_etl_job), 'sql_load', 'fact_employee', 'stg.staging_employee', 'dw.fact_employee');
+
 
+-- @node fact_expenses after fact_employee, finance, dim_time
 --02_load_dim_fact_finance
 
---  Insert new expense types into dim_expense_type
-INSERT INTO dw.dim_expense_type (expense_type_name)
-SELECT DISTINCT UPPER(TRIM(expense_type))
-FROM stg.staging_finance
-WHERE UPPER(TRIM(expense_type)) NOT IN (
-  SELECT UPPER(TRIM(expense_type_name)) FROM dw.dim_expense_type
-);
-
--- Add expense_type_id to staging if not exists
-DO $$ BEGIN
-    ALTER TABLE stg.staging_finance ADD COLUMN expense_type_id INT;
-EXCEPTION WHEN duplicate_column THEN RAISE NOTICE 'column expense_type_id already exists, skipping';
-END $$;
+--  expense_type_id is resolved against dw.dim_expense_type (new types added) by the
+--  Finance pipeline (02_Extract_and_transform_raw_data/dim_keys.py) and staged with each row
 
--- Map expense_type_id from dim_expense_type
-UPDATE stg.staging_finance s
-SET expense_type_id = d.expense_type_id
-FROM dw.dim_expense_type d
-WHERE UPPER(TRIM(s.expense_type)) = UPPER(TRIM(d.expense_type_name));
+--  stg.finance_fact_rows is the staged rows plus the ones earlier loads could not match to
+--  an employee (stg.pending_finance). Delta loads stage a row only once, so those are kept
+--  and retried here until their employee arrives in dim_employee
 
 
 -- Log unmatched employee_id values
@@ -147,7 +112,7 @@ SELECT
   s.employee_id,
   s.employee_id,
   'EmployeeID not found in dim_employee'
-FROM stg.staging_finance s
+FROM stg.finance_fact_rows s
 LEFT JOIN dw.dim_employee e
   ON s.employee_id = e.employee_id AND e.is_current = TRUE
 WHERE e.employee_id IS NULL;
@@ -166,11 +131,13 @@ SELECT
   COUNT(*),
   CASE WHEN COUNT(*) = 0 THEN 'success' ELSE 'partial' END,
   'EmployeeID lookup validation against dim_employee completed'
-FROM stg.staging_finance s
+FROM stg.finance_fact_rows s
 LEFT JOIN dw.dim_employee e
   ON s.employee_id = e.employee_id AND e.is_current = TRUE
 WHERE e.employee_id IS NULL;
 
+SELECT dw.log_stage_metric((SELECT job_id FROM temp_etl_job), 'sql_load', 'validate_employee_fk', 'stg.staging_finance', NULL);
+
 -- Define candidate + inserted rows
 WITH candidate_rows AS (
   SELECT
@@ -178,37 +145,37 @@ WITH candidate_rows AS (
     s.expense_type_id,
     s.expense_amount,
     s.approved_by,
-    t.time_id,
+    dw.date_key(s.expense_date::DATE) AS time_id,
     s.is_refund,
-    e.employee_sk
-  FROM stg.staging_finance s
-  JOIN dw.dim_time t
-    ON t.full_date = s.expense_date::DATE
+    e.employee_sk,
+    md5(ROW(s.employee_id, dw.date_key(s.expense_date::DATE), s.expense_type_id, s.expense_amount, s.approved_by, s.is_refund)::TEXT) AS natural_key_hash,
+    s.row_hash
+  FROM stg.finance_fact_rows s
   JOIN dw.dim_employee e
     ON e.employee_id = s.employee_id AND e.is_current = TRUE
-),inserted_rows AS (
-  SELECT *
-  FROM candidate_rows cr
-  WHERE NOT EXISTS (
-    SELECT 1
-    FROM dw.fact_expenses f
-    JOIN dw.dim_employee e ON f.employee_sk = e.employee_sk
-    WHERE e.employee_id = cr.employee_id
-      AND f.time_id = cr.time_id
-      AND f.expense_type_id = cr.expense_type_id
-      AND f.expense_amount = cr.expense_amount
-      AND f.approved_by = cr.approved_by
-      AND f.is_refund = cr.is_refund
-  )
+  WHERE s.expense_date IS NOT NULL
 ),
+-- Facts already loaded (and repeats within this batch) hit the unique natural-key index
 do_insert AS (
   INSERT INTO dw.fact_expenses (
-    employee_sk, expense_type_id, expense_amount, approved_by, time_id, is_refund
+    employee_sk, expense_type_id, expense_amount, approved_by, time_id, is_refund, natural_key_hash, job_id
   )
   SELECT
-    employee_sk, expense_type_id, expense_amount, approved_by, time_id, is_refund
-  FROM inserted_rows
-  RETURNING *
+    employee_sk, expense_type_id, expense_amount, approved_by, time_id, is_refund, natural_key_hash,
+    (SELECT job_id FROM temp_etl_job)
+  FROM candidate_rows
+  ON CONFLICT (natural_key_hash, time_id) DO NOTHING
+  RETURNING 1
+),
+-- Rows now in the facts (inserted, or there already) join the loaded-row index
+indexed AS (
+  INSERT INTO stg.loaded_row_hashes (source_name, row_hash, job_id)
+  SELECT DISTINCT 'raw_finance', c.row_hash, (SELECT job_id FROM temp_etl_job)
+  FROM candidate_rows c
+  WHERE c.row_hash IS NOT NULL
+    AND NOT EXISTS (
+      SELECT 1 FROM stg.loaded_row_hashes l WHERE l.source_name = 'raw_finance' AND l.row_hash = c.row_hash
+    )
 )
 
 --  audit log
@@ -233,65 +200,41 @@ SELECT
     (SELECT COUNT(*) FROM candidate_rows) - (SELECT COUNT(*) FROM do_insert)
   );
 
+--  Rows still without a current employee wait for the next load; rows gone from the
+--  source (stg.staging_deletions) are dropped
+WITH unmatched AS (
+  SELECT s.*
+  FROM stg.finance_fact_rows s
+  WHERE s.expense_date IS NOT NULL
+    AND NOT EXISTS (
+      SELECT 1 FROM dw.dim_employee e WHERE e.employee_id = s.employee_id AND e.is_current = TRUE
+    )
+    AND NOT EXISTS (
+      SELECT 1 FROM stg.staging_deletions d WHERE d.source_name = 'raw_finance' AND d.row_hash = s.row_hash
+    )
+),
+cleared AS (
+  DELETE FROM stg.pending_finance
+)
+INSERT INTO stg.pending_finance (
+  employee_id, expense_type, expense_amount, expense_date, approved_by, is_refund, expense_type_id, row_hash,
+  pending_since
+)
+SELECT
+  employee_id, expense_type, expense_amount, expense_date, approved_by, is_refund, expense_type_id, row_hash,
+  COALESCE(pending_since, CURRENT_TIMESTAMP)
+FROM unmatched;
 
+SELECT dw.log_stage_metric((SELECT job_id FROM temp_etl_job), 'sql_load', 'fact_expenses', 'stg.staging_finance', 'dw.fact_expenses');
 
--- 03_load_dim_fact_operations
-
---  Insert new process names into dim_process
-INSERT INTO dw.dim_process (process_name)
-SELECT DISTINCT process_name
-FROM stg.staging_operations
-WHERE process_name NOT IN (
-  SELECT process_name FROM dw.dim_process
-);
-
-INSERT INTO dw.dim_department (department_name)
-SELECT DISTINCT department_name
-FROM stg.staging_operations
-WHERE department_name NOT IN (
-  SELECT department_name FROM dw.dim_department
-);
-
--- Insert new locations into dim_location
-INSERT INTO dw.dim_location (location_name)
-SELECT DISTINCT location_name
-FROM stg.staging_operations
-WHERE location_name NOT IN (
-  SELECT location_name FROM dw.dim_location
-);
-
---  Add foreign keys to staging if not exists
-DO $$ BEGIN
-  ALTER TABLE stg.staging_operations ADD COLUMN process_id INT;
-EXCEPTION WHEN duplicate_column THEN RAISE NOTICE 'process_id already exists';
-END $$;
-
-DO $$ BEGIN
-  ALTER TABLE stg.staging_operations ADD COLUMN location_id INT;
-EXCEPTION WHEN duplicate_column THEN RAISE NOTICE 'location_id already exists';
-END $$;
-
-DO $$ BEGIN
-  ALTER TABLE stg.staging_operations ADD COLUMN department_id INT;
-EXCEPTION WHEN duplicate_column THEN RAISE NOTICE 'department_id already exists';
-END $$;
-
--- Map dim IDs to staging
-UPDATE stg.staging_operations s
-SET process_id = p.process_id
-FROM dw.dim_process p
-WHERE s.process_name = p.process_name;
 
-UPDATE stg.staging_operations s
-SET location_id = l.location_id
-FROM dw.dim_location l
-WHERE s.location_name = l.location_name;
 
-UPDATE stg.staging_operations s
-SET department_id = d.department_id
-FROM dw.dim_department d
-WHERE s.department_name = d.department_name;
+-- @node fact_downtime after operations, dim_time
+-- 03_load_dim_fact_operations
 
+--  department_id, process_id and location_id are resolved against their dimensions (new
+--  members added) by the Operations pipeline (02_Extract_and_transform_raw_data/dim_keys.py)
+--  and staged with each row
 
 
 --  Insert + audit for fact_downtime
@@ -300,30 +243,34 @@ WITH candidate_rows AS (
     s.department_id,
     s.process_id,
     s.location_id,
-    t.time_id,
-    s.downtime_hours
+    dw.date_key(s.process_date::DATE) AS time_id,
+    s.downtime_hours,
+    md5(ROW(s.department_id, s.process_id, s.location_id, dw.date_key(s.process_date::DATE), s.downtime_hours)::TEXT) AS natural_key_hash,
+    s.row_hash
   FROM stg.staging_operations s
-  JOIN dw.dim_time t
-    ON t.full_date = s.process_date::DATE
-),
-inserted_rows AS (
-  SELECT *
-  FROM candidate_rows c
-  WHERE NOT EXISTS (
-    SELECT 1 FROM dw.fact_downtime f
-    WHERE f.department_id = c.department_id
-      AND f.process_id = c.process_id
-      AND f.location_id = c.location_id
-      AND f.time_id = c.time_id
-      AND f.downtime_hours = c.downtime_hours
-  )
+  WHERE s.process_date IS NOT NULL
 ),
+-- Facts already loaded (and repeats within this batch) hit the unique natural-key index
 do_insert AS (
   INSERT INTO dw.fact_downtime (
-    department_id, process_id, location_id, time_id, downtime_hours
+    department_id, process_id, location_id, time_id, downtime_hours, natural_key_hash, job_id
   )
-  SELECT * FROM inserted_rows
-  RETURNING *
+  SELECT
+    department_id, process_id, location_id, time_id, downtime_hours, natural_key_hash,
+    (SELECT job_id FROM temp_etl_job)
+  FROM candidate_rows
+  ON CONFLICT (natural_key_hash, time_id) DO NOTHING
+  RETURNING 1
+),
+-- Rows now in the facts (inserted, or there already) join the loaded-row index
+indexed AS (
+  INSERT INTO stg.loaded_row_hashes (source_name, row_hash, job_id)
+  SELECT DISTINCT 'raw_operations', c.row_hash, (SELECT job_id FROM temp_etl_job)
+  FROM candidate_rows c
+  WHERE c.row_hash IS NOT NULL
+    AND NOT EXISTS (
+      SELECT 1 FROM stg.loaded_row_hashes l WHERE l.source_name = 'raw_operations' AND l.row_hash = c.row_hash
+    )
 )
 
 -- Audit log
@@ -346,4 +293,11 @@ SELECT
     (SELECT COUNT(*) FROM candidate_rows),
     (SELECT COUNT(*) FROM do_insert),
     (SELECT COUNT(*) FROM candidate_rows) - (SELECT COUNT(*) FROM do_insert)
-  );
\ No newline at end of file
+  );
+
+SELECT dw.log_stage_metric((SELECT job_id FROM temp_etl_job), 'sql_load', 'fact_downtime', 'stg.staging_operations', 'dw.fact_downtime');
+
+-- @node kpi_aggregates after fact_expenses, fact_downtime
+--  Refresh the KPI aggregate buckets this job's facts fall into
+SELECT dw.refresh_kpi_aggregates((SELECT job_id FROM temp_etl_job));
+SELECT dw.log_stage_metric((SELECT job_id FROM temp_etl_job), 'sql_load', 'kpi_aggregates');
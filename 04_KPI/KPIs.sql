@@ -1,30 +1,30 @@
 
+-- The time-bucketed KPIs read the aggregate tables (dw.agg_*) that the load refreshes
+-- through dw.refresh_kpi_aggregates() for every job; see combined_dw_schema.sql.
+-- After loading facts by other means, rebuild them with: SELECT dw.refresh_kpi_aggregates();
+
 --1. Headcount Over Time
 CREATE OR REPLACE VIEW dw.vw_kpi_headcount AS
 SELECT 
-  t.year,
-  t.month,
-  t.day,
-  COUNT(DISTINCT f.employee_sk) AS Active_Headcount
-FROM dw.fact_employee f
-JOIN dw.dim_time t ON f.time_id = t.time_id
-WHERE f.status = 'Active'
-GROUP BY t.year, t.month,t.day
-ORDER BY t.year, t.month, t.day;
+  a.year,
+  a.month,
+  a.day,
+  a.active_headcount AS Active_Headcount
+FROM dw.agg_daily_headcount a
+WHERE a.active_headcount > 0
+ORDER BY a.year, a.month, a.day;
 
 
 --2. Attrition Over Time
 CREATE OR REPLACE VIEW dw.vw_kpi_resignations AS
 SELECT 
-  t.year,
-  t.month,
-  t.day,
-  COUNT(DISTINCT f.employee_sk) AS resignations
-FROM dw.fact_employee f
-JOIN dw.dim_time t ON f.time_id = t.time_id
-WHERE f.status = 'Resigned'
-GROUP BY t.year, t.month, t.day
-ORDER BY t.year, t.month, t.day;
+  a.year,
+  a.month,
+  a.day,
+  a.resignations
+FROM dw.agg_daily_headcount a
+WHERE a.resignations > 0
+ORDER BY a.year, a.month, a.day;
 
 
 --3. Current Average Salary by Gender
@@ -42,59 +42,53 @@ GROUP BY e.gender;
 --4a Gross Monthly Expenses by Department and Expense type
 CREATE OR REPLACE VIEW dw.vw_kpi_gross_monthly_expenses_by_dept AS
 SELECT 
-  t.year,
-  t.month,
+  a.year,
+  a.month,
   d.department_name,
   ex.expense_type_name,
-  ROUND(SUM(f.expense_amount), 2) AS total_expense
-FROM dw.fact_expenses f
-JOIN dw.dim_time t ON f.time_id = t.time_id
-JOIN dw.dim_expense_type ex on f.expense_type_id = ex.expense_type_id
-JOIN dw.dim_employee e ON f.employee_sk = e.employee_sk
-JOIN dw.dim_department d ON e.department_id = d.department_id
-WHERE f.is_refund =FALSE
-GROUP BY t.year, t.month, d.department_name, ex.expense_type_name
-ORDER BY t.year, t.month, d.department_name, ex.expense_type_name;
+  ROUND(SUM(a.gross_expense), 2) AS total_expense
+FROM dw.agg_monthly_expenses a
+JOIN dw.dim_expense_type ex on a.expense_type_id = ex.expense_type_id
+JOIN dw.dim_department d ON a.department_id = d.department_id
+WHERE a.gross_rows > 0
+GROUP BY a.year, a.month, d.department_name, ex.expense_type_name
+ORDER BY a.year, a.month, d.department_name, ex.expense_type_name;
 
 
 --4B NEt Monthly Expenses by Department and Expense type
 CREATE OR REPLACE VIEW dw.vw_kpi_net_monthly_expenses_by_dept AS
 SELECT 
-  t.year,
-  t.month,
+  a.year,
+  a.month,
   d.department_name,
   ex.expense_type_name,
-  ROUND(SUM(f.expense_amount), 2) AS total_expense
-FROM dw.fact_expenses f
-JOIN dw.dim_time t ON f.time_id = t.time_id
-JOIN dw.dim_expense_type ex on f.expense_type_id = ex.expense_type_id
-JOIN dw.dim_employee e ON f.employee_sk = e.employee_sk
-JOIN dw.dim_department d ON e.department_id = d.department_id
-GROUP BY t.year, t.month, d.department_name, ex.expense_type_name
-ORDER BY t.year, t.month, d.department_name,ex.expense_type_name;
+  ROUND(SUM(a.net_expense), 2) AS total_expense
+FROM dw.agg_monthly_expenses a
+JOIN dw.dim_expense_type ex on a.expense_type_id = ex.expense_type_id
+JOIN dw.dim_department d ON a.department_id = d.department_id
+GROUP BY a.year, a.month, d.department_name, ex.expense_type_name
+ORDER BY a.year, a.month, d.department_name,ex.expense_type_name;
 
 --4c NEt Monthly Expenses by Expense type
 CREATE OR REPLACE VIEW dw.vw_kpi_net_monthly_expenses_by_expense AS
 SELECT 
-  t.year,
-  t.month,
+  a.year,
+  a.month,
   ex.expense_type_name,
-  ROUND(SUM(f.expense_amount), 2) AS total_expense
-FROM dw.fact_expenses f
-JOIN dw.dim_time t ON f.time_id = t.time_id
-JOIN dw.dim_expense_type ex on f.expense_type_id = ex.expense_type_id
-JOIN dw.dim_employee e ON f.employee_sk = e.employee_sk
-GROUP BY t.year, t.month, ex.expense_type_name
-ORDER BY t.year, t.month,ex.expense_type_name;
+  ROUND(SUM(a.net_expense), 2) AS total_expense
+FROM dw.agg_monthly_expenses a
+JOIN dw.dim_expense_type ex on a.expense_type_id = ex.expense_type_id
+GROUP BY a.year, a.month, ex.expense_type_name
+ORDER BY a.year, a.month,ex.expense_type_name;
 
 --5 downtime by process
 CREATE OR REPLACE VIEW dw.vw_kpi_downtime_by_process AS
 SELECT 
   p.process_name,
-  ROUND(SUM(f.downtime_hours), 2) AS total_downtime,
-  ROUND(AVG(f.downtime_hours), 2) AS AVG_downtime
-FROM dw.fact_downtime f
-JOIN dw.dim_process p ON f.process_id = p.process_id
+  ROUND(SUM(a.downtime_hours), 2) AS total_downtime,
+  ROUND(SUM(a.downtime_hours) / NULLIF(SUM(a.downtime_rows), 0), 2) AS AVG_downtime
+FROM dw.agg_monthly_downtime a
+JOIN dw.dim_process p ON a.process_id = p.process_id
 GROUP BY p.process_name
 ORDER BY total_downtime DESC;
 
@@ -102,10 +96,10 @@ ORDER BY total_downtime DESC;
 CREATE OR REPLACE VIEW dw.vw_kpi_downtime_by_dept AS
 SELECT 
   d.department_name,
-  ROUND(SUM(f.downtime_hours), 2) AS total_downtime,
-  ROUND(AVG(f.downtime_hours), 2) AS AVG_downtime
-FROM dw.fact_downtime f
-JOIN dw.dim_department d ON f.department_id = d.department_id
+  ROUND(SUM(a.downtime_hours), 2) AS total_downtime,
+  ROUND(SUM(a.downtime_hours) / NULLIF(SUM(a.downtime_rows), 0), 2) AS AVG_downtime
+FROM dw.agg_monthly_downtime a
+JOIN dw.dim_department d ON a.department_id = d.department_id
 GROUP BY d.department_name
 ORDER BY total_downtime DESC;
 
@@ -0,0 +1,26 @@
+{#-
+  on-run-end hook: prints the build time of every model and snapshot of the run with its
+  materialization, and adds them to dw.etl_stage_metrics (pipeline 'dbt', job_id = the
+  dbt invocation id) when the warehouse has that table, next to the Python and SQL load
+  stages. Staging models built as views and as tables can be compared there.
+-#}
+{% macro log_build_times(results) %}
+{%- set built = [] -%}
+{%- for result in results if result.node.resource_type in ('model', 'snapshot') and result.status == 'success' -%}
+  {%- do built.append(result) -%}
+  {{- log(result.node.name ~ ' (' ~ result.node.config.materialized ~ '): ' ~ '%.2f' | format(result.execution_time) ~ 's', info=True) -}}
+{%- endfor -%}
+{%- if built %}
+do $$
+begin
+  if to_regclass('dw.etl_stage_metrics') is not null then
+    insert into dw.etl_stage_metrics (job_id, pipeline, stage, calls, rows_out, wall_seconds)
+    values
+    {%- for result in built %}
+      {%- set rows = (result.adapter_response or {}).get('rows_affected') %}
+      ('{{ invocation_id }}', 'dbt', '{{ result.node.name }}', 1, {{ rows if rows is not none and rows >= 0 else 'null' }}, {{ '%.3f' | format(result.execution_time) }}){{ ',' if not loop.last }}
+    {%- endfor %};
+  end if;
+end $$;
+{%- endif %}
+{% endmacro %}
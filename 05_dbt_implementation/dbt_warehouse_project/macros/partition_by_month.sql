@@ -0,0 +1,54 @@
+{#-
+  Keeps an incremental fact model range partitioned on time_id, one partition per month of
+  dim_time (e.g. dw.fact_expenses_y2024m01) plus a default partition for rows without a
+  date. Used as the model's pre_hook, to add the partitions of new dim_time months before
+  the insert, and as its post_hook, to turn the plain table dbt creates on a first (or full
+  refresh) build into a partitioned one with a BRIN index on time_id and B-tree indexes on
+  index_columns. time_id is the YYYYMMDD date key, so a month is [YYYYMM00, YYYYMM00 + 100).
+  On a full refresh dbt renames the old table to <name>__dbt_backup and only drops it after
+  the post_hook; its partitions and indexes keep their names, so the post_hook drops it
+  first to free them (the drop is part of the build's transaction).
+-#}
+{% macro partition_by_month(relation, index_columns=[]) %}
+{%- set name = relation.identifier -%}
+{%- set unpartitioned = relation.schema ~ '.' ~ name ~ '__unpartitioned' -%}
+do $$
+declare
+  m record;
+  partition_name text;
+begin
+  if to_regclass('{{ relation }}') is null then
+    return;
+  end if;
+
+  if not exists (select 1 from pg_partitioned_table where partrelid = '{{ relation }}'::regclass) then
+    drop table if exists {{ relation.schema }}.{{ name }}__dbt_backup cascade;
+    alter table {{ relation }} rename to {{ name }}__unpartitioned;
+    create table {{ relation }} (like {{ unpartitioned }} including defaults)
+      partition by range (time_id);
+    create table {{ relation.schema }}.{{ name }}_default partition of {{ relation }} default;
+    create index {{ name }}_time_id_brin on {{ relation }} using brin (time_id);
+    {%- for column in index_columns %}
+    create index {{ name }}_{{ column }}_idx on {{ relation }} ({{ column }});
+    {%- endfor %}
+  end if;
+
+  for m in
+    select distinct year, month, time_id / 100 * 100 as from_id, time_id / 100 * 100 + 100 as to_id
+    from {{ ref('dim_time') }}
+  loop
+    partition_name := format('{{ name }}_y%sm%s', m.year, lpad(m.month::text, 2, '0'));
+    if to_regclass(format('{{ relation.schema }}.%I', partition_name)) is null then
+      execute format(
+        'create table {{ relation.schema }}.%I partition of {{ relation }} for values from (%s) to (%s)',
+        partition_name, m.from_id, m.to_id
+      );
+    end if;
+  end loop;
+
+  if to_regclass('{{ unpartitioned }}') is not null then
+    insert into {{ relation }} select * from {{ unpartitioned }};
+    drop table {{ unpartitioned }};
+  end if;
+end $$;
+{% endmacro %}
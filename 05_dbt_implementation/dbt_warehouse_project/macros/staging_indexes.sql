@@ -0,0 +1,15 @@
+{#-
+  post_hook of the staging models. A staging model built as a table (incremental, the
+  staging default in dbt_project.yml) gets B-tree indexes on the columns the dims, facts
+  and the scd2_dim_employee snapshot join it on, and fresh planner statistics. Those
+  columns are normalized in staging already (trimmed, upper case names), so the joins are
+  plain equalities the indexes can serve. A model switched back to a view is left alone.
+-#}
+{% macro staging_indexes(relation, index_columns=[]) %}
+{%- if config.get('materialized') != 'view' %}
+{%- for column in index_columns %}
+create index if not exists {{ relation.identifier }}_{{ column }}_idx on {{ relation }} ({{ column }});
+{%- endfor %}
+analyze {{ relation }};
+{%- endif %}
+{% endmacro %}
@@ -0,0 +1,32 @@
+{#-
+  Row keys of the incremental staging models. A raw row is keyed by its values plus its
+  copy number among identical rows (occurrence), so exact duplicates stay distinct rows.
+  The model adds the keys it has not staged yet; the prune_staging post_hook deletes the
+  staged rows whose key the source no longer has, so rows removed or corrected in the raw
+  data leave staging on the next run instead of staying there for good. Give both the
+  same key columns.
+-#}
+{% macro staging_occurrence(key_columns) %}
+row_number() over (partition by {{ key_columns | join(', ') }})
+{%- endmacro %}
+
+{% macro staging_row_key(key_columns) %}
+{{ dbt_utils.generate_surrogate_key(key_columns + ['occurrence']) }}
+{%- endmacro %}
+
+{% macro prune_staging(relation, source_relation, key_columns) %}
+{%- if is_incremental() %}
+delete from {{ relation }} t
+where not exists (
+    select 1
+    from (
+        select {{ staging_row_key(key_columns) }} as row_key
+        from (
+            select {{ key_columns | join(', ') }}, {{ staging_occurrence(key_columns) }} as occurrence
+            from {{ source_relation }}
+        ) s
+    ) k
+    where k.row_key = t.row_key
+);
+{%- endif %}
+{% endmacro %}
@@ -0,0 +1,3 @@
+{% macro date_key(col) %}
+    (extract(year from {{ col }}) * 10000 + extract(month from {{ col }}) * 100 + extract(day from {{ col }}))::int
+{% endmacro %}
@@ -0,0 +1,53 @@
+{#-
+  Incremental window of the fact models, kept in dw.dbt_watermarks (one row per model).
+
+  A run reloads every row dated on or after the model's watermark minus its lookback days
+  (var fact_lookback_days, per model in fact_lookback_days_by_model), so rows that arrive
+  late are merged on unique_key instead of being dropped. The bound is read from the
+  watermark table instead of taking max(time_id) over the whole fact table, and is also
+  used in incremental_predicates so the delete+insert only touches recent partitions.
+  update_watermark runs as the model's last post_hook and moves the watermark to the
+  newest date loaded.
+-#}
+{% macro create_watermark_table() %}
+create schema if not exists dw;
+create table if not exists dw.dbt_watermarks (
+  model_name text primary key,
+  watermark_date date not null,
+  lookback_days int not null,
+  updated_at timestamp not null default current_timestamp
+);
+{% endmacro %}
+
+
+{% macro lookback_days(model_name) %}
+  {{- return(var('fact_lookback_days_by_model', {}).get(model_name, var('fact_lookback_days', 7))) -}}
+{% endmacro %}
+
+
+{#- time_id of the first day of the model's incremental window, 0 before its first watermark -#}
+{% macro watermark_start(model_name) -%}
+coalesce(
+  (select {{ date_key('w.watermark_date - ' ~ lookback_days(model_name)) }} from dw.dbt_watermarks w where w.model_name = '{{ model_name }}'),
+  0
+)
+{%- endmacro %}
+
+
+{% macro update_watermark(relation) %}
+insert into dw.dbt_watermarks (model_name, watermark_date, lookback_days, updated_at)
+select
+  '{{ relation.identifier }}',
+  to_date(max(time_id)::text, 'YYYYMMDD'),
+  {{ lookback_days(relation.identifier) }},
+  current_timestamp
+from {{ relation }}
+{%- if is_incremental() %}
+where time_id >= {{ watermark_start(relation.identifier) }}
+{%- endif %}
+having max(time_id) is not null
+on conflict (model_name) do update set
+  watermark_date = {% if is_incremental() %}greatest(dw.dbt_watermarks.watermark_date, excluded.watermark_date){% else %}excluded.watermark_date{% endif %},
+  lookback_days = excluded.lookback_days,
+  updated_at = excluded.updated_at
+{% endmacro %}
@@ -3,14 +3,33 @@
     schema='dw'
 ) }}
 
-with dates as (
+with years as (
 
-    -- Generate a series of dates from 2020 to 2030
-    select generate_series(
-        '2020-01-01'::date,
-        '2030-12-31'::date,
+    -- 2020 to 2030, plus every year the sources have a date in (and today's, for the
+    -- employee snapshot), so no fact row falls outside dim_time
+    select generate_series(2020, 2030) as year
+    union
+    select extract(year from expense_date)::int
+    from {{ ref('stg_finance_expense') }}
+    where expense_date <> '1957-01-01'::date
+    union
+    select extract(year from process_date)::int
+    from {{ ref('stg_ops_downtime_prepped') }}
+    where process_date <> '1957-01-01'::date
+    union
+    select extract(year from current_date)::int
+
+),
+
+dates as (
+
+    select d::date as full_date
+    from years y
+    cross join lateral generate_series(
+        make_date(y.year, 1, 1),
+        make_date(y.year, 12, 31),
         interval '1 day'
-    )::date as full_date
+    ) d
 
 ),
 
@@ -41,7 +60,8 @@ time_dim as (
 
 )
 
+-- time_id is the date as YYYYMMDD, the same key the facts compute from their dates
 select
-    row_number() over (order by full_date) as time_id,
+    {{ date_key('full_date') }} as time_id,
     *
 from time_dim
@@ -3,9 +3,16 @@
 
 {{ config(
     materialized='incremental',
+    incremental_strategy='delete+insert',
     unique_key='fact_id',
+    incremental_predicates=['time_id >= ' ~ watermark_start(this.identifier)],
     on_schema_change='append_new_columns',
-    schema='dw'
+    schema='dw',
+    pre_hook="{{ partition_by_month(this, ['department_id', 'process_id', 'location_id']) }}",
+    post_hook=[
+        "{{ partition_by_month(this, ['department_id', 'process_id', 'location_id']) }}",
+        "{{ update_watermark(this) }}"
+    ]
 ) }}
 
 with src as (
@@ -24,23 +31,18 @@ final as (
         dd.department_id,
         dp.process_id,
         dl.location_id,
-        t.time_id,
+        {{ date_key('src.process_date') }} as time_id,
         src.downtime_hours::numeric(10,2)
 
     from src
-    left join {{ ref('dim_department') }} dd on upper(trim(dd.department_name)) = upper(trim(src.department_name))
-    left join {{ ref('dim_process') }} dp on upper(trim(dp.process_name)) = upper(trim(src.process_name))
-    left join {{ ref('dim_location') }} dl on upper(trim(dl.location_name)) = upper(trim(src.location_name))
-    left join {{ ref('dim_time') }} t on t.full_date = src.process_date
+    left join {{ ref('dim_department') }} dd on dd.department_name = src.department_name
+    left join {{ ref('dim_process') }} dp on dp.process_name = src.process_name
+    left join {{ ref('dim_location') }} dl on dl.location_name = src.location_name
 )
 
 select * from final
 {% if is_incremental() %}
-  where t.full_date > (
-    select max(t2.full_date)
-    from {{ this }} f
-    join {{ ref('dim_time') }} t2 on t2.time_id = f.time_id
-  )
+  where time_id >= {{ watermark_start(this.identifier) }}
 {% endif %}
 
 
@@ -1,8 +1,15 @@
 {{ config(
     materialized='incremental',
+    incremental_strategy='delete+insert',
     unique_key='fact_id',
+    incremental_predicates=['time_id >= ' ~ watermark_start(this.identifier)],
     on_schema_change='append_new_columns',
-    schema='dw'
+    schema='dw',
+    pre_hook="{{ partition_by_month(this, ['employee_sk']) }}",
+    post_hook=[
+        "{{ partition_by_month(this, ['employee_sk']) }}",
+        "{{ update_watermark(this) }}"
+    ]
 ) }}
 
 with src as (
@@ -19,21 +26,15 @@ final as (
         ]) }} as fact_id,
 
         e.employee_sk,
-        t.time_id,
+        {{ date_key('current_date') }} as time_id,
         e.salary,
         e.status
 
     from src e
-    left join {{ ref('dim_time') }} t
-      on t.full_date = CURRENT_DATE
 )
 
 select * from final
 
 {% if is_incremental() %}
-  where CURRENT_DATE > (
-    select max(t2.full_date)
-    from {{ this }} f
-    join {{ ref('dim_time') }} t2 on t2.time_id = f.time_id
-  )
+  where time_id > {{ watermark_start(this.identifier) }}
 {% endif %}
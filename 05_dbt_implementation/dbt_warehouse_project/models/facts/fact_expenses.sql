@@ -2,9 +2,16 @@
 
 {{ config(
     materialized='incremental',
+    incremental_strategy='delete+insert',
     unique_key='fact_id',
+    incremental_predicates=['time_id >= ' ~ watermark_start(this.identifier)],
     on_schema_change='append_new_columns',
-    schema='dw'
+    schema='dw',
+    pre_hook="{{ partition_by_month(this, ['employee_sk', 'expense_type_id']) }}",
+    post_hook=[
+        "{{ partition_by_month(this, ['employee_sk', 'expense_type_id']) }}",
+        "{{ update_watermark(this) }}"
+    ]
 ) }}
 
 with src as (
@@ -23,7 +30,7 @@ final as (
         et.expense_type_id,
         src.expense_amount,
         src.approved_by,
-        t.time_id,
+        {{ date_key('src.expense_date') }} as time_id,
         src.is_refund
 
     from src
@@ -31,16 +38,10 @@ final as (
       on e.employee_id = src.employee_id and e.dbt_valid_to is null
     left join {{ ref('dim_expense_type') }} et
       on et.expense_type_name = src.expense_type
-    left join {{ ref('dim_time') }} t
-      on t.full_date = src.expense_date
 )
 
 select * from final
 {% if is_incremental() %}
-  where t.full_date > (
-    select max(t2.full_date)
-    from {{ this }} f
-    join {{ ref('dim_time') }} t2 on t2.time_id = f.time_id
-  )
+  where time_id >= {{ watermark_start(this.identifier) }}
 {% endif %}
 
@@ -1,11 +1,28 @@
-{{ config(materialized='view') }}
+-- Table or view per dbt_project.yml. As a table a run only adds the raw rows it has not
+-- staged yet, identified by row_key (the raw values plus the copy number of duplicates),
+-- and deletes the staged rows the raw data no longer has (macros/staging_row_keys.sql).
+{{ config(
+    unique_key='row_key',
+    incremental_strategy='delete+insert',
+    post_hook=[
+        "{{ prune_staging(this, source('raw', 'Finance_Dataset_Dirty'), ['\"EmployeeID\"', '\"ExpenseType\"', '\"ExpenseAmount\"', '\"ExpenseDate\"', '\"ApprovedBy\"']) }}",
+        "{{ staging_indexes(this, ['row_key', 'employee_id', 'expense_type']) }}"
+    ]
+) }}
+
+{%- set key_columns = ['"EmployeeID"', '"ExpenseType"', '"ExpenseAmount"', '"ExpenseDate"', '"ApprovedBy"'] %}
 
 with src as (
-    select * from {{ source('raw', 'Finance_Dataset_Dirty') }}
+    select
+        *,
+        {{ staging_occurrence(key_columns) }} as occurrence
+    from {{ source('raw', 'Finance_Dataset_Dirty') }}
 ),
 
 clean as (
     select
+        {{ staging_row_key(key_columns) }} as row_key,
+
         -- Employee ID cleanup
         "EmployeeID"::text as employee_id,
 
@@ -41,3 +58,6 @@ clean as (
 )
 
 select * from clean
+{% if is_incremental() %}
+where not exists (select 1 from {{ this }} t where t.row_key = clean.row_key)
+{% endif %}
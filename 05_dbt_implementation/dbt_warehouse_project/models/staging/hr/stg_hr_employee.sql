@@ -1,4 +1,8 @@
-{{ config(materialized='view') }}
+-- Table or view per dbt_project.yml. As a table it is rebuilt from the whole feed every run,
+-- the HR file being a full extract.
+{{ config(
+    post_hook="{{ staging_indexes(this, ['employee_id', 'department_name']) }}"
+) }}
 
 with src as (
     select * from {{ source('raw', 'HR_Dataset_Dirty') }}
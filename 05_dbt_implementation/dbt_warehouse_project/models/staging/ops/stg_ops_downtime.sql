@@ -1,45 +1,46 @@
-{{ config(materialized='view') }}
+-- Table or view per dbt_project.yml. As a table a run only adds the rows it has not staged
+-- yet, identified by row_key (the normalized values plus the copy number of duplicates), so
+-- the group averages are worked out once per row, and deletes the staged rows the raw data
+-- no longer has (macros/staging_row_keys.sql).
+{{ config(
+    unique_key='row_key',
+    incremental_strategy='delete+insert',
+    post_hook=[
+        "{{ prune_staging(this, ref('stg_ops_downtime_prepped'), ['department_name', 'process_name', 'location_name', 'process_date', 'downtime_hours']) }}",
+        "{{ staging_indexes(this, ['row_key', 'department_name', 'process_name', 'location_name']) }}"
+    ]
+) }}
 
-with src as (
-    select * from {{ source('raw', 'Operations_Dataset_Dirty') }}
-),
+{%- set key_columns = ['department_name', 'process_name', 'location_name', 'process_date', 'downtime_hours'] %}
 
-prepped as (
+with defaults_applied as (
     select
-        upper(trim(coalesce("Department", ''))) as raw_department,
-        upper(trim(coalesce("ProcessName", ''))) as raw_process,
-        upper(trim(coalesce("Location", ''))) as raw_location,
-        {{ date_safe('"ProcessDate"') }} as process_date,
-        "DowntimeHours"::numeric as downtime_hours
-    from src
+        *,
+        {{ staging_occurrence(key_columns) }} as occurrence
+    from {{ ref('stg_ops_downtime_prepped') }}
 ),
 
-defaults_applied as (
-    select
-        case when raw_department = '' or raw_department ilike 'nan' then 'UNASSIGNED_DEPT' else raw_department end as department_name,
-        case when raw_process = '' or raw_process ilike 'nan' then 'UNKNOWN_PROCESS' else raw_process end as process_name,
-        case when raw_location = '' or raw_location ilike 'nan' then 'UNKNOWN_LOCATION' else raw_location end as location_name,
-        process_date,
-        downtime_hours
-    from prepped
+keyed as (
+    select *, {{ staging_row_key(key_columns) }} as row_key
+    from defaults_applied
 ),
 
 avg_grouped as (
     select department_name, process_name, location_name,
-           avg(downtime_hours) as avg_downtime
-    from defaults_applied
-    where downtime_hours is not null
+           sum(downtime_sum) / nullif(sum(downtime_count), 0) as avg_downtime
+    from {{ ref('stg_ops_downtime_group_stats') }}
     group by 1, 2, 3
 ),
 
 joined as (
     select
+        d.row_key,
         d.department_name,
         d.process_name,
         d.location_name,
         d.process_date,
         coalesce(d.downtime_hours, a.avg_downtime, 0) as downtime_hours
-    from defaults_applied d
+    from keyed d
     left join avg_grouped a
     on d.department_name = a.department_name
     and d.process_name = a.process_name
@@ -47,3 +48,6 @@ joined as (
 )
 
 select * from joined
+{% if is_incremental() %}
+where not exists (select 1 from {{ this }} t where t.row_key = joined.row_key)
+{% endif %}
@@ -0,0 +1,32 @@
+-- Known downtime per group and process date, kept across loads.
+-- Each run re-aggregates the current raw feed and merges it on (group, date), so a date
+-- sent again replaces its figures instead of adding to them, and dates that have left
+-- the feed keep counting towards the group averages used by stg_ops_downtime.
+
+{{ config(
+    materialized='incremental',
+    unique_key='stats_key',
+    on_schema_change='append_new_columns'
+) }}
+
+with src as (
+    select * from {{ ref('stg_ops_downtime_prepped') }}
+    where downtime_hours is not null
+)
+
+select
+    {{ dbt_utils.generate_surrogate_key([
+        'department_name',
+        'process_name',
+        'location_name',
+        'process_date'
+    ]) }} as stats_key,
+    department_name,
+    process_name,
+    location_name,
+    process_date,
+    sum(downtime_hours) as downtime_sum,
+    count(*) as downtime_count,
+    current_timestamp as updated_at
+from src
+group by department_name, process_name, location_name, process_date
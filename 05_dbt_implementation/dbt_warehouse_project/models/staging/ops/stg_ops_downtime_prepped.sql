@@ -0,0 +1,27 @@
+{{ config(materialized='view') }}
+
+with src as (
+    select * from {{ source('raw', 'Operations_Dataset_Dirty') }}
+),
+
+prepped as (
+    select
+        upper(trim(coalesce("Department", ''))) as raw_department,
+        upper(trim(coalesce("ProcessName", ''))) as raw_process,
+        upper(trim(coalesce("Location", ''))) as raw_location,
+        {{ date_safe('"ProcessDate"') }} as process_date,
+        "DowntimeHours"::numeric as downtime_hours
+    from src
+),
+
+defaults_applied as (
+    select
+        case when raw_department = '' or raw_department ilike 'nan' then 'UNASSIGNED_DEPT' else raw_department end as department_name,
+        case when raw_process = '' or raw_process ilike 'nan' then 'UNKNOWN_PROCESS' else raw_process end as process_name,
+        case when raw_location = '' or raw_location ilike 'nan' then 'UNKNOWN_LOCATION' else raw_location end as location_name,
+        process_date,
+        downtime_hours
+    from prepped
+)
+
+select * from defaults_applied
@@ -23,7 +23,7 @@ with src as (
     current_timestamp as updated_at
   from {{ ref('stg_hr_employee') }} e
   left join {{ ref('dim_department') }} d
-    on upper(trim(e.department_name)) = upper(trim(d.department_name))
+    on e.department_name = d.department_name
 )
 
 select * from src